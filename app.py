@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from pathlib import Path
 from datetime import date
-import joblib
+import numpy as np
 import pandas as pd
 import streamlit as st
 import altair as alt
@@ -18,12 +18,38 @@ from src.features import (
     split_train_val_test,
     split_train_test,
 )
-from src.metrics import regression_metrics
+from src import tracing
+from src.artifacts import LazyArtifacts, predict_all
+from src.downsample import DEFAULT_POINT_BUDGET, downsample_long
+from src.ensemble import ENSEMBLE_MODELS, Ensemble, ensemble_view
+from src.feature_store import frame_fingerprint, load_features
+from src.time_index import TimeIndex
+from src.metrics import ROLLING_WINDOWS, rolling_metrics, split_metrics
+from src.rf_intervals import interval, share_above, tree_matrix
+from src.scenarios import horizon_skill, simulate
 
 
 REPO_ROOT = Path(__file__).resolve().parent
 MODELS_DIR = REPO_ROOT / "models"
 
+# BRENT_TRACE=1 keeps stage timing on; otherwise the sidebar toggle enables it.
+TRACE_FROM_ENV = tracing.enabled()
+
+MODEL_NAMES = {
+    "MLR (JustBrent)": "mlr_justbrent",
+    "Random Forest Regressor": "rf",
+    "Neural Network (MLPRegressor)": "nn",
+}
+MODEL_KEYS = {name: key for key, name in MODEL_NAMES.items()}
+ENSEMBLE_KEY = "Ensemble (MLR + RF + NN)"
+DOWNSAMPLE_METHODS = {"LTTB": "lttb", "Min/Max": "minmax"}
+RF_KEY = "Random Forest Regressor"
+RF_INTERVAL_LEVELS = [0.5, 0.8, 0.9, 0.95]
+RISK_PATH_OPTIONS = [1000, 2000, 5000, 10000]
+RISK_STEPS = 20
+RISK_HORIZONS = (5, 10, 20)
+RISK_SEED = 42
+
 
 st.set_page_config(
     page_title="Brent Crude Oil Prediction Demo",
@@ -36,31 +62,50 @@ def load_data():
     return load_processed_data()
 
 
+@st.cache_data
+def load_data_fingerprint():
+    # Same frame fingerprint the exporter and CLIs key features and models on.
+    return frame_fingerprint(load_data())
+
+
 @st.cache_resource
 def load_model_artifacts():
-    return {
-        "MLR (JustBrent)": {
-            "model": joblib.load(MODELS_DIR / "mlr_justbrent_model.pkl"),
-            "scaler": joblib.load(MODELS_DIR / "mlr_justbrent_scaler.pkl"),
-            "type": "mlr",
-        },
-        "Random Forest Regressor": {
-            "model": joblib.load(MODELS_DIR / "rf_model.pkl"),
-            "scaler": None,
-            "type": "rf",
-        },
-        "Neural Network (MLPRegressor)": {
-            "model": joblib.load(MODELS_DIR / "nn_model.pkl"),
-            "scaler": joblib.load(MODELS_DIR / "nn_scaler.pkl"),
-            "type": "nn",
-        },
-    }
+    # Models are loaded on first selection only and resolved through the
+    # registry's current entry (flat models/ as fallback); see src/artifacts.py.
+    return LazyArtifacts(MODELS_DIR)
+
+
+@st.cache_resource
+def legacy_artifact_hash(model_key: str) -> str:
+    return load_model_artifacts().artifact_hash(MODEL_NAMES[model_key])
+
+
+def model_artifact_hash(model_key: str) -> str:
+    # Reading the registry pointer is cheap, so a re-export is picked up on the
+    # next rerun; flat models/ files are hashed once per process.
+    key = load_model_artifacts().registry.current(MODEL_NAMES[model_key])
+    return key if key is not None else legacy_artifact_hash(model_key)
 
 
+@tracing.traced("app.prepare_model_data")
 def prepare_model_data(df: pd.DataFrame, model_key: str):
+    features = load_features(df, load_data_fingerprint())
+    if model_key == ENSEMBLE_KEY:
+        # One shared feature pass; rows are those every member can score.
+        data_full, X_full, target, clean_mask = ensemble_view(df, features)
+        data_clean = data_full[clean_mask].reset_index(drop=True)
+        X = X_full[clean_mask].reset_index(drop=True)
+        y = target[clean_mask].reset_index(drop=True)
+        X_train, X_val, X_test, y_train, y_val, y_test = split_train_val_test(X, y)
+        split = {
+            "train": (X_train, y_train),
+            "val": (X_val, y_val),
+            "test": (X_test, y_test),
+        }
+        return data_full, X_full, data_clean, X, y, split, clean_mask
     if model_key == "MLR (JustBrent)":
-        data_full, X_full, _ = build_features_mlr_justbrent_full(df)
-        data_clean, X, y, _ = build_features_mlr_justbrent(df)
+        data_full, X_full, _ = build_features_mlr_justbrent_full(df, features)
+        data_clean, X, y, _ = build_features_mlr_justbrent(df, features)
         X_train, X_val, X_test, y_train, y_val, y_test = split_train_val_test(X, y)
         split = {
             "train": (X_train, y_train),
@@ -68,8 +113,8 @@ def prepare_model_data(df: pd.DataFrame, model_key: str):
             "test": (X_test, y_test),
         }
     elif model_key == "Neural Network (MLPRegressor)":
-        data_full, X_full, _ = build_features_nn_full(df)
-        data_clean, X, y, _ = build_features_nn(df)
+        data_full, X_full, _ = build_features_nn_full(df, features)
+        data_clean, X, y, _ = build_features_nn(df, features)
         X_train, X_val, X_test, y_train, y_val, y_test = split_train_val_test(X, y)
         split = {
             "train": (X_train, y_train),
@@ -77,28 +122,158 @@ def prepare_model_data(df: pd.DataFrame, model_key: str):
             "test": (X_test, y_test),
         }
     else:
-        data_full, X_full, _ = build_features_rf_full(df)
-        data_clean, X, y, _ = build_features_rf(df)
+        data_full, X_full, _ = build_features_rf_full(df, features)
+        data_clean, X, y, _ = build_features_rf(df, features)
         X_train, X_test, y_train, y_test = split_train_test(X, y)
         split = {
             "train": (X_train, y_train),
             "test": (X_test, y_test),
         }
 
-    return data_full, X_full, data_clean, X, y, split
+    clean_mask = np.asarray(features.clean_mask(MODEL_NAMES[model_key]))
+    return data_full, X_full, data_clean, X, y, split, clean_mask
+
+
+@st.cache_data(show_spinner=False)
+def cached_predictions(model_key, artifact_hash, dataset_fingerprint, _X_full):
+    # Keyed by model, artifact hash and dataset fingerprint only: X_full is
+    # fully determined by the last two, so it is not hashed on every rerun.
+    valid = ~np.isnan(_X_full.to_numpy(dtype=float)).any(axis=1)
+    preds_full = np.full(len(_X_full), np.nan)
+    if valid.any():
+        model_bundle = load_model_artifacts().get(MODEL_NAMES[model_key])
+        preds_full[valid] = predict_all(model_bundle, _X_full[valid])
+    return preds_full
+
+
+@tracing.traced("app.build_chart")
+def build_price_chart(plot_long: pd.DataFrame, y_domain, band: pd.DataFrame | None = None):
+    lines = (
+        alt.Chart(plot_long)
+        .mark_line()
+        .encode(
+            x=alt.X("date:T", title="Date"),
+            y=alt.Y("value:Q", title="Price", scale=alt.Scale(domain=y_domain)),
+            color=alt.Color("series:N", title="Series"),
+            tooltip=[
+                alt.Tooltip("date:T", title="Date"),
+                alt.Tooltip("series:N", title="Series"),
+                alt.Tooltip("value:Q", title="Price", format=",.2f"),
+            ],
+        )
+        .properties(height=360)
+    )
+    if band is None or band.empty:
+        return lines
+    area = (
+        alt.Chart(band)
+        .mark_area(opacity=0.25)
+        .encode(x="date:T", y=alt.Y("low:Q", scale=alt.Scale(domain=y_domain)), y2="high:Q")
+    )
+    return area + lines
+
+
+def render_stage_timings(panel):
+    rows = tracing.summary()
+    if not rows:
+        return
+    with panel.container():
+        st.markdown("**Waktu Tahapan (rerun ini)**")
+        timings = pd.DataFrame(rows)
+        timings["ms"] = timings.pop("seconds") * 1e3
+        st.dataframe(
+            timings[["stage", "calls", "ms", "rss_delta_mb"]].round(2),
+            hide_index=True,
+            use_container_width=True,
+        )
+
+
+@st.cache_resource
+def load_ensemble(artifact_hashes: tuple):
+    return Ensemble(load_model_artifacts(), ENSEMBLE_MODELS)
 
 
-def predict_all(model_key, model_bundle, X: pd.DataFrame):
-    model = model_bundle["model"]
-    scaler = model_bundle["scaler"]
+def ensemble_artifact_hashes() -> tuple:
+    return tuple(
+        model_artifact_hash(key) for key, name in MODEL_NAMES.items() if name in ENSEMBLE_MODELS
+    )
 
-    if scaler is not None:
-        X_scaled = scaler.transform(X)
-        preds = model.predict(X_scaled)
-    else:
-        preds = model.predict(X)
 
-    return preds
+@st.cache_data(show_spinner=False)
+def cached_ensemble_predictions(artifact_hashes, dataset_fingerprint, _features):
+    # Members are scored concurrently from the shared feature pass.
+    combined, _ = load_ensemble(artifact_hashes).predict(_features)
+    return combined
+
+
+@st.cache_data(show_spinner=False)
+def cached_rolling_metrics(model_key, artifact_hash, dataset_fingerprint, window, _y, _preds):
+    # Same keying as the predictions: the inputs follow from model + data.
+    return rolling_metrics(_y, _preds, window)
+
+
+@st.cache_resource
+def cached_tree_matrix(artifact_hash, dataset_fingerprint, _model, _X_full):
+    # Per-tree RF predictions for the whole history, (n_trees, n_rows) with NaN
+    # where features are missing; computed once per artifact + dataset.
+    X = _X_full.to_numpy(dtype=float)
+    valid = ~np.isnan(X).any(axis=1)
+    per_tree = tree_matrix(_model, X[valid])
+    out = np.full((per_tree.shape[0], len(X)), np.nan, dtype=per_tree.dtype)
+    out[:, valid] = per_tree
+    return out
+
+
+@st.cache_resource
+def cached_time_indexes(model_key, dataset_fingerprint, _data_clean, _data_full, _X_full):
+    # Built once per (model, dataset); range and as-of queries are then O(log n).
+    valid_rows = np.flatnonzero(~_X_full.isna().any(axis=1).to_numpy())
+    valid_index = TimeIndex(_data_full["date"].to_numpy()[valid_rows])
+    return TimeIndex.from_frame(_data_clean), valid_rows, valid_index
+
+
+@st.cache_data(show_spinner=False)
+def cached_horizon_skill(name, artifact_hash, dataset_fingerprint, _df):
+    # Recursive-forecast errors on the model's held-out start dates.
+    return horizon_skill(
+        _df, name, load_model_artifacts().get(name), load_features(_df, dataset_fingerprint), RISK_HORIZONS
+    )
+
+
+@st.cache_data(show_spinner=False)
+def cached_scenarios(models, artifact_key, dataset_fingerprint, as_of, n_paths, _df):
+    # Seeded, so the same key always gives the same fan.
+    result = simulate(
+        _df,
+        models,
+        load_features(_df, dataset_fingerprint),
+        load_model_artifacts(),
+        as_of=as_of,
+        n_paths=n_paths,
+        steps=RISK_STEPS,
+        seed=RISK_SEED,
+    )
+    return result.fan(), result.prob_up(), result.start_close, result.seconds
+
+
+def build_fan_chart(fan: pd.DataFrame, start_close: float):
+    data = fan.reset_index()
+    base = alt.Chart(data).encode(x=alt.X("step:Q", title="Hari bursa ke depan"))
+    outer = base.mark_area(opacity=0.2).encode(
+        y=alt.Y("p5:Q", title="Price", scale=alt.Scale(zero=False)), y2="p95:Q"
+    )
+    inner = base.mark_area(opacity=0.35).encode(y="p25:Q", y2="p75:Q")
+    median = base.mark_line().encode(
+        y="p50:Q",
+        tooltip=[
+            alt.Tooltip("step:Q", title="Hari"),
+            alt.Tooltip("p5:Q", title="P5", format=",.2f"),
+            alt.Tooltip("p50:Q", title="Median", format=",.2f"),
+            alt.Tooltip("p95:Q", title="P95", format=",.2f"),
+        ],
+    )
+    start = alt.Chart(pd.DataFrame({"close": [start_close]})).mark_rule(strokeDash=[4, 4]).encode(y="close:Q")
+    return (outer + inner + median + start).properties(height=300)
 
 
 def section_title(text: str):
@@ -113,18 +288,111 @@ def main():
         st.error("Folder `models/` tidak ditemukan. Jalankan export model terlebih dahulu.")
         st.stop()
 
-    df = load_data()
+    # Spans are kept per session and rerun; the toggle's value from the
+    # previous run applies. Other sessions in this process keep their own.
+    if "trace_collector" not in st.session_state:
+        st.session_state.trace_collector = tracing.Collector()
+    collector = st.session_state.trace_collector
+    collector.enabled = TRACE_FROM_ENV or st.session_state.get("show_stage_timings", False)
+    collector.reset()
+    tracing.activate(collector)
+
+    with tracing.span("app.load_data"):
+        df = load_data()
     model_artifacts = load_model_artifacts()
 
     st.sidebar.header("Pengaturan")
     model_key = st.sidebar.selectbox(
         "Pilih Model",
-        list(model_artifacts.keys()),
+        list(MODEL_NAMES.keys()) + [ENSEMBLE_KEY],
         index=0,
     )
+    point_budget = int(
+        st.sidebar.number_input(
+            "Maks. titik per seri grafik",
+            min_value=100,
+            max_value=20000,
+            value=DEFAULT_POINT_BUDGET,
+            step=100,
+        )
+    )
+    downsample_method = st.sidebar.selectbox("Metode downsampling", list(DOWNSAMPLE_METHODS))
+    if model_key == RF_KEY:
+        rf_level = st.sidebar.select_slider(
+            "Interval prediksi RF (antar pohon)",
+            options=RF_INTERVAL_LEVELS,
+            value=0.8,
+            format_func=lambda v: f"{v:.0%}",
+        )
+    show_risk = st.sidebar.checkbox("Simulasi risiko (Monte Carlo)", key="show_risk")
+    if show_risk:
+        risk_paths = st.sidebar.selectbox("Jumlah skenario", RISK_PATH_OPTIONS, index=1)
+    st.sidebar.checkbox("Tampilkan waktu tahapan", key="show_stage_timings")
+    timings_panel = st.sidebar.empty()
+    member_names = ENSEMBLE_MODELS if model_key == ENSEMBLE_KEY else (MODEL_NAMES[model_key],)
+    for name in member_names:
+        if not model_artifacts.exists(name):
+            st.error(
+                f"Artefak model `{name}` tidak ditemukan di `models/`. "
+                "Jalankan export model terlebih dahulu."
+            )
+            st.stop()
+
+    data_full, X_full, data_clean, X, y, split, clean_mask = prepare_model_data(
+        df, model_key
+    )
+    # One predict call per (model, artifacts, dataset); the chart, the signal
+    # and the split metrics below are all slices of this vector.
+    artifact_key = (
+        ensemble_artifact_hashes() if model_key == ENSEMBLE_KEY else model_artifact_hash(model_key)
+    )
+    tree_preds = None
+    with tracing.span("app.predictions", model=MODEL_NAMES.get(model_key, "ensemble")):
+        if model_key == ENSEMBLE_KEY:
+            preds_full = cached_ensemble_predictions(
+                artifact_key,
+                load_data_fingerprint(),
+                load_features(df, load_data_fingerprint()),
+            )
+        elif model_key == RF_KEY:
+            # One pass over the trees serves the point forecast (their mean,
+            # as CompactForest.predict computes it) and the interval bands.
+            tree_preds = cached_tree_matrix(
+                artifact_key, load_data_fingerprint(), model_artifacts.get("rf")["model"], X_full
+            )
+            preds_full = tree_preds.mean(axis=0, dtype=np.float64)
+        else:
+            preds_full = cached_predictions(
+                model_key, artifact_key, load_data_fingerprint(), X_full
+            )
+    preds = preds_full[clean_mask]
+
+    if model_key == ENSEMBLE_KEY:
+        weights = load_ensemble(ensemble_artifact_hashes()).weights
+        st.sidebar.caption(
+            "Bobot ensemble (1/MSE validasi): "
+            + " · ".join(f"{name} {w:.2f}" for name, w in weights.items())
+        )
+    load_stats = model_artifacts.stats(MODEL_NAMES.get(model_key))
+    if load_stats is not None:
+        footprint = (
+            f"{load_stats.rss_delta_bytes / 1e6:,.1f} MB RAM"
+            if load_stats.rss_delta_bytes is not None
+            else f"{load_stats.disk_bytes / 1e6:,.1f} MB di disk"
+        )
+        registry_key = model_artifacts.registry.current(MODEL_NAMES.get(model_key))
+        st.sidebar.caption(
+            f"Model dimuat dalam {load_stats.load_seconds:.2f} dtk · {footprint}"
+            + (" · mmap" if load_stats.mmap else "")
+            + (f" · registry `{registry_key}`" if registry_key else "")
+        )
 
-    data_full, X_full, data_clean, X, y, split = prepare_model_data(df, model_key)
-    preds = predict_all(model_key, model_artifacts[model_key], X)
+    if tree_preds is not None:
+        tree_clean = tree_preds[:, clean_mask]
+
+    clean_index, valid_rows, valid_index = cached_time_indexes(
+        model_key, load_data_fingerprint(), data_clean, data_full, X_full
+    )
 
     dashboard_container = st.container()
     chart_container = st.container()
@@ -177,28 +445,26 @@ def main():
         start_date = st.session_state.range_start
         end_date = st.session_state.range_end
 
-        plot_df = pd.DataFrame(
-            {
-                "date": data_clean["date"],
-                "actual_next_close": y.values,
-                "pred_next_close": preds,
-            }
-        )
-        plot_df = plot_df[
-            (plot_df["date"].dt.date >= start_date)
-            & (plot_df["date"].dt.date <= end_date)
-        ]
-        plot_df = plot_df.set_index("date")
-        plot_long = (
-            plot_df.reset_index()
-            .melt(
-                id_vars="date",
-                value_vars=["actual_next_close", "pred_next_close"],
-                var_name="series",
-                value_name="value",
+        with tracing.span("app.plot_data"):
+            rows = clean_index.slice(start_date, end_date)
+            plot_df = pd.DataFrame(
+                {
+                    "date": data_clean["date"].to_numpy()[rows],
+                    "actual_next_close": y.to_numpy()[rows],
+                    "pred_next_close": preds[rows],
+                }
+            )
+            plot_df = plot_df.set_index("date")
+            plot_long = (
+                plot_df.reset_index()
+                .melt(
+                    id_vars="date",
+                    value_vars=["actual_next_close", "pred_next_close"],
+                    var_name="series",
+                    value_name="value",
+                )
+                .copy()
             )
-            .copy()
-        )
         if plot_long.empty:
             st.warning("Tidak ada data pada rentang tanggal yang dipilih.")
             return
@@ -213,47 +479,58 @@ def main():
         plot_long["series"] = plot_long["series"].map(series_label).fillna(
             plot_long["series"]
         )
-        chart = (
-            alt.Chart(plot_long)
-            .mark_line()
-            .encode(
-                x=alt.X("date:T", title="Date"),
-                y=alt.Y("value:Q", title="Price", scale=alt.Scale(domain=y_domain)),
-                color=alt.Color("series:N", title="Series"),
-                tooltip=[
-                    alt.Tooltip("date:T", title="Date"),
-                    alt.Tooltip("series:N", title="Series"),
-                    alt.Tooltip("value:Q", title="Price", format=",.2f"),
-                ],
+        # Ranges within the budget come back at full resolution.
+        n_points = len(plot_long)
+        with tracing.span("app.downsample", points=n_points):
+            plot_long, dropped = downsample_long(
+                plot_long,
+                "date",
+                "value",
+                "series",
+                budget=point_budget,
+                method=DOWNSAMPLE_METHODS[downsample_method],
             )
-            .properties(height=360)
-        )
-        st.altair_chart(chart, use_container_width=True)
+        band = None
+        if tree_preds is not None:
+            # Band rows follow the dates kept for the prediction line.
+            low, high = interval(tree_clean[:, rows], rf_level)
+            band = pd.DataFrame({"date": plot_df.index, "low": low, "high": high})
+            kept = plot_long.loc[plot_long["series"] == series_label["pred_next_close"], "date"]
+            band = band[band["date"].isin(kept)]
+            if not band.empty:
+                y_domain = [
+                    min(y_domain[0], float(band["low"].min())),
+                    max(y_domain[1], float(band["high"].max())),
+                ]
+        chart = build_price_chart(plot_long, y_domain, band)
+        with tracing.span("app.render_chart"):
+            st.altair_chart(chart, use_container_width=True)
 
         st.caption(
             "Catatan: Prediksi merepresentasikan harga penutupan **hari berikutnya**."
         )
+        if dropped:
+            st.caption(
+                f"Menampilkan {len(plot_long):,} dari {n_points:,} titik "
+                f"({dropped:,} titik dilewati dengan {downsample_method}); "
+                "persempit rentang tanggal untuk resolusi penuh."
+            )
 
     # Dashboard Sinyal Harian Brent (Utama) - mengikuti tanggal akhir pada range
-    X_full_valid = X_full.dropna()
-    valid_dates = data_full.loc[X_full_valid.index, "date"]
-    eligible = valid_dates[valid_dates.dt.date <= end_date]
-    if eligible.empty:
-        selected_idx = X_full_valid.index[0]
-        selected_date = valid_dates.iloc[0].date()
+    # Last row with a complete feature vector on or before the end date.
+    pos = valid_index.asof(end_date)
+    if pos is None:
+        pos = 0
         warning_msg = (
             "Tanggal akhir terlalu awal; menggunakan tanggal awal yang tersedia."
         )
     else:
-        selected_idx = eligible.index[-1]
-        selected_date = valid_dates.loc[selected_idx].date()
         warning_msg = None
+    selected_row = valid_rows[pos]
+    selected_date = valid_index[pos].date()
 
-    selected_features = X_full_valid.loc[[selected_idx]]
-    selected_close = float(data_full.loc[selected_idx, "close_x"])
-    selected_pred = float(
-        predict_all(model_key, model_artifacts[model_key], selected_features)[0]
-    )
+    selected_close = float(data_full["close_x"].iat[selected_row])
+    selected_pred = float(preds_full[selected_row])
     delta = selected_pred - selected_close
     signal = "BUY" if selected_pred > selected_close else "SELL"
 
@@ -267,23 +544,69 @@ def main():
         kpi3.metric("Δ Prediksi", f"{delta:,.2f}")
         kpi4.metric("Sinyal", signal)
         st.caption(f"Sinyal dihitung berdasarkan data tanggal {selected_date}.")
+        if tree_preds is not None:
+            trees = tree_preds[:, selected_row]
+            low, high = interval(trees[:, None], rf_level)
+            agree = float(share_above(trees[:, None], selected_close)[0])
+            confidence = agree if signal == "BUY" else 1 - agree
+            st.caption(
+                f"Keyakinan sinyal: {confidence:.0%} dari {len(trees)} pohon RF searah {signal}; "
+                f"interval {rf_level:.0%}: {low[0]:,.2f} – {high[0]:,.2f}."
+            )
+
+    if show_risk:
+        section_title("Analisis Risiko (Monte Carlo)")
+        # The simulated paths follow the recursive forecast, so only models
+        # whose multi-step forecasts beat "no change" on held-out dates are used.
+        weights = load_ensemble(artifact_key).weights if model_key == ENSEMBLE_KEY else {member_names[0]: 1.0}
+        with tracing.span("app.horizon_skill"):
+            skills = {
+                name: cached_horizon_skill(name, model_artifact_hash(MODEL_KEYS[name]), load_data_fingerprint(), df)
+                for name in weights
+            }
+        skilled = {name: w for name, w in weights.items() if (skills[name]["skill"] > 0).all()}
+        st.dataframe(
+            pd.concat(skills.values(), ignore_index=True)[
+                ["model", "horizon", "n", "runaway", "RMSE", "naive_RMSE", "skill"]
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
+        st.caption(
+            "Prediksi rekursif dari tanggal-tanggal data validasi/test dibandingkan dengan baseline tanpa "
+            "perubahan (skill = 1 − RMSE / RMSE baseline). Model dengan skill ≤ 0 di salah satu horizon "
+            "tidak dipakai dalam simulasi."
+        )
+        if not skilled:
+            st.warning(
+                "Prediksi rekursif model ini tidak lebih baik dari baseline tanpa perubahan, "
+                "jadi simulasi risiko tidak ditampilkan."
+            )
+        else:
+            with tracing.span("app.scenarios", paths=risk_paths):
+                fan, prob_up, start_close, sim_seconds = cached_scenarios(
+                    skilled, artifact_key, load_data_fingerprint(), str(selected_date), risk_paths, df
+                )
+            risk_cols = st.columns(len(RISK_HORIZONS) + 1)
+            for col, h in zip(risk_cols, RISK_HORIZONS):
+                col.metric(f"Peluang naik {h} hari", f"{prob_up[h - 1]:.0%}")
+            risk_cols[-1].metric(
+                f"Rentang 90% ({RISK_STEPS} hari)",
+                f"{fan.at[RISK_STEPS, 'p5']:,.2f} – {fan.at[RISK_STEPS, 'p95']:,.2f}",
+            )
+            st.altair_chart(build_fan_chart(fan, start_close), use_container_width=True)
+            st.caption(
+                f"{risk_paths:,} jalur simulasi dari {selected_date} ({', '.join(skilled)}): prediksi rekursif "
+                f"model ditambah error relatif yang di-bootstrap dari data validasi/test (pita 5–95% dan "
+                f"25–75%, garis median; {sim_seconds:.2f} dtk)."
+            )
 
     # Monitoring Akurasi Prediksi
     section_title("Monitoring Akurasi Prediksi")
-    metrics_blocks = []
-
-    if "val" in split:
-        for split_name in ["train", "val", "test"]:
-            X_split, y_split = split[split_name]
-            if model_artifacts[model_key]["scaler"] is not None:
-                X_split = model_artifacts[model_key]["scaler"].transform(X_split)
-            y_pred = model_artifacts[model_key]["model"].predict(X_split)
-            metrics_blocks.append((split_name, regression_metrics(y_split, y_pred)))
-    else:
-        for split_name in ["train", "test"]:
-            X_split, y_split = split[split_name]
-            y_pred = model_artifacts[model_key]["model"].predict(X_split)
-            metrics_blocks.append((split_name, regression_metrics(y_split, y_pred)))
+    # Splits are consecutive chronological slices of the clean rows.
+    with tracing.span("app.metrics"):
+        sizes = [len(y_split) for _, y_split in split.values()]
+        metrics_blocks = list(zip(split.keys(), split_metrics(y.values, preds, sizes)))
 
     cols = st.columns(len(metrics_blocks))
     for col, (name, metrics) in zip(cols, metrics_blocks):
@@ -293,6 +616,44 @@ def main():
         col.write(f"MAE: {metrics['MAE']:.4f}")
         col.write(f"R²: {metrics['R2']:.4f}")
 
+    window = st.radio(
+        "Jendela drift akurasi (hari bursa)",
+        ROLLING_WINDOWS,
+        index=1,
+        horizontal=True,
+        key="drift_window",
+    )
+    with tracing.span("app.rolling_metrics", window=window):
+        drift = cached_rolling_metrics(
+            model_key, artifact_key, load_data_fingerprint(), window, y.values, preds
+        )
+        drift_long = (
+            drift[["RMSE", "MAE"]]
+            .assign(date=data_clean["date"].values)
+            .dropna()
+            .melt(id_vars="date", var_name="metric", value_name="value")
+        )
+    if not drift_long.empty:
+        drift_chart = (
+            alt.Chart(drift_long)
+            .mark_line()
+            .encode(
+                x=alt.X("date:T", title="Date"),
+                y=alt.Y("value:Q", title=f"Error ({window} hari)"),
+                color=alt.Color("metric:N", title="Metrik"),
+                tooltip=[
+                    alt.Tooltip("date:T", title="Date"),
+                    alt.Tooltip("metric:N", title="Metrik"),
+                    alt.Tooltip("value:Q", title="Nilai", format=",.4f"),
+                ],
+            )
+            .properties(height=240)
+        )
+        st.altair_chart(drift_chart, use_container_width=True)
+        st.caption(
+            f"RMSE dan MAE bergulir {window} hari; kenaikan menandakan akurasi model menurun."
+        )
+
     # Model & Dokumentasi Arsitektur Sistem
     section_title("Model & Dokumentasi Arsitektur Sistem")
     st.markdown(
@@ -311,9 +672,13 @@ Catatan implementasi:
 - MLR menggunakan fitur Brent saja (tanpa WTI).
 - RF menggunakan fitur tambahan (lag volume, spread, high-low range).
 - NN menggunakan fitur Brent + WTI, dengan StandardScaler.
+- Ensemble menggabungkan ketiga model dengan bobot 1/MSE validasi dari `*_meta.json`.
 """
     )
 
+    if tracing.enabled():
+        render_stage_timings(timings_panel)
+
 
 if __name__ == "__main__":
     main()
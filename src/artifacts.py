@@ -0,0 +1,186 @@
+"""Lazy loading of the exported model artifacts in ``models/``.
+
+Each model's files are read from its current ``models/registry`` entry (see
+``src/model_registry.py``), or from ``models/`` itself when nothing has been
+published to the registry. A loaded bundle is dropped and reloaded if the
+registry pointer moves.
+
+Nothing is read until a model is requested. Artifacts above
+``mmap_min_bytes`` are opened with ``joblib.load(mmap_mode="r")`` so NumPy
+arrays stored in them are mapped from the page cache (and shared between
+worker processes) instead of being copied onto each process heap. Every load
+records its wall time and resident-memory growth.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import joblib
+
+from src.features import REPO_ROOT
+from src.fused_inference import load_fused
+from src.model_registry import ModelRegistry
+from src.rf_compact import CompactForest
+from src.tracing import rss_bytes
+
+
+MODELS_DIR = REPO_ROOT / "models"
+MMAP_MIN_BYTES = 1024 * 1024
+
+ARTIFACT_FILES = {
+    "mlr_justbrent": {
+        "model": "mlr_justbrent_model.pkl",
+        "scaler": "mlr_justbrent_scaler.pkl",
+    },
+    "rf": {
+        "model": "rf_model.pkl",
+    },
+    "nn": {
+        "model": "nn_model.pkl",
+        "scaler": "nn_scaler.pkl",
+    },
+}
+
+# NumPy-only replacements for the pickled estimator (and its scaler, which is
+# folded into the weights), preferred whenever the exporter wrote them.
+COMPACT_FILES = {
+    "mlr_justbrent": "mlr_justbrent_fused.npz",
+    "rf": "rf_compact.npz",
+    "nn": "nn_fused.npz",
+}
+def _load_compact_forest(path: Path) -> CompactForest:
+    # The pickle is only read if a batch is large enough to need it.
+    return CompactForest.load(path, estimator_path=path.with_name(ARTIFACT_FILES["rf"]["model"]))
+
+
+COMPACT_LOADERS = {
+    "mlr_justbrent": load_fused,
+    "rf": _load_compact_forest,
+    "nn": load_fused,
+}
+
+MODEL_TYPES = {"mlr_justbrent": "mlr", "rf": "rf", "nn": "nn"}
+
+
+def predict_all(bundle: dict, X):
+    """Predictions of a loaded ``{"model", "scaler"}`` bundle for every row of ``X``."""
+    scaler = bundle["scaler"]
+    return bundle["model"].predict(scaler.transform(X) if scaler is not None else X)
+
+
+@dataclass
+class LoadStats:
+    name: str
+    load_seconds: float
+    disk_bytes: int
+    rss_delta_bytes: int | None
+    mmap: bool
+
+
+class LazyArtifacts:
+    """Thread-safe, load-on-first-use access to ``{"model", "scaler", "type"}`` bundles."""
+
+    def __init__(self, models_dir: Path | str = MODELS_DIR, mmap_min_bytes: int = MMAP_MIN_BYTES):
+        self.models_dir = Path(models_dir)
+        self.registry = ModelRegistry.for_models_dir(self.models_dir)
+        self.mmap_min_bytes = mmap_min_bytes
+        self._bundles = {}
+        self._stats = {}
+        self._locks = {name: threading.Lock() for name in ARTIFACT_FILES}
+
+    def model_dir(self, name: str) -> Path:
+        """The current registry entry of ``name``, else the flat ``models/`` directory."""
+        if name not in ARTIFACT_FILES:
+            raise ValueError(f"Unknown model: {name}")
+        current = self.registry.current_dir(name)
+        return current if current is not None else self.models_dir
+
+    def meta_path(self, name: str) -> Path:
+        return self.model_dir(name) / f"{name}_meta.json"
+
+    def paths(self, name: str) -> dict[str, Path]:
+        model_dir = self.model_dir(name)
+        compact = model_dir / COMPACT_FILES[name] if name in COMPACT_FILES else None
+        if compact is not None and compact.exists():
+            return {"model": compact}
+        return {role: model_dir / f for role, f in ARTIFACT_FILES[name].items()}
+
+    def exists(self, name: str) -> bool:
+        return all(p.exists() for p in self.paths(name).values())
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._bundles
+
+    def get(self, name: str) -> dict:
+        source = self.model_dir(name)
+        loaded = self._bundles.get(name)
+        if loaded is not None and loaded[0] == source:
+            return loaded[1]
+        with self._locks[name]:
+            loaded = self._bundles.get(name)
+            if loaded is None or loaded[0] != source:
+                loaded = (source, self._load(name))
+                self._bundles[name] = loaded
+        return loaded[1]
+
+    def stats(self, name: str) -> LoadStats | None:
+        return self._stats.get(name)
+
+    def artifact_hash(self, name: str) -> str:
+        key = self.registry.current(name)
+        if key is not None:
+            # Registry entries are immutable, so the key identifies the files.
+            return key
+        digest = hashlib.sha256()
+        for role, path in sorted(self.paths(name).items()):
+            digest.update(role.encode("utf-8"))
+            with open(path, "rb") as fh:
+                for chunk in iter(lambda: fh.read(1 << 20), b""):
+                    digest.update(chunk)
+        return digest.hexdigest()[:16]
+
+    def unload(self, name: str) -> None:
+        with self._locks[name]:
+            self._bundles.pop(name, None)
+            self._stats.pop(name, None)
+
+    def _load(self, name: str) -> dict:
+        paths = self.paths(name)
+        missing = [str(p) for p in paths.values() if not p.exists()]
+        if missing:
+            raise FileNotFoundError(f"Missing model artifacts: {missing}")
+
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        disk_bytes = 0
+        used_mmap = False
+        bundle = {"model": None, "scaler": None, "type": MODEL_TYPES[name]}
+        for role, path in paths.items():
+            size = path.stat().st_size
+            disk_bytes += size
+            if path.suffix == ".npz":
+                bundle[role] = COMPACT_LOADERS[name](path)
+                continue
+            mmap_mode = "r" if size >= self.mmap_min_bytes else None
+            used_mmap = used_mmap or mmap_mode is not None
+            bundle[role] = joblib.load(path, mmap_mode=mmap_mode)
+        elapsed = time.perf_counter() - start
+        rss_after = rss_bytes()
+
+        self._stats[name] = LoadStats(
+            name=name,
+            load_seconds=elapsed,
+            disk_bytes=disk_bytes,
+            rss_delta_bytes=(
+                rss_after - rss_before
+                if rss_before is not None and rss_after is not None
+                else None
+            ),
+            mmap=used_mmap,
+        )
+        return bundle
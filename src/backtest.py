@@ -0,0 +1,274 @@
+"""Walk-forward (rolling-origin) backtesting of the three models.
+
+Starting after ``initial_train`` clean rows, the test window advances by
+``retrain_every`` rows; before each window the model is refit on either all
+rows so far (``window="expanding"``) or the last ``train_size`` rows
+(``window="sliding"``) with the same ``fit_*`` code and, unless ``params``
+overrides them, the same (tuned) parameters the exporter uses. Folds run
+in a process pool. Each worker maps the feature matrix once and slices NumPy
+views per fold, so no DataFrames are copied or pickled per fold.
+
+Run from the repository root::
+
+    python -m src.backtest --models mlr_justbrent rf --window sliding --train-size 750
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.export_models import FITTERS, MODEL_PARAMS, model_params, predict_fitted
+from src.feature_spec import MODEL_SPECS
+from src.feature_store import CachedFeatures, load_features
+from src.features import DEFAULT_DATA_PATH, load_processed_data
+from src.incremental_mlr import for_mlr_justbrent
+from src.metrics import regression_metrics
+from src.time_index import TimeIndex
+
+
+@dataclass(frozen=True)
+class Fold:
+    index: int
+    train_start: int
+    train_end: int
+    test_start: int
+    test_end: int
+
+
+def make_folds(
+    n_rows: int,
+    initial_train: int,
+    retrain_every: int,
+    window: str = "expanding",
+    train_size: int | None = None,
+) -> list[Fold]:
+    if window not in ("expanding", "sliding"):
+        raise ValueError(f"Unknown window: {window}")
+    if retrain_every < 1:
+        raise ValueError("retrain_every must be at least 1")
+    if window == "sliding" and train_size is None:
+        train_size = initial_train
+
+    folds = []
+    start = initial_train
+    while start < n_rows:
+        end = min(start + retrain_every, n_rows)
+        train_start = 0 if window == "expanding" else max(0, start - train_size)
+        folds.append(Fold(len(folds), train_start, start, start, end))
+        start = end
+    return folds
+
+
+# Per-process cache of clean (X, y) arrays, filled once by the pool initializer.
+_WORKER_DATA = {}
+
+
+def _init_worker(source) -> None:
+    kind, payload, models = source
+    _WORKER_DATA.clear()
+    if kind == "store":
+        # Map the cached matrix once per process instead of shipping arrays.
+        payload = _clean_arrays(CachedFeatures(payload, models), models)
+    _WORKER_DATA.update(payload)
+
+
+def _run_fold(name: str, fold: Fold, params: dict | None, fit_kwargs: dict):
+    X, y = _WORKER_DATA[name]
+    # Basic slices: views into the worker's arrays, no copies per fold.
+    X_train, y_train = X[fold.train_start : fold.train_end], y[fold.train_start : fold.train_end]
+    X_test = X[fold.test_start : fold.test_end]
+    model, scaler = FITTERS[name](X_train, y_train, params, **fit_kwargs)
+    return name, fold, predict_fitted(model, scaler, X_test)
+
+
+def _run_incremental_mlr(folds: list[Fold]):
+    # One task walks all MLR folds in order: each refit only absorbs the rows
+    # that entered the window and drops those that left it.
+    X, y = _WORKER_DATA["mlr_justbrent"]
+    model = for_mlr_justbrent()
+    lo = hi = 0
+    results = []
+    for fold in folds:
+        model.absorb(X[hi : fold.train_end], y[hi : fold.train_end])
+        model.drop(X[lo : fold.train_start], y[lo : fold.train_start])
+        lo, hi = fold.train_start, fold.train_end
+        results.append(("mlr_justbrent", fold, model.predict(X[fold.test_start : fold.test_end])))
+    return results
+
+
+def _clean_arrays(features, models) -> dict:
+    out = {}
+    for name in models:
+        X_full, y_full = features.view(name)
+        mask = np.asarray(features.clean_mask(name))
+        out[name] = (np.asarray(X_full)[mask], np.asarray(y_full)[mask])
+    return out
+
+
+@dataclass
+class BacktestResult:
+    predictions: pd.DataFrame
+    fold_metrics: pd.DataFrame
+
+    def summary(self) -> pd.DataFrame:
+        rows = []
+        for name, group in self.predictions.groupby("model", sort=False):
+            rows.append({"model": name, **regression_metrics(group["actual"], group["pred"])})
+        return pd.DataFrame(rows)
+
+
+def walk_forward(
+    df: pd.DataFrame,
+    models=None,
+    window: str = "expanding",
+    initial_train: int = 500,
+    train_size: int | None = None,
+    retrain_every: int = 20,
+    workers: int | None = None,
+    fingerprint: str | None = None,
+    params: dict | None = None,
+    incremental_mlr: bool = False,
+    test_start=None,
+) -> BacktestResult:
+    models = list(MODEL_SPECS) if models is None else list(models)
+    # Evaluate what ships: models/*_params.json overrides, as in the exporter.
+    params = {name: (params or {}).get(name) or model_params(name) for name in models}
+    features = load_features(df, fingerprint)
+
+    arrays = _clean_arrays(features, models)
+    if isinstance(features, CachedFeatures):
+        source = ("store", features.path, models)
+    else:
+        source = ("arrays", arrays, models)
+
+    dates = {}
+    model_folds = {}
+    for name in models:
+        mask = np.asarray(features.clean_mask(name))
+        dates[name] = df["date"].to_numpy()[mask]
+        first_test = initial_train
+        if test_start is not None:
+            # Train on everything before the first clean row on/after test_start.
+            first_test = TimeIndex(dates[name]).first_on_or_after(test_start)
+            if not first_test:
+                raise ValueError(f"{name} needs training rows before and test rows from {test_start}")
+        model_folds[name] = make_folds(
+            int(mask.sum()), first_test, retrain_every, window, train_size
+        )
+
+    n_tasks = sum(
+        1 if name == "mlr_justbrent" and incremental_mlr else len(folds)
+        for name, folds in model_folds.items()
+    )
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, n_tasks or 1))
+    fit_kwargs = {"rf": {"n_jobs": max(1, cpus // workers)}}
+
+    tasks = []
+    for name, folds in model_folds.items():
+        if name == "mlr_justbrent" and incremental_mlr:
+            tasks.append((_run_incremental_mlr, (folds,)))
+            continue
+        for fold in folds:
+            tasks.append((_run_fold, (name, fold, params[name], fit_kwargs.get(name, {}))))
+
+    if workers == 1:
+        _init_worker(source)
+        outputs = [fn(*args) for fn, args in tasks]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(source,)
+        ) as pool:
+            futures = [pool.submit(fn, *args) for fn, args in tasks]
+            outputs = [f.result() for f in futures]
+    results = []
+    for out in outputs:
+        results.extend(out if isinstance(out, list) else [out])
+
+    pred_frames = []
+    metric_rows = []
+    for name, fold, preds in results:
+        actual = arrays[name][1][fold.test_start : fold.test_end]
+        fold_dates = dates[name]
+        pred_frames.append(
+            pd.DataFrame(
+                {
+                    "date": fold_dates[fold.test_start : fold.test_end],
+                    "model": name,
+                    "fold": fold.index,
+                    "actual": actual,
+                    "pred": preds,
+                }
+            )
+        )
+        metric_rows.append(
+            {
+                "model": name,
+                "fold": fold.index,
+                "train_start": fold_dates[fold.train_start],
+                "train_end": fold_dates[fold.train_end - 1],
+                "test_start": fold_dates[fold.test_start],
+                "test_end": fold_dates[fold.test_end - 1],
+                "n_train": fold.train_end - fold.train_start,
+                "n_test": fold.test_end - fold.test_start,
+                **regression_metrics(actual, preds),
+            }
+        )
+
+    predictions = (
+        pd.concat(pred_frames, ignore_index=True)
+        if pred_frames
+        else pd.DataFrame(columns=["date", "model", "fold", "actual", "pred"])
+    )
+    return BacktestResult(predictions, pd.DataFrame(metric_rows))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the Brent models.")
+    parser.add_argument("--models", nargs="+", choices=list(MODEL_PARAMS), default=list(MODEL_PARAMS))
+    parser.add_argument("--window", choices=["expanding", "sliding"], default="expanding")
+    parser.add_argument("--initial-train", type=int, default=500)
+    parser.add_argument(
+        "--test-start", default=None, help="first test date (overrides --initial-train)"
+    )
+    parser.add_argument("--train-size", type=int, default=None, help="sliding window length")
+    parser.add_argument("--retrain-every", type=int, default=20, help="rows between refits")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--incremental-mlr",
+        action="store_true",
+        help="refit MLR (JustBrent) from running XᵀX/Xᵀy instead of from scratch",
+    )
+    parser.add_argument("--data", default=str(DEFAULT_DATA_PATH))
+    parser.add_argument("--output", default=None, help="CSV path for the per-date predictions")
+    args = parser.parse_args(argv)
+
+    df = load_processed_data(args.data)
+    result = walk_forward(
+        df,
+        models=args.models,
+        window=args.window,
+        initial_train=args.initial_train,
+        train_size=args.train_size,
+        retrain_every=args.retrain_every,
+        workers=args.workers,
+        incremental_mlr=args.incremental_mlr,
+        test_start=args.test_start,
+    )
+    print(result.summary().to_string(index=False))
+    if args.output:
+        result.predictions.to_csv(args.output, index=False)
+        result.fold_metrics.to_csv(
+            os.path.splitext(args.output)[0] + "_folds.csv", index=False
+        )
+        print("Predictions written to:", args.output)
+
+
+if __name__ == "__main__":
+    main()
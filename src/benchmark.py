@@ -0,0 +1,279 @@
+"""Benchmarks for the data, feature, training and inference paths.
+
+Synthetic Brent (``_x``) / WTI (``_y``) OHLCV histories in the schema of
+``merged_oil_prices.csv`` are generated at multiples of the real row count and
+cached under ``data/cache/bench/``. Every stage is timed (best of
+``--repeat`` runs) and run once more under ``tracemalloc`` for its peak
+Python/NumPy allocation (buffers allocated by pyarrow are not traced).
+Training stages run once, timed and traced in the same run, so no model is
+fitted twice. Results go to a JSON file; ``--compare`` checks them against a
+stored baseline and exits non-zero on regressions.
+
+    python -m src.benchmark --scales 1 10 --output bench.json
+    python -m src.benchmark --scales 1 10 --compare bench.json
+
+Training writes into a scratch models directory, never ``models/``; tuned
+``*_params.json`` files are copied in so the shipped configurations are timed.
+Training is skipped above ``--max-train-rows`` because the RF and MLP fits at
+the largest scales take hours. Above ~60k rows the synthetic dates are hourly
+instead of business days so they stay within the ``datetime64[ns]`` range.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from src import export_models
+from src.artifacts import LazyArtifacts, predict_all
+from src.features import (
+    REPO_ROOT,
+    build_features_mlr_justbrent,
+    build_features_nn,
+    build_features_rf,
+    load_processed_data,
+)
+from src.metrics import regression_metrics
+
+
+BENCH_DIR = REPO_ROOT / "data" / "cache" / "bench"
+BASE_ROWS = 1846
+DEFAULT_SCALES = [1, 10, 100, 1000]
+MAX_DAILY_ROWS = 60_000
+DEFAULT_TOLERANCE = 0.25
+# Differences below these are timer / allocator noise, not regressions.
+MIN_DELTA = {"seconds": 0.01, "peak_bytes": 1 << 20}
+
+BUILDERS = {
+    "mlr_justbrent": build_features_mlr_justbrent,
+    "nn": build_features_nn,
+    "rf": build_features_rf,
+}
+
+
+def synthetic_prices(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    freq = "B" if n_rows <= MAX_DAILY_ROWS else "h"
+    dates = pd.date_range("1990-01-01", periods=n_rows, freq=freq)
+
+    # Brent follows a log random walk; WTI trades at a mean-reverting discount.
+    brent_close = 60.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, n_rows)))
+    spread = np.empty(n_rows)
+    spread[0] = 4.0
+    shocks = rng.normal(0.0, 0.3, n_rows)
+    for i in range(1, n_rows):
+        spread[i] = 4.0 + 0.95 * (spread[i - 1] - 4.0) + shocks[i]
+    wti_close = np.maximum(brent_close - spread, 1.0)
+
+    frame = {"date": dates}
+    for suffix, close in (("_x", brent_close), ("_y", wti_close)):
+        open_ = np.concatenate([[close[0]], close[:-1]]) * np.exp(rng.normal(0.0, 0.005, n_rows))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0.0, 0.005, n_rows)))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0.0, 0.005, n_rows)))
+        frame[f"open{suffix}"] = open_.round(2)
+        frame[f"high{suffix}"] = high.round(2)
+        frame[f"low{suffix}"] = low.round(2)
+        frame[f"close{suffix}"] = close.round(2)
+        frame[f"volume{suffix}"] = rng.integers(0, 400_000, n_rows)
+        frame[f"average{suffix}"] = ((open_ + high + low + close) / 4).round(2)
+    return pd.DataFrame(frame)
+
+
+def synthetic_csv(n_rows: int, seed: int = 0, bench_dir: Path = BENCH_DIR) -> Path:
+    path = Path(bench_dir) / f"synthetic_{n_rows}_{seed}.csv"
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df = synthetic_prices(n_rows, seed)
+    date_format = "%m/%d/%Y" if n_rows <= MAX_DAILY_ROWS else "%Y-%m-%d %H:%M:%S"
+    tmp = path.with_suffix(".tmp")
+    df.to_csv(tmp, index=False, date_format=date_format)
+    tmp.replace(path)
+    return path
+
+
+def measure(fn, repeat: int = 1, separate_trace: bool = True) -> dict:
+    """Best of ``repeat`` timed runs and the peak allocation of a traced run.
+
+    Without ``separate_trace`` (single, expensive runs) the last timed run is
+    also the traced one; its time then includes tracemalloc's overhead.
+    """
+    best = float("inf")
+    peak = None
+    for i in range(repeat):
+        traced = not separate_trace and i == repeat - 1
+        gc.collect()
+        if traced:
+            tracemalloc.start()
+        try:
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+            if traced:
+                _, peak = tracemalloc.get_traced_memory()
+        finally:
+            if traced:
+                tracemalloc.stop()
+
+    if peak is None:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {"seconds": best, "peak_bytes": int(peak)}
+
+
+@contextlib.contextmanager
+def scratch_models_dir():
+    # train_* write through export_models.MODELS_DIR; point it at a temp dir.
+    # Tuned parameters are resolved through the same directory, so they are
+    # copied along and the benchmark trains the configurations that ship.
+    original = export_models.MODELS_DIR
+    with tempfile.TemporaryDirectory(prefix="brent-bench-") as tmp:
+        for params_file in Path(original).glob("*_params.json"):
+            shutil.copy2(params_file, Path(tmp) / params_file.name)
+        export_models.MODELS_DIR = Path(tmp)
+        try:
+            yield Path(tmp)
+        finally:
+            export_models.MODELS_DIR = original
+
+
+def run_scale(scale: int, repeat: int, max_train_rows: int, seed: int = 0) -> list[dict]:
+    rows = BASE_ROWS * scale
+    path = synthetic_csv(rows, seed)
+    results = []
+
+    def record(stage: str, fn, times: int = repeat, separate_trace: bool = True):
+        stats = measure(fn, times, separate_trace)
+        results.append({"stage": stage, "scale": scale, "rows": rows, **stats})
+        print(f"{scale:>5}x {stage:<38} {stats['seconds'] * 1e3:10.2f} ms {stats['peak_bytes'] / 1e6:9.1f} MB")
+
+    def skip(stage: str, reason: str):
+        results.append({"stage": stage, "scale": scale, "rows": rows, "skipped": reason})
+        print(f"{scale:>5}x {stage:<38} skipped: {reason}")
+
+    record("load_processed_data", lambda: load_processed_data(path))
+    df = load_processed_data(path)
+
+    built = {}
+    for name, builder in BUILDERS.items():
+        record(f"build_features_{name}", lambda b=builder: b(df))
+        built[name] = builder(df)
+
+    if rows <= max_train_rows:
+        with scratch_models_dir():
+            for name, trainer in export_models.TRAINERS.items():
+                record(f"train_{name}", lambda t=trainer: t(df), times=1, separate_trace=False)
+    else:
+        for name in export_models.TRAINERS:
+            skip(f"train_{name}", f"rows > max_train_rows ({max_train_rows})")
+
+    artifacts = LazyArtifacts()
+    for name, (_, X, y, _) in built.items():
+        stage = f"predict_all[{name}]"
+        if not artifacts.exists(name):
+            skip(stage, "model artifacts missing")
+            continue
+        bundle = artifacts.get(name)
+        record(stage, lambda b=bundle, X=X: predict_all(b, X))
+
+    _, _, y, _ = built["mlr_justbrent"]
+    y_true = y.to_numpy()
+    y_pred = y_true + np.random.default_rng(seed).normal(0.0, 1.0, len(y_true))
+    record("regression_metrics", lambda: regression_metrics(y_true, y_pred))
+    return results
+
+
+def environment() -> dict:
+    return {
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def compare(current: list[dict], baseline: list[dict], tolerance: float = DEFAULT_TOLERANCE) -> list[dict]:
+    """Stages slower, or with a higher peak, than the baseline by more than ``tolerance``."""
+    base = {(r["stage"], r["scale"]): r for r in baseline if "seconds" in r}
+    regressions = []
+    for row in current:
+        old = base.get((row["stage"], row["scale"]))
+        if old is None or "seconds" not in row:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            if (
+                old[metric] > 0
+                and row[metric] > old[metric] * (1 + tolerance)
+                and row[metric] - old[metric] > MIN_DELTA[metric]
+            ):
+                regressions.append(
+                    {
+                        "stage": row["stage"],
+                        "scale": row["scale"],
+                        "metric": metric,
+                        "baseline": old[metric],
+                        "current": row[metric],
+                        "ratio": row[metric] / old[metric],
+                    }
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Brent pipeline on synthetic data.")
+    parser.add_argument("--scales", nargs="+", type=int, default=DEFAULT_SCALES)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage (best is kept)")
+    parser.add_argument("--max-train-rows", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON results path")
+    parser.add_argument("--compare", default=None, help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    results = []
+    for scale in args.scales:
+        results.extend(run_scale(scale, args.repeat, args.max_train_rows, args.seed))
+
+    report = {"environment": environment(), "base_rows": BASE_ROWS, "results": results}
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print("Benchmark results written to:", args.output)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for r in regressions:
+            print(
+                f"REGRESSION {r['stage']} @ {r['scale']}x {r['metric']}: "
+                f"{r['baseline']:.4g} -> {r['current']:.4g} ({r['ratio']:.2f}x)"
+            )
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
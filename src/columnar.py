@@ -0,0 +1,258 @@
+"""Typed Arrow IPC copy of the processed dataset.
+
+``data_preprocessing.save_data`` writes ``merged_oil_prices.arrow`` next to the
+CSV with an explicit schema (timestamp dates, float prices, int volumes) and
+``features.load_processed_data`` memory-maps it when it is fresh. The file's
+footer metadata records the size, mtime and SHA-256 of the CSV it was written
+from, and the Arrow copy counts as fresh only while the CSV still matches, so
+checkouts or copies that reorder mtimes cannot serve stale data. The CSV is
+only hashed when its size matches but its mtime does not, and that digest is
+kept per ``(size, mtime_ns)`` for the rest of the process. pyarrow is
+optional; without it everything keeps using the CSV.
+
+Convert an existing CSV with::
+
+    python -m src.columnar [path/to/merged_oil_prices.csv] [--float32]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pcsv
+    import pyarrow.ipc as ipc
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pcsv = None
+    ipc = None
+
+
+# The committed CSV stores US-style dates such as 11/2/2017.
+CSV_DATE_FORMAT = "%m/%d/%Y"
+
+
+def date_format_for(sample) -> str:
+    """``pd.to_datetime`` format for dates written like ``sample``: US-style or ISO."""
+    return CSV_DATE_FORMAT if "/" in str(sample) else "ISO8601"
+
+
+PRICE_COLUMNS = [
+    "open_x",
+    "high_x",
+    "low_x",
+    "close_x",
+    "average_x",
+    "open_y",
+    "high_y",
+    "low_y",
+    "close_y",
+    "average_y",
+]
+VOLUME_COLUMNS = ["volume_x", "volume_y"]
+CSV_DTYPES = {
+    **{col: "float64" for col in PRICE_COLUMNS},
+    **{col: "int64" for col in VOLUME_COLUMNS},
+}
+
+
+SOURCE_SIZE_KEY = b"source_csv_size"
+SOURCE_MTIME_KEY = b"source_csv_mtime_ns"
+SOURCE_SHA256_KEY = b"source_csv_sha256"
+
+# (path, size, mtime_ns) -> SHA-256 hex digest, so a file is hashed once per change.
+_DIGESTS = {}
+_DIGESTS_LOCK = threading.Lock()
+
+
+def _sha256(csv_path: Path, stat) -> bytes:
+    key = (str(csv_path.resolve()), stat.st_size, stat.st_mtime_ns)
+    with _DIGESTS_LOCK:
+        cached = _DIGESTS.get(key)
+    if cached is not None:
+        return cached
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    value = digest.hexdigest().encode()
+    with _DIGESTS_LOCK:
+        _DIGESTS[key] = value
+    return value
+
+
+def source_stamp(csv_path: Path | str) -> dict[bytes, bytes]:
+    """Footer metadata identifying the CSV an Arrow copy was written from."""
+    csv_path = Path(csv_path)
+    stat = csv_path.stat()
+    return {
+        SOURCE_SIZE_KEY: str(stat.st_size).encode(),
+        SOURCE_MTIME_KEY: str(stat.st_mtime_ns).encode(),
+        SOURCE_SHA256_KEY: _sha256(csv_path, stat),
+    }
+
+
+def available() -> bool:
+    return pa is not None
+
+
+def arrow_path_for(csv_path: Path | str) -> Path:
+    return Path(csv_path).with_suffix(".arrow")
+
+
+def processed_schema(columns, float32_prices: bool = False):
+    price_type = pa.float32() if float32_prices else pa.float64()
+    fields = []
+    for col in columns:
+        if col == "date":
+            fields.append(pa.field("date", pa.timestamp("ns"), nullable=False))
+        elif col in VOLUME_COLUMNS:
+            fields.append(pa.field(col, pa.int64()))
+        elif col in PRICE_COLUMNS:
+            fields.append(pa.field(col, price_type))
+        else:
+            fields.append(pa.field(col, pa.float64()))
+    return pa.schema(fields)
+
+
+class ArrowBatchWriter:
+    """Append DataFrame batches to an Arrow IPC file without holding them all.
+
+    The schema comes from the first batch; the file appears atomically on
+    ``close``. ``close(source=...)`` stamps the footer with the CSV the batches
+    were also written to (see ``is_fresh``).
+    """
+
+    def __init__(self, path: Path | str, float32_prices: bool = False):
+        if pa is None:
+            raise ImportError("pyarrow is required to write the columnar dataset")
+        self.path = Path(path)
+        self.float32_prices = float32_prices
+        self._tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        self._sink = None
+        self._writer = None
+        self._schema = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        frame = df.copy()
+        frame["date"] = pd.to_datetime(frame["date"]).astype("datetime64[ns]")
+        if self._writer is None:
+            self._schema = processed_schema(frame.columns, self.float32_prices)
+            self._sink = pa.OSFile(str(self._tmp), "wb")
+            # Uncompressed IPC file so readers can map the buffers directly.
+            self._writer = ipc.new_file(self._sink, self._schema)
+        table = pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def close(self, source: Path | str | None = None) -> Path:
+        if self._writer is None:
+            raise ValueError("No batches were written")
+        self._writer.close()
+        self._sink.close()
+        self._writer = None
+        if source is None:
+            self._tmp.replace(self.path)
+            return self.path
+        # Footer metadata is fixed when an IPC file is opened, and the CSV is
+        # only complete now; copy the batches into a stamped file one by one.
+        stamped = self.path.with_suffix(self.path.suffix + ".stamped")
+        try:
+            with pa.memory_map(str(self._tmp), "r") as src:
+                reader = ipc.open_file(src)
+                with pa.OSFile(str(stamped), "wb") as sink:
+                    with ipc.new_file(sink, reader.schema, metadata=source_stamp(source)) as writer:
+                        for i in range(reader.num_record_batches):
+                            writer.write_batch(reader.get_batch(i))
+            stamped.replace(self.path)
+        finally:
+            stamped.unlink(missing_ok=True)
+            self._tmp.unlink(missing_ok=True)
+        return self.path
+
+    def abort(self) -> None:
+        """Drop the partial file; the existing ``path`` is left untouched."""
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+            self._writer = None
+        self._tmp.unlink(missing_ok=True)
+
+
+def write_arrow(
+    df: pd.DataFrame, path: Path | str, float32_prices: bool = False, source: Path | str | None = None
+) -> Path:
+    writer = ArrowBatchWriter(path, float32_prices)
+    writer.write(df)
+    return writer.close(source)
+
+
+def read_arrow(path: Path | str) -> pd.DataFrame:
+    if pa is None:
+        raise ImportError("pyarrow is required to read the columnar dataset")
+    with pa.memory_map(str(path), "r") as source:
+        table = ipc.open_file(source).read_all()
+    # split_blocks keeps each numeric column a zero-copy view of the mapping.
+    return table.to_pandas(split_blocks=True)
+
+
+def read_csv(path: Path | str) -> pd.DataFrame:
+    if pa is None:
+        raise ImportError("pyarrow is required for the typed CSV reader")
+    header = pd.read_csv(path, nrows=0).columns
+    schema = processed_schema(header)
+    options = pcsv.ConvertOptions(
+        column_types={field.name: field.type for field in schema},
+        timestamp_parsers=[CSV_DATE_FORMAT, pcsv.ISO8601],
+    )
+    table = pcsv.read_csv(str(path), convert_options=options)
+    return table.to_pandas(split_blocks=True)
+
+
+def is_fresh(arrow_path: Path | str, csv_path: Path | str) -> bool:
+    """Whether ``arrow_path`` was written from the current contents of ``csv_path``.
+
+    Files without a source stamp (written before stamping existed) are stale.
+    """
+    arrow_path, csv_path = Path(arrow_path), Path(csv_path)
+    if not arrow_path.exists():
+        return False
+    if not csv_path.exists():
+        return True
+    try:
+        with pa.memory_map(str(arrow_path), "r") as source:
+            metadata = ipc.open_file(source).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return False
+    if SOURCE_SIZE_KEY not in metadata or SOURCE_SHA256_KEY not in metadata:
+        return False
+    # Size and mtime are free; hash only when the size matches but the mtime
+    # moved (a checkout, copy or touch that may or may not change the content).
+    stat = csv_path.stat()
+    if int(metadata[SOURCE_SIZE_KEY]) != stat.st_size:
+        return False
+    if metadata.get(SOURCE_MTIME_KEY) == str(stat.st_mtime_ns).encode():
+        return True
+    return _sha256(csv_path, stat) == metadata[SOURCE_SHA256_KEY]
+
+
+def main():
+    from src.features import DEFAULT_DATA_PATH, load_processed_data
+
+    parser = argparse.ArgumentParser(description="Write the Arrow copy of a processed CSV.")
+    parser.add_argument("csv", nargs="?", default=str(DEFAULT_DATA_PATH))
+    parser.add_argument("--float32", action="store_true", help="store prices as float32")
+    args = parser.parse_args()
+
+    df = load_processed_data(args.csv, prefer_columnar=False)
+    out = write_arrow(df, arrow_path_for(args.csv), float32_prices=args.float32, source=args.csv)
+    print("Columnar dataset written to:", out)
+
+
+if __name__ == "__main__":
+    main()
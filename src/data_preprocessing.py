@@ -1,54 +1,282 @@
 import pandas as pd
+import heapq
+import itertools
 import os
+import tempfile
+
+try:
+    from src import columnar, tracing
+except ImportError:  # รันแบบ `python src/data_preprocessing.py`
+    import columnar
+    import tracing
 
 # --- Configuration ---
 # กำหนด Path ของไฟล์ (โดยอ้างอิงจาก Root Directory ของโปรเจกต์)
 RAW_PATH = 'data/raw/'
 PROCESSED_PATH = 'data/processed/'
 OUTPUT_FILENAME = 'merged_oil_prices.csv'
+# เขียนไฟล์ Arrow (คอลัมน์มี type ชัดเจน) คู่กับ CSV เพื่อให้โหลดเร็วขึ้น
+WRITE_COLUMNAR = True
+# เก็บราคาเป็น float32 เพื่อลดขนาดไฟล์ (ค่าเริ่มต้นใช้ float64 ให้ตรงกับ CSV)
+COLUMNAR_FLOAT32 = False
+
+# รายชื่อตราสารที่จะรวมกัน (ตัวแรกคือตัวหลัก)
+# ทุกคอลัมน์ยกเว้น date จะถูกต่อท้ายด้วย suffix ของตราสารนั้น
+# Brent = _x และ WTI = _y เพื่อให้ตรงกับที่ src/features.py ใช้อยู่
+INSTRUMENTS = [
+    {'name': 'brent', 'file': 'brent_prices.csv', 'suffix': '_x'},
+    {'name': 'wti', 'file': 'wti_prices.csv', 'suffix': '_y'},
+    # เพิ่มตราสารอื่นได้ เช่น
+    # {'name': 'dubai', 'file': 'dubai_prices.csv', 'suffix': '_dubai'},
+    # {'name': 'dxy', 'file': 'dxy.csv', 'suffix': '_dxy'},
+]
+# วิธีจับคู่วันที่
+# 'inner' = เอาเฉพาะวันที่มีข้อมูลครบทุกตราสาร
+# 'asof'  = ทุกวันของตราสารหลัก ใช้ค่าล่าสุด (ไม่เกินวันนั้น) ของตราสารอื่น
+ALIGNMENT = 'inner'
+# (asof) ค่าของตราสารอื่นเก่าได้ไม่เกินกี่วัน (None = ไม่จำกัด)
+ASOF_TOLERANCE_DAYS = None
+# อ่าน/เขียนทีละกี่แถว (หน่วยความจำขึ้นกับค่านี้ ไม่ใช่ขนาดไฟล์)
+CHUNK_SIZE = 50_000
+# จำนวนแถวที่อ่านจากแต่ละ run ตอนเรียงไฟล์ที่ไม่ได้เรียงวันที่มา
+RUN_READ_ROWS = 4_096
+# รูปแบบวันที่ในไฟล์ดิบ เช่น '%m/%d/%Y' หรือ 'ISO8601'
+# None = ดูจากแถวแรกของแต่ละไฟล์ครั้งเดียว แล้วใช้รูปแบบนั้นกับทุก chunk
+DATE_FORMAT = None
+
+
+def _read_chunks(path, chunksize, columns=None, date_format=None):
+    """อ่าน CSV ทีละ chunk และแปลงคอลัมน์ date เป็น datetime
 
-def load_and_clean_data():
+    ใช้ format เดียวกันทั้งไฟล์ (ไม่เดารูปแบบใหม่ทุก chunk ซึ่งช้าและอาจตีความวันที่ต่างกัน)
+    date_format=None จะใช้ DATE_FORMAT (สำหรับไฟล์ดิบ) ไฟล์ run ที่เราเขียนเองส่ง 'ISO8601'
+    ทุก chunk ถูกจัดให้ date เป็นคอลัมน์แรก ตามด้วยคอลัมน์อื่นตามลำดับใน header
     """
-    ฟังก์ชันสำหรับโหลดข้อมูลดิบ, ทำความสะอาด, และรวมไฟล์
+    date_format = DATE_FORMAT if date_format is None else date_format
+    for chunk in pd.read_csv(path, chunksize=chunksize, usecols=columns):
+        if date_format is None and len(chunk):
+            date_format = columnar.date_format_for(chunk['date'].iloc[0])
+        chunk['date'] = pd.to_datetime(chunk['date'], format=date_format)
+        yield chunk[_date_first(chunk.columns)]
+
+
+def _date_first(columns):
+    """ลำดับคอลัมน์ที่ date อยู่หน้าสุด (แถวใน merge ใช้ row[0] เป็นวันที่)"""
+    return ['date'] + [col for col in columns if col != 'date']
+
+
+def _is_ascending(path, chunksize):
+    """อ่านเฉพาะคอลัมน์ date หนึ่งรอบ เพื่อเช็กว่าไฟล์เรียงวันที่จากเก่าไปใหม่แล้วหรือยัง"""
+    last = None
+    for chunk in _read_chunks(path, chunksize, columns=['date']):
+        dates = chunk['date']
+        if not dates.is_monotonic_increasing or (last is not None and dates.iloc[0] < last):
+            return False
+        last = dates.iloc[-1]
+    return True
+
+
+def _sorted_rows(path, chunksize, tmpdir):
+    """คืนแถว (date, values) เรียงตามวันที่ โดยใช้หน่วยความจำไม่เกินราว ๆ หนึ่ง chunk
+
+    ไฟล์ที่เรียงมาแล้วจะอ่านผ่านตรง ๆ ส่วนไฟล์อื่น (เช่น เรียงใหม่ -> เก่า)
+    จะถูกเรียงแบบ external sort: เรียงทีละ chunk เขียนเป็น run ลงไฟล์ชั่วคราว
+    แล้วรวม run ทั้งหมดด้วย heapq.merge
+    """
+    if _is_ascending(path, chunksize):
+        for chunk in _read_chunks(path, chunksize):
+            yield from chunk.itertuples(index=False, name=None)
+        return
+
+    runs = []
+    for i, chunk in enumerate(_read_chunks(path, chunksize)):
+        run_path = os.path.join(tmpdir, f"{os.path.basename(path)}.{i}.csv")
+        chunk.sort_values('date', kind='stable').to_csv(run_path, index=False)
+        runs.append(run_path)
+
+    def run_rows(run_path):
+        # run เขียนด้วย to_csv จึงเป็น ISO เสมอ ไม่ว่าไฟล์ดิบจะใช้รูปแบบไหน
+        for chunk in _read_chunks(run_path, RUN_READ_ROWS, date_format='ISO8601'):
+            yield from chunk.itertuples(index=False, name=None)
+
+    yield from heapq.merge(*(run_rows(r) for r in runs), key=lambda row: row[0])
+
+
+def _instrument_stream(k, rows, counts):
+    """แปลงแถวเป็น (date, k, values) เพื่อเข้า k-way merge"""
+    for row in rows:
+        counts[k] += 1
+        yield row[0], k, row[1:]
+
+
+def instrument_columns(instruments=None):
+    """ชื่อคอลัมน์ผลลัพธ์ (date + คอลัมน์ของแต่ละตราสารพร้อม suffix)"""
+    instruments = INSTRUMENTS if instruments is None else instruments
+    columns = ['date']
+    for inst in instruments:
+        path = os.path.join(RAW_PATH, inst['file'])
+        header = pd.read_csv(path, nrows=0).columns
+        if 'date' not in header:
+            raise ValueError(f"Missing required column 'date' in {path}")
+        columns += [f"{col}{inst['suffix']}" for col in _date_first(header)[1:]]
+    if len(set(columns)) != len(columns):
+        raise ValueError("Instrument suffixes must give unique column names")
+    return columns
+
+
+def merge_instruments(instruments=None, alignment=None, chunksize=None, tolerance_days=None, counts=None):
+    """รวมไฟล์ของทุกตราสารตามวันที่แบบ streaming k-way merge
+
+    คืนค่า DataFrame ทีละ batch (ไม่เกิน chunksize แถว) เรียงตามวันที่
     """
-    print("🔄 Loading raw data...")
-    
+    instruments = INSTRUMENTS if instruments is None else instruments
+    alignment = ALIGNMENT if alignment is None else alignment
+    chunksize = CHUNK_SIZE if chunksize is None else chunksize
+    tolerance_days = ASOF_TOLERANCE_DAYS if tolerance_days is None else tolerance_days
+    if alignment not in ('inner', 'asof'):
+        raise ValueError(f"Unknown alignment: {alignment}")
+    if not instruments:
+        raise ValueError("At least one instrument is required")
+
     # 1. เช็กก่อนว่าไฟล์มีอยู่จริงไหม
-    brent_path = os.path.join(RAW_PATH, 'brent_prices.csv')
-    wti_path = os.path.join(RAW_PATH, 'wti_prices.csv')
-    
-    if not os.path.exists(brent_path) or not os.path.exists(wti_path):
-        raise FileNotFoundError(f"❌ ไม่พบไฟล์ข้อมูลใน {RAW_PATH} กรุณาเช็กชื่อไฟล์หรือตำแหน่งโฟลเดอร์")
-
-    # 2. อ่านไฟล์ CSV
-    df_brent = pd.read_csv(brent_path)
-    df_wti = pd.read_csv(wti_path)
-
-    # 3. แปลงคอลัมน์ Date ให้เป็น format วันที่จริงๆ (Datetime Object)
-    # เพื่อให้ Python เข้าใจว่านี่คือ "เวลา" ไม่ใช่แค่ตัวหนังสือ
-    df_brent['date'] = pd.to_datetime(df_brent['date'])
-    df_wti['date'] = pd.to_datetime(df_wti['date'])
-
-    # 4. เปลี่ยนชื่อคอลัมน์ราคา (Price) ให้ชัดเจนก่อนรวม
-    # จากเดิมชื่อ 'Price' เหมือนกันทั้งคู่ เดี๋ยวจะงง
-    df_brent = df_brent.rename(columns={'Price': 'Brent_Price'})
-    df_wti = df_wti.rename(columns={'Price': 'WTI_Price'})
-
-    print(f"   - Brent data points: {len(df_brent)}")
-    print(f"   - WTI data points:   {len(df_wti)}")
-
-    # 5. Merge ข้อมูล (Inner Join)
-    # ใช้ 'inner' เพื่อเอาเฉพาะวันที่ 'มีข้อมูลทั้งคู่' เท่านั้น
-    # (ตัดวันที่ตลาดฝั่งใดฝั่งหนึ่งปิดออกไป เพื่อป้องกัน Missing Value)
-    print("🔄 Merging datasets...")
-    df_merged = pd.merge(df_brent, df_wti, on='date', how='inner')
-
-    # 6. เรียงลำดับตามวันที่ (เก่า -> ใหม่)
-    df_merged = df_merged.sort_values(by='date').reset_index(drop=True)
-    
+    paths = [os.path.join(RAW_PATH, inst['file']) for inst in instruments]
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        raise FileNotFoundError(f"❌ ไม่พบไฟล์ข้อมูลใน {RAW_PATH}: {missing} กรุณาเช็กชื่อไฟล์หรือตำแหน่งโฟลเดอร์")
+
+    columns = instrument_columns(instruments)
+    n = len(instruments)
+    counts = [0] * n if counts is None else counts
+    tolerance = None if tolerance_days is None else pd.Timedelta(days=tolerance_days)
+
+    with tempfile.TemporaryDirectory(prefix='brent_merge_') as tmpdir:
+        streams = [
+            _instrument_stream(k, _sorted_rows(path, chunksize, tmpdir), counts)
+            for k, path in enumerate(paths)
+        ]
+        # 2. k-way merge: heap เก็บแถวถัดไปของแต่ละตราสาร (ตราสารละหนึ่งแถว)
+        merged = heapq.merge(*streams, key=lambda item: (item[0], item[1]))
+
+        batch = []
+        latest = [None] * n  # (date, values) ล่าสุดของแต่ละตราสาร (ใช้กับ asof)
+        group_date = None
+        group = [[] for _ in range(n)]  # แถวของวันที่ปัจจุบัน แยกตามตราสาร
+
+        def flush_group():
+            if group_date is None:
+                return
+            if alignment == 'inner':
+                # เอาเฉพาะวันที่ 'มีข้อมูลครบทุกตราสาร'
+                # (วันที่ซ้ำในไฟล์ให้ผลเหมือน pd.merge คือจับคู่ทุกแบบ)
+                if all(group):
+                    batch.extend(_row(group_date, combo) for combo in itertools.product(*group))
+                return
+            for k, rows in enumerate(group):
+                if rows:
+                    latest[k] = (group_date, rows[-1])
+            if not group[0] or any(item is None for item in latest[1:]):
+                return
+            if tolerance is not None and any(group_date - d > tolerance for d, _ in latest[1:]):
+                return
+            # ทุกแถวของตราสารหลักในวันนั้น + ค่าล่าสุดของตราสารอื่น
+            others = [values for _, values in latest[1:]]
+            batch.extend(_row(group_date, [values] + others) for values in group[0])
+
+        for date, k, values in merged:
+            if date != group_date:
+                flush_group()
+                group_date = date
+                group = [[] for _ in range(n)]
+            group[k].append(values)
+            if len(batch) >= chunksize:
+                yield pd.DataFrame(batch, columns=columns)
+                batch = []
+        flush_group()
+        if batch:
+            yield pd.DataFrame(batch, columns=columns)
+
+
+def _row(date, groups):
+    row = [date]
+    for values in groups:
+        row.extend(values)
+    return row
+
+
+@tracing.traced()
+def load_and_clean_data(instruments=None, alignment=None):
+    """
+    ฟังก์ชันสำหรับโหลดข้อมูลดิบ, ทำความสะอาด, และรวมไฟล์
+    (รวมผลทุก batch เป็น DataFrame เดียว ถ้าไฟล์ใหญ่มากให้ใช้ stream_and_save แทน)
+    """
+    print("🔄 Loading and merging raw data...")
+    instruments = INSTRUMENTS if instruments is None else instruments
+    counts = [0] * len(instruments)
+    with tracing.span("data_preprocessing.merge"):
+        batches = list(merge_instruments(instruments, alignment, counts=counts))
+    if batches:
+        df_merged = pd.concat(batches, ignore_index=True)
+    else:
+        df_merged = pd.DataFrame(columns=instrument_columns(instruments))
+
+    for inst, count in zip(instruments, counts):
+        print(f"   - {inst['name']} data points: {count}")
     print(f"✅ Merge complete! Total matched records: {len(df_merged)}")
     return df_merged
 
+
+@tracing.traced()
+def stream_and_save(instruments=None, alignment=None):
+    """
+    รวมไฟล์แล้วเขียนผลลง processed ทีละ batch (ไม่ต้องเก็บทั้งตารางไว้ในหน่วยความจำ)
+    คืนค่า (จำนวนแถว, ตัวอย่าง 5 แถวแรก)
+    """
+    print("🔄 Streaming merge of raw data...")
+    instruments = INSTRUMENTS if instruments is None else instruments
+    counts = [0] * len(instruments)
+    os.makedirs(PROCESSED_PATH, exist_ok=True)
+    output_path = os.path.join(PROCESSED_PATH, OUTPUT_FILENAME)
+    tmp_path = output_path + '.tmp'
+
+    arrow_writer = None
+    if WRITE_COLUMNAR and columnar.available():
+        arrow_writer = columnar.ArrowBatchWriter(
+            columnar.arrow_path_for(output_path), float32_prices=COLUMNAR_FLOAT32
+        )
+
+    total = 0
+    preview = None
+    try:
+        with tracing.span("data_preprocessing.merge"):
+            with open(tmp_path, 'w', newline='') as out:
+                for batch in merge_instruments(instruments, alignment, counts=counts):
+                    batch.to_csv(out, index=False, header=(total == 0))
+                    if arrow_writer is not None:
+                        arrow_writer.write(batch)
+                    if preview is None:
+                        preview = batch.head()
+                    total += len(batch)
+        if total == 0:
+            raise ValueError("No matching dates across the instruments")
+    except BaseException:
+        # ลบไฟล์ชั่วคราวที่เขียนไม่ครบ ไฟล์ผลลัพธ์เดิมยังอยู่เหมือนเดิม
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if arrow_writer is not None:
+            arrow_writer.abort()
+        raise
+    os.replace(tmp_path, output_path)
+
+    for inst, count in zip(instruments, counts):
+        print(f"   - {inst['name']} data points: {count}")
+    print(f"✅ Merge complete! Total matched records: {total}")
+    print(f"💾 Saved processed data to: {output_path}")
+    if arrow_writer is not None:
+        print(f"💾 Saved columnar data to: {arrow_writer.close(source=output_path)}")
+    return total, preview
+
+
+@tracing.traced()
 def save_data(df):
     """
     ฟังก์ชันสำหรับบันทึกไฟล์ลงโฟลเดอร์ processed
@@ -63,18 +291,26 @@ def save_data(df):
     df.to_csv(output_path, index=False)
     print(f"💾 Saved processed data to: {output_path}")
 
+    # บันทึกเป็น Arrow IPC (ต้องมี pyarrow) ถ้าไม่มีก็ใช้ CSV อย่างเดียว
+    if WRITE_COLUMNAR and columnar.available():
+        arrow_path = columnar.write_arrow(
+            df, columnar.arrow_path_for(output_path), float32_prices=COLUMNAR_FLOAT32, source=output_path
+        )
+        print(f"💾 Saved columnar data to: {arrow_path}")
+
 # --- Main Execution ---
 if __name__ == "__main__":
     try:
-        # เรียกใช้ฟังก์ชัน
-        merged_df = load_and_clean_data()
-        
+        # รวมและบันทึกทีละ batch (หน่วยความจำคงที่ไม่ว่าไฟล์จะใหญ่แค่ไหน)
+        total, preview = stream_and_save()
+
         # (Optional) เช็กดูหน้าตาข้อมูล 5 บรรทัดแรก
         print("\n--- Preview Data ---")
-        print(merged_df.head())
-        
-        save_data(merged_df)
+        print(preview)
+
         print("\n✨ Data preprocessing finished successfully!")
-        
+        # BRENT_TRACE=1 BRENT_TRACE_OUT=... จะบันทึกเวลาแต่ละขั้นตอน
+        tracing.export_from_env()
+
     except Exception as e:
-        print(f"\n❌ Error occurred: {e}")
\ No newline at end of file
+        print(f"\n❌ Error occurred: {e}")
@@ -0,0 +1,110 @@
+"""Weighted ensemble of the MLR (JustBrent), RF and NN models.
+
+All three models read their inputs from one shared feature pass
+(``load_features``) and are scored concurrently in a thread pool; NumPy and
+sklearn release the GIL in their heavy loops, so the ensemble takes roughly
+as long as its slowest member. Predictions are combined with weights
+proportional to ``1 / MSE`` on each model's validation split from
+``models/*_meta.json``. RF is exported without one, so its out-of-bag MSE is
+used; no member's weight looks at the test split the ensemble is scored on.
+If a member's meta has no such metrics (an incremental refit saved without a
+held-out split, or an RF exported before OOB scoring), all members get equal
+weights.
+Rows where a member has no prediction use the remaining members with their
+weights renormalised.
+"""
+
+from __future__ import annotations
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.artifacts import MODELS_DIR, LazyArtifacts
+from src.feature_spec import MODEL_SPECS
+from src.model_registry import resolve_dir
+
+
+ENSEMBLE_MODELS = ("mlr_justbrent", "rf", "nn")
+
+
+def load_weights(models_dir: Path | str = MODELS_DIR, models=ENSEMBLE_MODELS) -> dict[str, float]:
+    inverse = {}
+    for name in models:
+        meta_path = resolve_dir(models_dir, name) / f"{name}_meta.json"
+        if not meta_path.exists():
+            raise FileNotFoundError(f"Missing model metadata: {meta_path}")
+        metrics = json.loads(meta_path.read_text(encoding="utf-8"))["metrics"]
+        split = metrics.get("val") or metrics.get("oob")
+        if split is None:
+            return {name: 1.0 / len(models) for name in models}
+        inverse[name] = 1.0 / max(float(split["MSE"]), 1e-12)
+    total = sum(inverse.values())
+    return {name: w / total for name, w in inverse.items()}
+
+
+def ensemble_view(df: pd.DataFrame, features, models=ENSEMBLE_MODELS):
+    """``(data_full, X_full, target, clean_mask)`` over the union of the members' features."""
+    frames = []
+    seen = set()
+    clean = np.ones(len(df), dtype=bool)
+    for name in models:
+        X_values, y_values = features.view(name)
+        cols = MODEL_SPECS[name].feature_cols
+        keep = [i for i, c in enumerate(cols) if c not in seen]
+        seen.update(cols)
+        frames.append(pd.DataFrame(np.asarray(X_values)[:, keep], columns=[cols[i] for i in keep], index=df.index))
+        clean &= np.asarray(features.clean_mask(name))
+    # Every member predicts the next Brent close; the first target stands for all.
+    target = pd.Series(np.asarray(features.view(models[0])[1]), index=df.index, name="target")
+    X_full = pd.concat(frames, axis=1)
+    derived = [c for c in X_full.columns if c not in df.columns]
+    data_full = pd.concat([df, X_full[derived], target], axis=1)
+    return data_full, X_full, target, clean
+
+
+class Ensemble:
+    def __init__(
+        self,
+        artifacts: LazyArtifacts | None = None,
+        models=ENSEMBLE_MODELS,
+        weights: dict[str, float] | None = None,
+        max_workers: int | None = None,
+    ):
+        self.artifacts = artifacts or LazyArtifacts()
+        self.models = tuple(models)
+        self.weights = weights or load_weights(self.artifacts.models_dir, self.models)
+        self.max_workers = max_workers or len(self.models)
+
+    def _predict_one(self, name: str, features) -> np.ndarray:
+        X_values = np.asarray(features.view(name)[0])
+        valid = ~np.isnan(X_values).any(axis=1)
+        preds = np.full(len(X_values), np.nan)
+        if valid.any():
+            bundle = self.artifacts.get(name)
+            X = pd.DataFrame(X_values[valid], columns=MODEL_SPECS[name].feature_cols)
+            if bundle["scaler"] is not None:
+                X = bundle["scaler"].transform(X)
+            preds[valid] = bundle["model"].predict(X)
+        return preds
+
+    def predict_each(self, features) -> dict[str, np.ndarray]:
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {name: pool.submit(self._predict_one, name, features) for name in self.models}
+            return {name: f.result() for name, f in futures.items()}
+
+    def combine(self, member_preds: dict[str, np.ndarray]) -> np.ndarray:
+        stacked = np.vstack([member_preds[name] for name in self.models])
+        w = np.array([self.weights[name] for name in self.models])[:, None]
+        present = ~np.isnan(stacked)
+        weight_sum = (w * present).sum(axis=0)
+        total = np.where(present, stacked * w, 0.0).sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(weight_sum > 0, total / weight_sum, np.nan)
+
+    def predict(self, features):
+        member_preds = self.predict_each(features)
+        return self.combine(member_preds), member_preds
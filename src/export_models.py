@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+import argparse
 import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
 
@@ -10,7 +14,9 @@ from sklearn.linear_model import LinearRegression
 from sklearn.neural_network import MLPRegressor
 from sklearn.preprocessing import StandardScaler
 
+from src.feature_spec import spec_fingerprint
 from src.features import (
+    DEFAULT_DATA_PATH,
     load_processed_data,
     build_features_mlr_justbrent,
     build_features_nn,
@@ -18,45 +24,180 @@ from src.features import (
     split_train_val_test,
     split_train_test,
 )
+from src.feature_store import frame_fingerprint, load_features
+from src.fused_inference import FusedLinear, FusedMLP, save_fused
 from src.metrics import regression_metrics
+from src.model_registry import ModelRegistry, config_key, library_versions
+from src.rf_compact import CompactForest
+from src.tracing import export_from_env, span, traced
 
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 MODELS_DIR = REPO_ROOT / "models"
 MODELS_DIR.mkdir(exist_ok=True)
 
+MLR_JUSTBRENT_PARAMS = {
+    "fit_intercept": True,
+}
 
-def _save_meta(name: str, feature_cols, split_sizes, metrics):
+RF_PARAMS = {
+    "n_estimators": 100,
+    "max_depth": None,
+    "min_samples_split": 2,
+    "min_samples_leaf": 1,
+    "random_state": 42,
+    # RF has no validation split; its out-of-bag error weights it in src.ensemble.
+    "oob_score": True,
+}
+
+NN_PARAMS = {
+    "hidden_layer_sizes": (64, 32, 16),
+    "activation": "relu",
+    "solver": "adam",
+    "alpha": 0.001,
+    "batch_size": "auto",
+    "learning_rate": "adaptive",
+    "learning_rate_init": 0.001,
+    "max_iter": 200,
+    "shuffle": True,
+    "random_state": 42,
+    "early_stopping": True,
+    "validation_fraction": 0.15,
+    "n_iter_no_change": 10,
+}
+
+MODEL_PARAMS = {
+    "mlr_justbrent": MLR_JUSTBRENT_PARAMS,
+    "rf": RF_PARAMS,
+    "nn": NN_PARAMS,
+}
+
+MODEL_ARTIFACTS = {
+    "mlr_justbrent": [
+        "mlr_justbrent_model.pkl",
+        "mlr_justbrent_scaler.pkl",
+        "mlr_justbrent_fused.npz",
+    ],
+    "rf": ["rf_model.pkl", "rf_compact.npz"],
+    "nn": ["nn_model.pkl", "nn_scaler.pkl", "nn_fused.npz"],
+}
+
+
+def tuned_params_path(name: str) -> Path:
+    return MODELS_DIR / f"{name}_params.json"
+
+
+def model_params(name: str) -> dict:
+    # Overrides written by src.hyperparam_search take precedence over the defaults.
+    params = dict(MODEL_PARAMS[name])
+    path = tuned_params_path(name)
+    if path.exists():
+        tuned = json.loads(path.read_text(encoding="utf-8"))
+        if "hidden_layer_sizes" in tuned:
+            tuned["hidden_layer_sizes"] = tuple(tuned["hidden_layer_sizes"])
+        params.update(tuned)
+    return params
+
+
+def save_tuned_params(name: str, params: dict) -> Path:
+    path = tuned_params_path(name)
+    path.write_text(json.dumps(_json_params(params), indent=2), encoding="utf-8")
+    return path
+
+
+def _json_params(params: dict) -> dict:
+    # Round-trips through JSON so tuples compare equal to the stored lists.
+    return json.loads(json.dumps(params))
+
+
+def registry_config(name: str, fingerprint: str) -> dict:
+    # Everything that determines the exported artifact; hashed into its registry key.
+    return {
+        "model": name,
+        "data_fingerprint": fingerprint,
+        "spec_fingerprint": spec_fingerprint([name]),
+        "params": _json_params(model_params(name)),
+        "versions": library_versions(),
+    }
+
+
+def registry() -> ModelRegistry:
+    return ModelRegistry.for_models_dir(MODELS_DIR)
+
+
+def _save_meta(
+    name: str, feature_cols, split_sizes, metrics, fingerprint=None, out_dir=None, registry_key=None, extra=None
+):
     payload = {
         "model": name,
         "feature_cols": feature_cols,
         "split_sizes": split_sizes,
         "metrics": metrics,
+        "data_fingerprint": fingerprint,
+        "spec_fingerprint": spec_fingerprint([name]),
+        "params": _json_params(model_params(name)),
+        "versions": library_versions(),
         "trained_at": datetime.now(timezone.utc).isoformat(),
     }
-    (MODELS_DIR / f"{name}_meta.json").write_text(
+    if registry_key is None and fingerprint is not None:
+        registry_key = config_key(registry_config(name, fingerprint))
+    if registry_key is not None:
+        payload["registry_key"] = registry_key
+    payload.update(extra or {})
+    (Path(out_dir or MODELS_DIR) / f"{name}_meta.json").write_text(
         json.dumps(payload, indent=2), encoding="utf-8"
     )
 
 
-def train_mlr_justbrent(df):
-    data_clean, X, y, feature_cols = build_features_mlr_justbrent(df)
-    X_train, X_val, X_test, y_train, y_val, y_test = split_train_val_test(X, y)
+def is_up_to_date(name: str, fingerprint: str) -> bool:
+    return registry().current(name) == config_key(registry_config(name, fingerprint))
+
 
+@traced()
+def fit_mlr_justbrent(X_train, y_train, params=None):
     scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
+    model = LinearRegression(**(params or MLR_JUSTBRENT_PARAMS), n_jobs=-1)
+    model.fit(scaler.fit_transform(X_train), y_train)
+    return model, scaler
+
+
+@traced()
+def fit_nn(X_train, y_train, params=None):
+    scaler = StandardScaler()
+    model = MLPRegressor(**(params or NN_PARAMS), verbose=False)
+    model.fit(scaler.fit_transform(X_train), y_train)
+    return model, scaler
+
+
+@traced()
+def fit_rf(X_train, y_train, params=None, n_jobs=-1):
+    model = RandomForestRegressor(**(params or RF_PARAMS), n_jobs=n_jobs)
+    model.fit(X_train, y_train)
+    return model, None
+
+
+def predict_fitted(model, scaler, X):
+    return model.predict(scaler.transform(X) if scaler is not None else X)
+
+
+@traced()
+def train_mlr_justbrent(df, features=None, fingerprint=None, out_dir=None):
+    data_clean, X, y, feature_cols = build_features_mlr_justbrent(df, features)
+    X_train, X_val, X_test, y_train, y_val, y_test = split_train_val_test(X, y)
+
+    model, scaler = fit_mlr_justbrent(X_train, y_train, model_params("mlr_justbrent"))
+    X_train_scaled = scaler.transform(X_train)
     X_val_scaled = scaler.transform(X_val)
     X_test_scaled = scaler.transform(X_test)
 
-    model = LinearRegression(fit_intercept=True, n_jobs=-1)
-    model.fit(X_train_scaled, y_train)
-
     train_metrics = regression_metrics(y_train, model.predict(X_train_scaled))
     val_metrics = regression_metrics(y_val, model.predict(X_val_scaled))
     test_metrics = regression_metrics(y_test, model.predict(X_test_scaled))
 
-    joblib.dump(model, MODELS_DIR / "mlr_justbrent_model.pkl")
-    joblib.dump(scaler, MODELS_DIR / "mlr_justbrent_scaler.pkl")
+    out_dir = Path(out_dir or MODELS_DIR)
+    joblib.dump(model, out_dir / "mlr_justbrent_model.pkl")
+    joblib.dump(scaler, out_dir / "mlr_justbrent_scaler.pkl")
+    save_fused(FusedLinear.from_sklearn(model, scaler), out_dir / "mlr_justbrent_fused.npz")
 
     split_sizes = {
         "train": len(X_train),
@@ -68,42 +209,29 @@ def train_mlr_justbrent(df):
         "val": val_metrics,
         "test": test_metrics,
     }
-    _save_meta("mlr_justbrent", feature_cols, split_sizes, metrics)
+    fingerprint = frame_fingerprint(df) if fingerprint is None else fingerprint
+    _save_meta("mlr_justbrent", feature_cols, split_sizes, metrics, fingerprint, out_dir)
+    return metrics
 
 
-def train_nn(df):
-    data_clean, X, y, feature_cols = build_features_nn(df)
+@traced()
+def train_nn(df, features=None, fingerprint=None, out_dir=None):
+    data_clean, X, y, feature_cols = build_features_nn(df, features)
     X_train, X_val, X_test, y_train, y_val, y_test = split_train_val_test(X, y)
 
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
+    model, scaler = fit_nn(X_train, y_train, model_params("nn"))
+    X_train_scaled = scaler.transform(X_train)
     X_val_scaled = scaler.transform(X_val)
     X_test_scaled = scaler.transform(X_test)
 
-    model = MLPRegressor(
-        hidden_layer_sizes=(64, 32, 16),
-        activation="relu",
-        solver="adam",
-        alpha=0.001,
-        batch_size="auto",
-        learning_rate="adaptive",
-        learning_rate_init=0.001,
-        max_iter=200,
-        shuffle=True,
-        random_state=42,
-        early_stopping=True,
-        validation_fraction=0.15,
-        n_iter_no_change=10,
-        verbose=False,
-    )
-    model.fit(X_train_scaled, y_train)
-
     train_metrics = regression_metrics(y_train, model.predict(X_train_scaled))
     val_metrics = regression_metrics(y_val, model.predict(X_val_scaled))
     test_metrics = regression_metrics(y_test, model.predict(X_test_scaled))
 
-    joblib.dump(model, MODELS_DIR / "nn_model.pkl")
-    joblib.dump(scaler, MODELS_DIR / "nn_scaler.pkl")
+    out_dir = Path(out_dir or MODELS_DIR)
+    joblib.dump(model, out_dir / "nn_model.pkl")
+    joblib.dump(scaler, out_dir / "nn_scaler.pkl")
+    save_fused(FusedMLP.from_sklearn(model, scaler), out_dir / "nn_fused.npz")
 
     split_sizes = {
         "train": len(X_train),
@@ -115,27 +243,25 @@ def train_nn(df):
         "val": val_metrics,
         "test": test_metrics,
     }
-    _save_meta("nn", feature_cols, split_sizes, metrics)
+    fingerprint = frame_fingerprint(df) if fingerprint is None else fingerprint
+    _save_meta("nn", feature_cols, split_sizes, metrics, fingerprint, out_dir)
+    return metrics
 
 
-def train_rf(df):
-    data_clean, X, y, feature_cols = build_features_rf(df)
+@traced()
+def train_rf(df, features=None, fingerprint=None, n_jobs=-1, out_dir=None):
+    data_clean, X, y, feature_cols = build_features_rf(df, features)
     X_train, X_test, y_train, y_test = split_train_test(X, y)
 
-    model = RandomForestRegressor(
-        n_estimators=100,
-        max_depth=None,
-        min_samples_split=2,
-        min_samples_leaf=1,
-        random_state=42,
-        n_jobs=-1,
-    )
-    model.fit(X_train, y_train)
+    model, _ = fit_rf(X_train, y_train, model_params("rf"), n_jobs=n_jobs)
 
     train_metrics = regression_metrics(y_train, model.predict(X_train))
     test_metrics = regression_metrics(y_test, model.predict(X_test))
+    oob_metrics = regression_metrics(y_train, model.oob_prediction_)
 
-    joblib.dump(model, MODELS_DIR / "rf_model.pkl")
+    out_dir = Path(out_dir or MODELS_DIR)
+    joblib.dump(model, out_dir / "rf_model.pkl")
+    CompactForest.from_sklearn(model).save(out_dir / "rf_compact.npz")
 
     split_sizes = {
         "train": len(X_train),
@@ -143,17 +269,132 @@ def train_rf(df):
     }
     metrics = {
         "train": train_metrics,
+        "oob": oob_metrics,
         "test": test_metrics,
     }
-    _save_meta("rf", feature_cols, split_sizes, metrics)
+    fingerprint = frame_fingerprint(df) if fingerprint is None else fingerprint
+    _save_meta("rf", feature_cols, split_sizes, metrics, fingerprint, out_dir)
+    return metrics
+
+
+TRAINERS = {
+    "mlr_justbrent": train_mlr_justbrent,
+    "rf": train_rf,
+    "nn": train_nn,
+}
+
+FITTERS = {
+    "mlr_justbrent": fit_mlr_justbrent,
+    "rf": fit_rf,
+    "nn": fit_nn,
+}
+
+
+def _train_worker(
+    name: str, data_path: str, fingerprint: str, n_jobs: int, registry_root: str, replace: bool = False
+):
+    # Workers only receive paths and fingerprints: the data is re-opened from
+    # disk and the features come memory-mapped from the feature store entry the
+    # parent wrote, so nothing large is pickled across processes.
+    start = time.perf_counter()
+    df = load_processed_data(data_path)
+    features = load_features(df, fingerprint)
+    kwargs = {"n_jobs": n_jobs} if name == "rf" else {}
+    config = registry_config(name, fingerprint)
+    key = config_key(config)
+    with ModelRegistry(registry_root).stage(name, key, config, replace=replace) as out_dir:
+        metrics = TRAINERS[name](df, features, fingerprint, out_dir=out_dir, **kwargs)
+        missing = [f for f in MODEL_ARTIFACTS[name] if not (out_dir / f).exists()]
+        if missing:
+            raise ValueError(f"{name} export is missing {missing}")
+    return name, key, metrics, time.perf_counter() - start
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train and export the Brent models.")
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        choices=list(TRAINERS),
+        default=list(TRAINERS),
+        help="models to train (default: all)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="parallel training processes (default: min(models, CPUs))",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="retrain even if data, feature spec and params are unchanged",
+    )
+    parser.add_argument("--data", default=str(DEFAULT_DATA_PATH), help="processed CSV")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        export(args)
+    finally:
+        # Written even when every model was already in the registry.
+        export_from_env()
+
+
+def export(args):
+    df = load_processed_data(args.data)
+    fingerprint = frame_fingerprint(df)
+    models_registry = registry()
+
+    todo = []
+    for name in args.models:
+        key = config_key(registry_config(name, fingerprint))
+        if args.force or models_registry.lookup(name, key) is None:
+            todo.append(name)
+        elif models_registry.current(name) == key:
+            print(f"{name}: up to date ({key}), skipped")
+        else:
+            # Same data, spec, params and libraries as an earlier export.
+            models_registry.set_current(name, key)
+            print(f"{name}: reused registry entry {key}")
+    if not todo:
+        print("Models exported to:", models_registry.root)
+        return
+
+    # Build (or reuse) the shared feature store entry once in the parent.
+    with span("export_models.load_features"):
+        load_features(df, fingerprint)
 
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(args.workers or cpus, len(todo), cpus))
+    n_jobs = max(1, cpus // workers)
+    if workers == 1:
+        results = [
+            _train_worker(name, args.data, fingerprint, n_jobs, str(models_registry.root), args.force)
+            for name in todo
+        ]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(
+                    _train_worker,
+                    name,
+                    args.data,
+                    fingerprint,
+                    n_jobs,
+                    str(models_registry.root),
+                    args.force,
+                )
+                for name in todo
+            ]
+            results = [f.result() for f in futures]
 
-def main():
-    df = load_processed_data()
-    train_mlr_justbrent(df)
-    train_rf(df)
-    train_nn(df)
-    print("Models exported to:", MODELS_DIR)
+    for name, key, _, seconds in results:
+        models_registry.set_current(name, key)
+        print(f"{name}: trained in {seconds:.1f}s ({key})")
+    print("Models exported to:", models_registry.root)
 
 
 if __name__ == "__main__":
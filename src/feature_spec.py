@@ -0,0 +1,286 @@
+"""Declarative feature definitions shared by the MLR (JustBrent), NN and RF models.
+
+Each model lists its feature columns as ``(alias, node)`` pairs. Nodes are small
+frozen primitives (column, lag, rolling mean, difference/spread); equal nodes
+compare equal, so ``brent_lag_1`` (MLR/NN) and ``brent_close_lag_1`` (RF) are
+the same node and are computed once. ``compile_specs`` turns the models into a
+plan that evaluates every unique node in one pass over NumPy arrays.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+
+    @property
+    def deps(self):
+        return ()
+
+    @property
+    def key(self) -> str:
+        return self.name
+
+
+@dataclass(frozen=True)
+class Lag:
+    source: Column
+    periods: int
+
+    @property
+    def deps(self):
+        return (self.source,)
+
+    @property
+    def key(self) -> str:
+        if self.periods < 0:
+            return f"{self.source.key}__lead_{-self.periods}"
+        return f"{self.source.key}__lag_{self.periods}"
+
+    def compute(self, values: np.ndarray) -> np.ndarray:
+        out = np.full(values.shape, np.nan)
+        k = self.periods
+        if k > 0:
+            out[k:] = values[:-k]
+        elif k < 0:
+            out[:k] = values[-k:]
+        else:
+            out[:] = values
+        return out
+
+
+@dataclass(frozen=True)
+class RollingMean:
+    source: Column
+    window: int
+
+    @property
+    def deps(self):
+        return (self.source,)
+
+    @property
+    def key(self) -> str:
+        return f"{self.source.key}__ma_{self.window}"
+
+    def compute(self, values: np.ndarray) -> np.ndarray:
+        # pandas' rolling kernel on a bare array (no frame copy) keeps the values
+        # bit-identical to the models' training features and the online engine.
+        return pd.Series(values, copy=False).rolling(window=self.window).mean().to_numpy()
+
+
+@dataclass(frozen=True)
+class Difference:
+    left: Column
+    right: Column
+
+    @property
+    def deps(self):
+        return (self.left, self.right)
+
+    @property
+    def key(self) -> str:
+        return f"{self.left.key}__minus__{self.right.key}"
+
+    def compute(self, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+        return left - right
+
+
+def Spread(left: Column, right: Column) -> Difference:
+    # A cross-instrument spread is the same computation as a difference.
+    return Difference(left, right)
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    name: str
+    features: tuple
+    target: tuple
+
+    @property
+    def feature_cols(self) -> list[str]:
+        return [alias for alias, _ in self.features]
+
+    @property
+    def required_columns(self) -> list[str]:
+        seen = []
+        for _, node in self.features + (self.target,):
+            for col in _leaves(node):
+                if col not in seen:
+                    seen.append(col)
+        return seen
+
+
+def _leaves(node):
+    if isinstance(node, Column):
+        return [node.name]
+    out = []
+    for dep in node.deps:
+        out.extend(_leaves(dep))
+    return out
+
+
+def _brent_block(lag_alias: str, ma_alias: str):
+    close = Column("close_x")
+    return (
+        [(f"{lag_alias}_{lag}", Lag(close, lag)) for lag in (1, 3, 5, 7)]
+        + [(f"{ma_alias}_{w}", RollingMean(close, w)) for w in (5, 10)]
+    )
+
+
+def _raw(cols):
+    return [(c, Column(c)) for c in cols]
+
+
+_BRENT_OHLC = ["close_x", "open_x", "high_x", "low_x", "average_x"]
+_WTI_OHLC = ["close_y", "open_y", "high_y", "low_y", "average_y"]
+_NEXT_CLOSE = Lag(Column("close_x"), -1)
+
+MLR_JUSTBRENT_SPEC = ModelSpec(
+    name="mlr_justbrent",
+    features=tuple(_raw(_BRENT_OHLC) + _brent_block("brent_lag", "brent_ma")),
+    target=("target", _NEXT_CLOSE),
+)
+
+NN_SPEC = ModelSpec(
+    name="nn",
+    features=tuple(
+        _raw(_BRENT_OHLC)
+        + _brent_block("brent_lag", "brent_ma")
+        + _raw(_WTI_OHLC)
+        + [(f"wti_lag_{lag}", Lag(Column("close_y"), lag)) for lag in (1, 3, 5, 7)]
+        + [(f"wti_ma_{w}", RollingMean(Column("close_y"), w)) for w in (5, 10)]
+    ),
+    target=("target", _NEXT_CLOSE),
+)
+
+RF_SPEC = ModelSpec(
+    name="rf",
+    features=tuple(
+        [(f"brent_close_lag_{lag}", Lag(Column("close_x"), lag)) for lag in (1, 3, 5, 7)]
+        + [(f"wti_close_lag_{lag}", Lag(Column("close_y"), lag)) for lag in (1, 3, 5, 7)]
+        + [(f"brent_volume_lag_{lag}", Lag(Column("volume_x"), lag)) for lag in (1, 3, 5, 7)]
+        + [
+            ("brent_close_ma_5", RollingMean(Column("close_x"), 5)),
+            ("brent_close_ma_10", RollingMean(Column("close_x"), 10)),
+            ("wti_close_ma_5", RollingMean(Column("close_y"), 5)),
+            ("wti_close_ma_10", RollingMean(Column("close_y"), 10)),
+            ("brent_high_low_diff", Difference(Column("high_x"), Column("low_x"))),
+            ("wti_high_low_diff", Difference(Column("high_y"), Column("low_y"))),
+            ("brent_open_close_diff", Difference(Column("close_x"), Column("open_x"))),
+            ("brent_wti_spread", Spread(Column("close_x"), Column("close_y"))),
+        ]
+        + _raw(
+            [
+                "open_x",
+                "high_x",
+                "low_x",
+                "close_x",
+                "volume_x",
+                "average_x",
+                "open_y",
+                "high_y",
+                "low_y",
+                "close_y",
+                "volume_y",
+                "average_y",
+            ]
+        )
+    ),
+    target=("target_brent_next_day", _NEXT_CLOSE),
+)
+
+MODEL_SPECS = {
+    spec.name: spec for spec in (MLR_JUSTBRENT_SPEC, NN_SPEC, RF_SPEC)
+}
+
+
+def spec_fingerprint(names=None) -> str:
+    names = sorted(MODEL_SPECS) if names is None else sorted(names)
+    payload = repr([MODEL_SPECS[name] for name in names]).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+class CompiledFeatures:
+    """Deduplicated, dependency-ordered node list for a set of model specs."""
+
+    def __init__(self, specs):
+        self.specs = {spec.name: spec for spec in specs}
+        self.nodes = []
+        self._position = {}
+        for spec in self.specs.values():
+            for _, node in spec.features + (spec.target,):
+                self._add(node)
+
+    def _add(self, node) -> int:
+        if node in self._position:
+            return self._position[node]
+        for dep in node.deps:
+            self._add(dep)
+        self._position[node] = len(self.nodes)
+        self.nodes.append(node)
+        return self._position[node]
+
+    @property
+    def columns(self) -> list[str]:
+        return [node.key for node in self.nodes]
+
+    def positions(self, name: str) -> np.ndarray:
+        spec = self.specs[name]
+        return np.array([self._position[node] for _, node in spec.features], dtype=np.intp)
+
+    def target_position(self, name: str) -> int:
+        return self._position[self.specs[name].target[1]]
+
+    def run(self, df: pd.DataFrame) -> "FeatureMatrix":
+        required = []
+        for spec in self.specs.values():
+            required.extend(c for c in spec.required_columns if c not in required)
+        missing = [c for c in required if c not in df.columns]
+        if missing:
+            raise ValueError(f"Missing required columns: {missing}")
+
+        # Column-major so every node and every model view column is contiguous.
+        values = np.empty((len(df), len(self.nodes)), dtype=np.float64, order="F")
+        for j, node in enumerate(self.nodes):
+            if isinstance(node, Column):
+                values[:, j] = df[node.name].to_numpy(dtype=np.float64)
+            else:
+                inputs = [values[:, self._position[dep]] for dep in node.deps]
+                values[:, j] = node.compute(*inputs)
+        row_ok = df.notna().all(axis=1).to_numpy()
+        return FeatureMatrix(self, values, row_ok)
+
+
+class FeatureMatrix:
+    """Result of one fused pass; ``view`` slices out a model's columns."""
+
+    def __init__(self, compiled: CompiledFeatures, values: np.ndarray, row_ok: np.ndarray):
+        self.compiled = compiled
+        self.values = values
+        self.row_ok = row_ok
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.compiled.specs
+
+    def view(self, name: str):
+        X = self.values[:, self.compiled.positions(name)]
+        y = self.values[:, self.compiled.target_position(name)]
+        return X, y
+
+    def clean_mask(self, name: str) -> np.ndarray:
+        # Same rows as DataFrame.dropna() on the source columns plus the model's
+        # features and target.
+        X, y = self.view(name)
+        return self.row_ok & ~np.isnan(X).any(axis=1) & ~np.isnan(y)
+
+
+def compile_specs(names=None) -> CompiledFeatures:
+    names = list(MODEL_SPECS) if names is None else list(names)
+    return CompiledFeatures([MODEL_SPECS[name] for name in names])
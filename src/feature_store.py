@@ -0,0 +1,193 @@
+"""On-disk cache of the per-model feature matrices.
+
+Entries are keyed by ``frame_fingerprint`` of the processed frame plus the
+feature spec fingerprint, so editing the CSV or a feature definition simply
+misses the cache. Entries also record the frame's row count and date range; a
+hit that does not match the frame being featurised (a caller passed a
+fingerprint of other data) is discarded and rebuilt. Each entry holds, per
+model, the feature matrix ``X``, the target ``y`` and the clean-row mask as
+``.npy`` files that are opened with ``mmap_mode="r"``; later reads are
+zero-copy. Entries are evicted least-recently-used once the
+store grows past ``max_bytes``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.feature_spec import MODEL_SPECS, compile_specs, spec_fingerprint
+from src.features import REPO_ROOT
+
+
+DEFAULT_CACHE_DIR = REPO_ROOT / "data" / "cache" / "features"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+STORE_VERSION = 2
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Fingerprint of the frame's columns and values.
+
+    This is the one data fingerprint used for feature store, registry and app
+    cache keys, so the same loaded data gets the same keys from every entry
+    point.
+    """
+    digest = hashlib.sha256()
+    digest.update(repr(list(df.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def frame_extent(df: pd.DataFrame) -> dict:
+    """Row count and first/last date recorded with, and checked against, an entry."""
+    extent = {"n_rows": int(len(df))}
+    if "date" in df.columns and len(df):
+        extent["first_date"] = str(pd.Timestamp(df["date"].iat[0]))
+        extent["last_date"] = str(pd.Timestamp(df["date"].iat[-1]))
+    return extent
+
+
+class CachedFeatures:
+    """Memory-mapped stand-in for ``FeatureMatrix`` served from the store."""
+
+    def __init__(self, path: Path, models):
+        self.path = path
+        self.models = list(models)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.models
+
+    def _load(self, name: str, part: str) -> np.ndarray:
+        return np.load(self.path / f"{name}.{part}.npy", mmap_mode="r")
+
+    def view(self, name: str):
+        return self._load(name, "X"), self._load(name, "y")
+
+    def clean_mask(self, name: str) -> np.ndarray:
+        return self._load(name, "mask")
+
+
+class FeatureStore:
+    def __init__(self, root: Path | str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    def key(self, fingerprint: str, models) -> str:
+        payload = json.dumps(
+            {
+                "version": STORE_VERSION,
+                "data": fingerprint,
+                "specs": spec_fingerprint(models),
+                "models": sorted(models),
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+    def get(self, fingerprint: str, models, df: pd.DataFrame | None = None) -> CachedFeatures | None:
+        """The entry for ``fingerprint``; with ``df``, one built from a different frame is dropped."""
+        entry = self.root / self.key(fingerprint, models)
+        manifest_path = entry / "manifest.json"
+        if not manifest_path.exists():
+            return None
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if df is not None and any(manifest.get(k) != v for k, v in frame_extent(df).items()):
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+        # Touch the manifest so eviction sees this entry as recently used.
+        os.utime(manifest_path)
+        return CachedFeatures(entry, manifest["models"])
+
+    def put(self, fingerprint: str, features, models, df: pd.DataFrame | None = None) -> CachedFeatures:
+        self.root.mkdir(parents=True, exist_ok=True)
+        entry = self.root / self.key(fingerprint, models)
+        tmp = Path(tempfile.mkdtemp(prefix=".tmp-", dir=self.root))
+        try:
+            for name in models:
+                X, y = features.view(name)
+                np.save(tmp / f"{name}.X.npy", np.asfortranarray(X))
+                np.save(tmp / f"{name}.y.npy", np.ascontiguousarray(y))
+                np.save(tmp / f"{name}.mask.npy", np.ascontiguousarray(features.clean_mask(name)))
+            manifest = {
+                "data": fingerprint,
+                "specs": spec_fingerprint(models),
+                "models": list(models),
+                "n_rows": int(len(features.row_ok)),
+                **(frame_extent(df) if df is not None else {}),
+                "created_at": time.time(),
+            }
+            (tmp / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+            try:
+                os.replace(tmp, entry)
+            except OSError:
+                # Another process published the same entry first.
+                shutil.rmtree(tmp, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        self.evict()
+        return CachedFeatures(entry, models)
+
+    def entries(self):
+        if not self.root.exists():
+            return []
+        out = []
+        for entry in self.root.iterdir():
+            manifest = entry / "manifest.json"
+            if entry.is_dir() and manifest.exists():
+                size = sum(f.stat().st_size for f in entry.iterdir())
+                out.append((manifest.stat().st_mtime, size, entry))
+        return sorted(out)
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self) -> list[Path]:
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        # Oldest first, but never drop the entry that was just written/used.
+        for _, size, entry in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed.append(entry)
+        return removed
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def load_features(
+    df: pd.DataFrame,
+    fingerprint: str | None = None,
+    models=None,
+    store: FeatureStore | None = None,
+):
+    """Return cached features for ``df``, building and storing them on a miss.
+
+    ``fingerprint`` defaults to ``frame_fingerprint(df)``; callers that
+    already computed it pass it in to skip the hash.
+    """
+    models = list(MODEL_SPECS) if models is None else list(models)
+    fingerprint = frame_fingerprint(df) if fingerprint is None else fingerprint
+    store = FeatureStore() if store is None else store
+
+    cached = store.get(fingerprint, models, df)
+    if cached is not None:
+        return cached
+    features = compile_specs(models).run(df)
+    try:
+        return store.put(fingerprint, features, models, df)
+    except OSError:
+        # Read-only checkout: fall back to the in-memory pass.
+        return features
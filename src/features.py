@@ -3,233 +3,122 @@ from __future__ import annotations
 from pathlib import Path
 import pandas as pd
 
+from src import columnar
+from src.feature_spec import (
+    MLR_JUSTBRENT_SPEC,
+    MODEL_SPECS,
+    NN_SPEC,
+    RF_SPEC,
+    FeatureMatrix,
+    compile_specs,
+)
+from src.tracing import traced
+
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 DEFAULT_DATA_PATH = REPO_ROOT / "data" / "processed" / "merged_oil_prices.csv"
 
-
-def load_processed_data(path: Path | str = DEFAULT_DATA_PATH) -> pd.DataFrame:
-    df = pd.read_csv(path)
+MLR_JUSTBRENT_FEATURE_COLS = MLR_JUSTBRENT_SPEC.feature_cols
+NN_FEATURE_COLS = NN_SPEC.feature_cols
+RF_FEATURE_COLS = RF_SPEC.feature_cols
+
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    # The committed CSV uses US-style dates (11/2/2017); frames written back by
+    # pandas use ISO dates. Passing the format avoids per-row inference.
+    sample = values.iloc[0] if len(values) else ""
+    return pd.to_datetime(values, format=columnar.date_format_for(sample))
+
+
+@traced()
+def load_processed_data(
+    path: Path | str = DEFAULT_DATA_PATH, prefer_columnar: bool = True
+) -> pd.DataFrame:
+    path = Path(path)
+    arrow_path = columnar.arrow_path_for(path)
+    if path.suffix == ".arrow":
+        df = columnar.read_arrow(path)
+    elif prefer_columnar and columnar.available() and columnar.is_fresh(arrow_path, path):
+        df = columnar.read_arrow(arrow_path)
+    elif columnar.available():
+        df = columnar.read_csv(path)
+    else:
+        header = pd.read_csv(path, nrows=0).columns
+        dtypes = {c: t for c, t in columnar.CSV_DTYPES.items() if c in header}
+        df = pd.read_csv(path, dtype=dtypes)
+        if "date" in df.columns:
+            df["date"] = _parse_dates(df["date"])
     if "date" not in df.columns:
         raise ValueError("Missing required column: date")
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.sort_values("date").reset_index(drop=True)
+    if not df["date"].is_monotonic_increasing:
+        df = df.sort_values("date")
+    df = df.reset_index(drop=True)
     return df
 
 
-def _ensure_columns(df: pd.DataFrame, required: list[str]) -> None:
-    missing = [c for c in required if c not in df.columns]
-    if missing:
-        raise ValueError(f"Missing required columns: {missing}")
-
-
-def _apply_features_mlr_justbrent(df: pd.DataFrame) -> pd.DataFrame:
-    _ensure_columns(
-        df,
-        [
-            "close_x",
-            "open_x",
-            "high_x",
-            "low_x",
-            "average_x",
-        ],
-    )
-
-    data = df.copy()
-
-    for lag in [1, 3, 5, 7]:
-        data[f"brent_lag_{lag}"] = data["close_x"].shift(lag)
-
-    data["brent_ma_5"] = data["close_x"].rolling(window=5).mean()
-    data["brent_ma_10"] = data["close_x"].rolling(window=10).mean()
-    data["target"] = data["close_x"].shift(-1)
-
-    feature_cols = [
-        "close_x",
-        "open_x",
-        "high_x",
-        "low_x",
-        "average_x",
-        "brent_lag_1",
-        "brent_lag_3",
-        "brent_lag_5",
-        "brent_lag_7",
-        "brent_ma_5",
-        "brent_ma_10",
-    ]
-    return data, feature_cols
-
-
-def build_features_mlr_justbrent_full(df: pd.DataFrame):
-    data, feature_cols = _apply_features_mlr_justbrent(df)
-    X_full = data[feature_cols]
+@traced()
+def build_feature_matrix(df: pd.DataFrame, models=None) -> FeatureMatrix:
+    return compile_specs(models).run(df)
+
+
+def _model_view(name: str, df: pd.DataFrame, features: FeatureMatrix | None):
+    if features is None or name not in features:
+        features = build_feature_matrix(df, [name])
+    spec = MODEL_SPECS[name]
+    feature_cols = spec.feature_cols
+    target_col = spec.target[0]
+
+    X_values, y_values = features.view(name)
+    X_full = pd.DataFrame(X_values, columns=feature_cols, index=df.index, copy=False)
+    target = pd.Series(y_values, index=df.index, name=target_col, copy=False)
+    derived = [c for c in feature_cols if c not in df.columns]
+    data = pd.concat([df, X_full[derived], target], axis=1)
+    return data, X_full, target, feature_cols, features.clean_mask(name)
+
+
+def _clean_view(data: pd.DataFrame, X_full: pd.DataFrame, target: pd.Series, mask):
+    data_clean = data[mask].reset_index(drop=True)
+    X = X_full[mask].reset_index(drop=True)
+    y = target[mask].reset_index(drop=True)
+    return data_clean, X, y
+
+
+@traced()
+def build_features_mlr_justbrent_full(df: pd.DataFrame, features: FeatureMatrix | None = None):
+    data, X_full, _, feature_cols, _ = _model_view("mlr_justbrent", df, features)
     return data, X_full, feature_cols
 
 
-def build_features_mlr_justbrent(df: pd.DataFrame):
-    data, feature_cols = _apply_features_mlr_justbrent(df)
-    data_clean = data.dropna().reset_index(drop=True)
-    X = data_clean[feature_cols]
-    y = data_clean["target"]
+@traced()
+def build_features_mlr_justbrent(df: pd.DataFrame, features: FeatureMatrix | None = None):
+    data, X_full, target, feature_cols, mask = _model_view("mlr_justbrent", df, features)
+    data_clean, X, y = _clean_view(data, X_full, target, mask)
     return data_clean, X, y, feature_cols
 
 
-def _apply_features_nn(df: pd.DataFrame) -> pd.DataFrame:
-    _ensure_columns(
-        df,
-        [
-            "close_x",
-            "open_x",
-            "high_x",
-            "low_x",
-            "average_x",
-            "close_y",
-            "open_y",
-            "high_y",
-            "low_y",
-            "average_y",
-        ],
-    )
-
-    data = df.copy()
-
-    for lag in [1, 3, 5, 7]:
-        data[f"brent_lag_{lag}"] = data["close_x"].shift(lag)
-        data[f"wti_lag_{lag}"] = data["close_y"].shift(lag)
-
-    data["brent_ma_5"] = data["close_x"].rolling(window=5).mean()
-    data["brent_ma_10"] = data["close_x"].rolling(window=10).mean()
-    data["wti_ma_5"] = data["close_y"].rolling(window=5).mean()
-    data["wti_ma_10"] = data["close_y"].rolling(window=10).mean()
-    data["target"] = data["close_x"].shift(-1)
-
-    feature_cols = [
-        "close_x",
-        "open_x",
-        "high_x",
-        "low_x",
-        "average_x",
-        "brent_lag_1",
-        "brent_lag_3",
-        "brent_lag_5",
-        "brent_lag_7",
-        "brent_ma_5",
-        "brent_ma_10",
-        "close_y",
-        "open_y",
-        "high_y",
-        "low_y",
-        "average_y",
-        "wti_lag_1",
-        "wti_lag_3",
-        "wti_lag_5",
-        "wti_lag_7",
-        "wti_ma_5",
-        "wti_ma_10",
-    ]
-    return data, feature_cols
-
-
-def build_features_nn_full(df: pd.DataFrame):
-    data, feature_cols = _apply_features_nn(df)
-    X_full = data[feature_cols]
+@traced()
+def build_features_nn_full(df: pd.DataFrame, features: FeatureMatrix | None = None):
+    data, X_full, _, feature_cols, _ = _model_view("nn", df, features)
     return data, X_full, feature_cols
 
 
-def build_features_nn(df: pd.DataFrame):
-    data, feature_cols = _apply_features_nn(df)
-    data_clean = data.dropna().reset_index(drop=True)
-    X = data_clean[feature_cols]
-    y = data_clean["target"]
+@traced()
+def build_features_nn(df: pd.DataFrame, features: FeatureMatrix | None = None):
+    data, X_full, target, feature_cols, mask = _model_view("nn", df, features)
+    data_clean, X, y = _clean_view(data, X_full, target, mask)
     return data_clean, X, y, feature_cols
 
 
-def _apply_features_rf(df: pd.DataFrame) -> pd.DataFrame:
-    _ensure_columns(
-        df,
-        [
-            "open_x",
-            "high_x",
-            "low_x",
-            "close_x",
-            "volume_x",
-            "average_x",
-            "open_y",
-            "high_y",
-            "low_y",
-            "close_y",
-            "volume_y",
-            "average_y",
-        ],
-    )
-
-    data = df.copy()
-
-    for lag in [1, 3, 5, 7]:
-        data[f"brent_close_lag_{lag}"] = data["close_x"].shift(lag)
-        data[f"wti_close_lag_{lag}"] = data["close_y"].shift(lag)
-        data[f"brent_volume_lag_{lag}"] = data["volume_x"].shift(lag)
-
-    data["brent_close_ma_5"] = data["close_x"].rolling(window=5).mean()
-    data["brent_close_ma_10"] = data["close_x"].rolling(window=10).mean()
-    data["wti_close_ma_5"] = data["close_y"].rolling(window=5).mean()
-    data["wti_close_ma_10"] = data["close_y"].rolling(window=10).mean()
-
-    data["brent_high_low_diff"] = data["high_x"] - data["low_x"]
-    data["wti_high_low_diff"] = data["high_y"] - data["low_y"]
-    data["brent_open_close_diff"] = data["close_x"] - data["open_x"]
-    data["brent_wti_spread"] = data["close_x"] - data["close_y"]
-
-    data["target_brent_next_day"] = data["close_x"].shift(-1)
-
-    feature_cols = [
-        "brent_close_lag_1",
-        "brent_close_lag_3",
-        "brent_close_lag_5",
-        "brent_close_lag_7",
-        "wti_close_lag_1",
-        "wti_close_lag_3",
-        "wti_close_lag_5",
-        "wti_close_lag_7",
-        "brent_volume_lag_1",
-        "brent_volume_lag_3",
-        "brent_volume_lag_5",
-        "brent_volume_lag_7",
-        "brent_close_ma_5",
-        "brent_close_ma_10",
-        "wti_close_ma_5",
-        "wti_close_ma_10",
-        "brent_high_low_diff",
-        "wti_high_low_diff",
-        "brent_open_close_diff",
-        "brent_wti_spread",
-        "open_x",
-        "high_x",
-        "low_x",
-        "close_x",
-        "volume_x",
-        "average_x",
-        "open_y",
-        "high_y",
-        "low_y",
-        "close_y",
-        "volume_y",
-        "average_y",
-    ]
-    return data, feature_cols
-
-
-def build_features_rf_full(df: pd.DataFrame):
-    data, feature_cols = _apply_features_rf(df)
-    X_full = data[feature_cols]
+@traced()
+def build_features_rf_full(df: pd.DataFrame, features: FeatureMatrix | None = None):
+    data, X_full, _, feature_cols, _ = _model_view("rf", df, features)
     return data, X_full, feature_cols
 
 
-def build_features_rf(df: pd.DataFrame):
-    data, feature_cols = _apply_features_rf(df)
-    data_clean = data.dropna().reset_index(drop=True)
-    X = data_clean[feature_cols]
-    y = data_clean["target_brent_next_day"]
+@traced()
+def build_features_rf(df: pd.DataFrame, features: FeatureMatrix | None = None):
+    data, X_full, target, feature_cols, mask = _model_view("rf", df, features)
+    data_clean, X, y = _clean_view(data, X_full, target, mask)
     return data_clean, X, y, feature_cols
 
 
@@ -0,0 +1,351 @@
+"""Recursive multi-step forecasts for the three models, batched over start dates.
+
+The models predict the next close from the features of the latest bar. To
+reach ``h`` trading days ahead, ``RecursiveForecaster`` appends the predicted
+close as a new bar and recomputes the spec's lag, moving-average and
+difference features (``src/feature_spec.py``) from a rolling window of the
+last ``lookback`` bars. Every path (one per start date here, one per simulated
+scenario in ``src/scenarios.py``) lives in one ``(paths, lookback, columns)``
+array, so a step is one vectorised feature evaluation and one ``predict`` call
+for all paths.
+
+Inputs the models do not forecast follow an explicit ``ExogenousPolicy``:
+
+* Brent open/high/low/average keep their last offsets from the close.
+* WTI stays at its last bar (``"persist"``) or moves with the predicted Brent
+  close at the last observed spread (``"spread"``).
+* Volume stays at its last value (``"persist"``) or uses the window mean
+  (``"mean"``).
+
+The first step uses the stored feature rows, so 1-day forecasts equal the
+models' ordinary predictions. Fed their own output, some models (the MLP in
+particular, from extreme regimes such as March 2020) can run away.
+``max_step_change`` optionally caps each later step's relative move; it is off
+by default because clipping bounds the error by construction and so hides
+that divergence. ``Forecast.evaluate`` scores every finite path, capped or
+not, and reports how many paths ran away (went non-finite or left a
+``RUNAWAY_FACTOR`` band around their start close) and how many hit the cap
+next to the metrics and the no-change baseline.
+
+    python -m src.forecast --model rf --horizons 5 10 20 --wti spread
+"""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.artifacts import LazyArtifacts
+from src.feature_spec import MODEL_SPECS, Column, Difference, Lag, RollingMean
+from src.feature_store import load_features
+from src.features import DEFAULT_DATA_PATH, load_processed_data
+from src.metrics import regression_metrics
+from src.online_features import BAR_COLUMNS
+from src.time_index import TimeIndex
+from src.tracing import traced
+
+
+DEFAULT_HORIZONS = (5, 10, 20)
+# No cap unless asked for; see the module docstring.
+DEFAULT_MAX_STEP_CHANGE = None
+# A path whose forecast leaves [start / RUNAWAY_FACTOR, start * RUNAWAY_FACTOR]
+# is counted as diverged.
+RUNAWAY_FACTOR = 3.0
+WTI_POLICIES = ("persist", "spread")
+VOLUME_POLICIES = ("persist", "mean")
+
+_COL = {name: i for i, name in enumerate(BAR_COLUMNS)}
+_CLOSE = _COL["close_x"]
+_BRENT_SHAPE = [_COL[c] for c in ("open_x", "high_x", "low_x", "average_x")]
+_WTI = [_COL[c] for c in ("open_y", "high_y", "low_y", "close_y", "average_y")]
+_VOLUME = [_COL["volume_x"], _COL["volume_y"]]
+
+
+@dataclass(frozen=True)
+class ExogenousPolicy:
+    wti: str = "persist"
+    volume: str = "persist"
+
+    def __post_init__(self):
+        if self.wti not in WTI_POLICIES:
+            raise ValueError(f"Unknown WTI policy: {self.wti}")
+        if self.volume not in VOLUME_POLICIES:
+            raise ValueError(f"Unknown volume policy: {self.volume}")
+
+
+def _node_lookback(node) -> int:
+    if isinstance(node, Column):
+        return 1
+    if isinstance(node, Lag):
+        if node.periods < 0:
+            raise ValueError(f"Lead features cannot be forecast: {node.key}")
+        return node.periods + 1
+    if isinstance(node, RollingMean):
+        return node.window
+    if isinstance(node, Difference):
+        return max(_node_lookback(node.left), _node_lookback(node.right))
+    raise ValueError(f"Unsupported feature node: {node!r}")
+
+
+def lookback(name: str) -> int:
+    """Bars of history needed to rebuild ``name``'s features."""
+    return max(_node_lookback(node) for _, node in MODEL_SPECS[name].features)
+
+
+def window_features(window: np.ndarray, name: str) -> np.ndarray:
+    """Features of the last bar of every window, ``(paths, n_features)``."""
+    cache = {}
+
+    def evaluate(node):
+        if node in cache:
+            return cache[node]
+        if isinstance(node, Column):
+            out = window[:, -1, _COL[node.name]]
+        elif isinstance(node, Lag):
+            out = window[:, -1 - node.periods, _COL[node.source.name]]
+        elif isinstance(node, RollingMean):
+            out = window[:, -node.window :, _COL[node.source.name]].mean(axis=1)
+        elif isinstance(node, Difference):
+            out = evaluate(node.left) - evaluate(node.right)
+        else:
+            raise ValueError(f"Unsupported feature node: {node!r}")
+        cache[node] = out
+        return out
+
+    return np.column_stack([evaluate(node) for _, node in MODEL_SPECS[name].features])
+
+
+def initial_windows(df: pd.DataFrame, rows, size: int) -> np.ndarray:
+    """The ``size`` bars ending at each of ``rows``, ``(len(rows), size, len(BAR_COLUMNS))``."""
+    rows = np.asarray(rows, dtype=np.intp)
+    if len(rows) and rows.min() < size - 1:
+        raise ValueError(f"Start rows need {size - 1} earlier bars")
+    bars = df[BAR_COLUMNS].to_numpy(dtype=np.float64)
+    return bars[rows[:, None] + np.arange(1 - size, 1)]
+
+
+def predict_bundle(bundle: dict, X: np.ndarray, feature_cols) -> np.ndarray:
+    model, scaler = bundle["model"], bundle["scaler"]
+    if scaler is not None or hasattr(model, "feature_names_in_"):
+        # sklearn objects were fitted on DataFrames; keep their column names.
+        X = pd.DataFrame(X, columns=feature_cols)
+    if scaler is not None:
+        X = scaler.transform(X)
+    return np.asarray(model.predict(X), dtype=np.float64)
+
+
+class RecursiveForecaster:
+    def __init__(
+        self,
+        name: str,
+        bundle: dict,
+        policy: ExogenousPolicy | None = None,
+        max_step_change: float | None = DEFAULT_MAX_STEP_CHANGE,
+    ):
+        if name not in MODEL_SPECS:
+            raise ValueError(f"Unknown model: {name}")
+        self.name = name
+        self.bundle = bundle
+        self.policy = policy or ExogenousPolicy()
+        if max_step_change is not None and max_step_change <= 0:
+            raise ValueError("max_step_change must be positive")
+        self.max_step_change = max_step_change
+        self.feature_cols = MODEL_SPECS[name].feature_cols
+        self.lookback = lookback(name)
+
+    def next_bar(self, window: np.ndarray, close: np.ndarray) -> np.ndarray:
+        last = window[:, -1]
+        bar = last.copy()
+        bar[:, _CLOSE] = close
+        bar[:, _BRENT_SHAPE] = close[:, None] + (last[:, _BRENT_SHAPE] - last[:, [_CLOSE]])
+        if self.policy.wti == "spread":
+            bar[:, _WTI] = last[:, _WTI] + (close - last[:, _CLOSE])[:, None]
+        if self.policy.volume == "mean":
+            bar[:, _VOLUME] = window[:, :, _VOLUME].mean(axis=1)
+        return bar
+
+    def run(
+        self,
+        window: np.ndarray,
+        steps: int,
+        first_features=None,
+        residuals=None,
+        relative: bool = False,
+        capped: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """Roll every window ``steps`` days ahead; returns predicted closes ``(paths, steps)``.
+
+        ``residuals`` (``(paths, steps)``) are added to each step's prediction
+        (or, with ``relative``, applied as ``pred * (1 + r)``) before it is fed
+        back, for simulated rather than expected paths. If given, the boolean
+        ``capped`` array (``(paths, steps)``) is filled with the steps that hit
+        ``max_step_change``; the first step is never capped.
+        """
+        if steps < 1:
+            raise ValueError("steps must be at least 1")
+        window = np.array(window, dtype=np.float64)
+        if window.ndim != 3 or window.shape[1] < self.lookback:
+            raise ValueError(f"Expected windows of shape (paths, >= {self.lookback}, {len(BAR_COLUMNS)})")
+        window = window[:, -self.lookback :]
+        out = np.empty((len(window), steps))
+        for h in range(steps):
+            if h == 0 and first_features is not None:
+                X = np.asarray(first_features, dtype=np.float64)
+            else:
+                X = window_features(window, self.name)
+            close = predict_bundle(self.bundle, X, self.feature_cols)
+            if self.max_step_change is not None and h > 0:
+                last = window[:, -1, _CLOSE]
+                raw = close
+                close = np.clip(raw, last * (1 - self.max_step_change), last * (1 + self.max_step_change))
+                if capped is not None:
+                    capped[:, h] = close != raw
+            elif capped is not None:
+                capped[:, h] = False
+            if residuals is not None:
+                close = close * (1 + residuals[:, h]) if relative else close + residuals[:, h]
+            out[:, h] = close
+            if h + 1 < steps:
+                window = np.concatenate([window[:, 1:], self.next_bar(window, close)[:, None]], axis=1)
+        return out
+
+
+@dataclass
+class Forecast:
+    name: str
+    rows: np.ndarray
+    dates: np.ndarray
+    paths: np.ndarray  # (start dates, steps); column h-1 is the h-day-ahead close
+    capped: np.ndarray | None = None  # (start dates, steps); steps that hit max_step_change
+
+    def horizon(self, h: int) -> np.ndarray:
+        if not 1 <= h <= self.paths.shape[1]:
+            raise ValueError(f"Horizon {h} outside 1..{self.paths.shape[1]}")
+        return self.paths[:, h - 1]
+
+    def to_frame(self, horizons=DEFAULT_HORIZONS) -> pd.DataFrame:
+        frame = pd.DataFrame({"date": self.dates})
+        for h in horizons:
+            frame[f"pred_h{h}"] = self.horizon(h)
+        return frame
+
+    def runaway(self, df: pd.DataFrame, h: int | None = None) -> np.ndarray:
+        """Paths that went non-finite or left the ``RUNAWAY_FACTOR`` band around their start close.
+
+        Only the first ``h`` steps are checked when ``h`` is given.
+        """
+        start = df["close_x"].to_numpy(dtype=np.float64)[self.rows][:, None]
+        paths = self.paths[:, :h]
+        with np.errstate(invalid="ignore"):
+            inside = (paths > start / RUNAWAY_FACTOR) & (paths < start * RUNAWAY_FACTOR)
+        return ~inside.all(axis=1)
+
+    def evaluate(self, df: pd.DataFrame, horizons=DEFAULT_HORIZONS) -> pd.DataFrame:
+        """Per-horizon metrics against the realised close ``h`` rows later.
+
+        Every finite path is scored, including runaway and capped ones;
+        ``runaway`` and ``capped`` count the scored start dates whose path had
+        diverged or hit the cap by that horizon. Non-finite paths cannot be
+        scored and are counted in ``non_finite``. ``skill`` is ``1 - RMSE /
+        naive_RMSE``, so a negative value is worse than predicting no change.
+        """
+        close = df["close_x"].to_numpy(dtype=np.float64)
+        results = []
+        for h in horizons:
+            pred = self.horizon(h)
+            has_target = self.rows + h < len(close)
+            finite = np.isfinite(self.paths[:, :h]).all(axis=1)
+            ok = has_target & finite
+            runaway = self.runaway(df, h)
+            capped = np.zeros(len(pred), dtype=bool) if self.capped is None else self.capped[:, :h].any(axis=1)
+            actual = close[self.rows[ok] + h]
+            metrics = regression_metrics(actual, pred[ok])
+            naive = regression_metrics(actual, close[self.rows[ok]])
+            results.append(
+                {
+                    "model": self.name,
+                    "horizon": h,
+                    "n": int(ok.sum()),
+                    "non_finite": int((has_target & ~finite).sum()),
+                    "runaway": int((ok & runaway).sum()),
+                    "capped": int((ok & capped).sum()),
+                    **metrics,
+                    "naive_RMSE": naive["RMSE"],
+                    "skill": 1.0 - metrics["RMSE"] / naive["RMSE"],
+                }
+            )
+        return pd.DataFrame(results)
+
+
+@traced()
+def forecast_history(
+    df: pd.DataFrame,
+    name: str,
+    bundle: dict,
+    features=None,
+    steps: int = max(DEFAULT_HORIZONS),
+    policy: ExogenousPolicy | None = None,
+    start_rows=None,
+    max_step_change: float | None = DEFAULT_MAX_STEP_CHANGE,
+) -> Forecast:
+    """Forecast ``steps`` days ahead from every start row at once."""
+    features = load_features(df) if features is None else features
+    X_all = np.asarray(features.view(name)[0])
+    valid = np.flatnonzero(~np.isnan(X_all).any(axis=1))
+    rows = valid if start_rows is None else np.intersect1d(valid, np.asarray(start_rows, dtype=np.intp))
+    if not len(rows):
+        raise ValueError(f"No start rows with complete {name} features")
+    forecaster = RecursiveForecaster(name, bundle, policy, max_step_change)
+    windows = initial_windows(df, rows, forecaster.lookback)
+    capped = np.zeros((len(rows), steps), dtype=bool)
+    paths = forecaster.run(windows, steps, first_features=X_all[rows], capped=capped)
+    return Forecast(name, rows, df["date"].to_numpy()[rows], paths, capped)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recursive multi-horizon forecasts over the history.")
+    parser.add_argument("--model", choices=list(MODEL_SPECS), default="mlr_justbrent")
+    parser.add_argument("--horizons", nargs="+", type=int, default=list(DEFAULT_HORIZONS))
+    parser.add_argument("--wti", choices=WTI_POLICIES, default="persist")
+    parser.add_argument("--volume", choices=VOLUME_POLICIES, default="persist")
+    parser.add_argument(
+        "--max-step-change",
+        type=float,
+        default=DEFAULT_MAX_STEP_CHANGE,
+        help="opt-in cap on each step's relative move (capped steps are counted); 0 disables it",
+    )
+    parser.add_argument("--start", default=None, help="first start date (default: whole history)")
+    parser.add_argument("--data", default=str(DEFAULT_DATA_PATH))
+    parser.add_argument("--output", default=None, help="CSV path for the per-date forecasts")
+    args = parser.parse_args(argv)
+
+    df = load_processed_data(args.data)
+    features = load_features(df)
+    start_rows = None
+    if args.start is not None:
+        first = TimeIndex.from_frame(df).first_on_or_after(args.start)
+        if first is None:
+            raise ValueError(f"No rows on or after {args.start}")
+        start_rows = np.arange(first, len(df))
+
+    forecast = forecast_history(
+        df,
+        args.model,
+        LazyArtifacts().get(args.model),
+        features,
+        steps=max(args.horizons),
+        policy=ExogenousPolicy(args.wti, args.volume),
+        start_rows=start_rows,
+        max_step_change=args.max_step_change or None,
+    )
+    print(forecast.evaluate(df, args.horizons).to_string(index=False))
+    if args.output:
+        forecast.to_frame(args.horizons).to_csv(args.output, index=False)
+        print("Forecasts written to:", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""NumPy-only inference for the MLR (JustBrent) and MLP models.
+
+The exporter folds the fitted ``StandardScaler`` into the model weights:
+
+* MLR: ``((x - mean) / scale) @ coef + b`` becomes ``x @ (coef / scale) + b'``.
+* MLP: the same folding is applied to the first layer's weights and biases;
+  the remaining layers are stored as contiguous float64 arrays.
+
+The runtime below needs only NumPy, skips sklearn's per-call validation and
+matches ``model.predict(scaler.transform(X))`` to floating-point rounding.
+
+Convert the pickles already in ``models/`` with::
+
+    python -m src.fused_inference
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+
+
+FORMAT_VERSION = 1
+
+_ACTIVATIONS = {
+    "identity": lambda z: z,
+    "relu": lambda z: np.maximum(z, 0.0, out=z),
+    "tanh": lambda z: np.tanh(z, out=z),
+    "logistic": lambda z: np.divide(1.0, 1.0 + np.exp(-z, out=z), out=z),
+}
+
+
+def _as_matrix(X, feature_names) -> np.ndarray:
+    if hasattr(X, "columns"):
+        if feature_names and list(X.columns) != feature_names:
+            X = X[feature_names]
+        X = X.to_numpy(dtype=np.float64)
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X[None, :]
+    return X
+
+
+def _scaler_terms(scaler, n_features: int):
+    mean = getattr(scaler, "mean_", None)
+    scale = getattr(scaler, "scale_", None)
+    mean = np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64)
+    scale = np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64)
+    return mean, scale
+
+
+class FusedLinear:
+    kind = "linear"
+
+    def __init__(self, coef: np.ndarray, intercept: float, feature_names=None):
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+
+    @classmethod
+    def from_sklearn(cls, model, scaler=None) -> "FusedLinear":
+        coef = np.asarray(model.coef_, dtype=np.float64).ravel()
+        mean, scale = _scaler_terms(scaler, coef.size)
+        fused = coef / scale
+        intercept = float(np.ravel(model.intercept_)[0]) - float(mean @ fused)
+        names = getattr(scaler, "feature_names_in_", getattr(model, "feature_names_in_", None))
+        return cls(fused, intercept, names)
+
+    def predict(self, X) -> np.ndarray:
+        return _as_matrix(X, self.feature_names) @ self.coef + self.intercept
+
+    def _arrays(self):
+        return {"coef": self.coef, "intercept": np.array(self.intercept)}
+
+
+class FusedMLP:
+    kind = "mlp"
+
+    def __init__(self, weights, biases, activation: str = "relu", feature_names=None):
+        if activation not in _ACTIVATIONS:
+            raise ValueError(f"Unsupported activation: {activation}")
+        self.weights = [np.ascontiguousarray(w, dtype=np.float64) for w in weights]
+        self.biases = [np.ascontiguousarray(b, dtype=np.float64) for b in biases]
+        self.activation = activation
+        self.feature_names = list(feature_names) if feature_names is not None else None
+
+    @classmethod
+    def from_sklearn(cls, model, scaler=None) -> "FusedMLP":
+        if getattr(model, "out_activation_", "identity") != "identity":
+            raise ValueError("Only regressors with an identity output layer are supported")
+        weights = [np.array(w, dtype=np.float64) for w in model.coefs_]
+        biases = [np.array(b, dtype=np.float64) for b in model.intercepts_]
+        mean, scale = _scaler_terms(scaler, weights[0].shape[0])
+        biases[0] = biases[0] - (mean / scale) @ weights[0]
+        weights[0] = weights[0] / scale[:, None]
+        names = getattr(scaler, "feature_names_in_", getattr(model, "feature_names_in_", None))
+        return cls(weights, biases, model.activation, names)
+
+    def predict(self, X) -> np.ndarray:
+        act = _ACTIVATIONS[self.activation]
+        z = _as_matrix(X, self.feature_names)
+        last = len(self.weights) - 1
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            z = z @ w
+            z += b
+            if i != last:
+                z = act(z)
+        return z[:, 0] if z.shape[1] == 1 else z
+
+    def _arrays(self):
+        out = {"activation": np.array(self.activation), "n_layers": np.array(len(self.weights))}
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            out[f"W{i}"] = w
+            out[f"b{i}"] = b
+        return out
+
+
+def save_fused(model, path: Path | str) -> Path:
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as fh:
+        np.savez(
+            fh,
+            version=np.array(FORMAT_VERSION),
+            kind=np.array(model.kind),
+            feature_names=np.array(model.feature_names or [], dtype=str),
+            **model._arrays(),
+        )
+    tmp.replace(path)
+    return path
+
+
+def load_fused(path: Path | str):
+    with np.load(path, allow_pickle=False) as data:
+        if int(data["version"]) != FORMAT_VERSION:
+            raise ValueError(f"Unsupported fused model version in {path}")
+        names = [str(c) for c in data["feature_names"]] or None
+        kind = str(data["kind"])
+        if kind == "linear":
+            return FusedLinear(data["coef"], float(data["intercept"]), names)
+        if kind == "mlp":
+            n_layers = int(data["n_layers"])
+            return FusedMLP(
+                [data[f"W{i}"] for i in range(n_layers)],
+                [data[f"b{i}"] for i in range(n_layers)],
+                str(data["activation"]),
+                names,
+            )
+    raise ValueError(f"Unknown fused model kind in {path}: {kind}")
+
+
+def main():
+    import joblib
+
+    from src.artifacts import MODELS_DIR
+
+    for name, fuse in (("mlr_justbrent", FusedLinear), ("nn", FusedMLP)):
+        model = joblib.load(MODELS_DIR / f"{name}_model.pkl")
+        scaler = joblib.load(MODELS_DIR / f"{name}_scaler.pkl")
+        out = save_fused(fuse.from_sklearn(model, scaler), MODELS_DIR / f"{name}_fused.npz")
+        print("Fused model written to:", out)
+
+
+if __name__ == "__main__":
+    main()
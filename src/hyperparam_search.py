@@ -0,0 +1,331 @@
+"""Hyperparameter search for the RF and MLP models over time-ordered folds.
+
+Candidates are scored by validation RMSE on expanding folds cut from the
+train + validation part of ``split_train_val_test`` (the test split is never
+used). Successive halving keeps the best ``1/eta`` of the candidates at each
+rung and gives the survivors ``eta`` times more budget. RF grows more trees
+with ``warm_start``, resuming from the previous rung inside a worker (a
+resumed forest is identical to one trained from scratch). The MLP is trained
+with the exporter's own ``fit_nn`` (early stopping and its validation holdout
+included) with ``max_iter`` scaled by the budget, so the full-budget score is
+that of the model ``src.export_models`` would ship. Results do not depend on
+which process ran which task.
+
+Completed (candidate, fold, budget) trials are appended to a JSONL file under
+``data/cache/hpsearch/`` keyed by data, feature spec and parameters, so an
+interrupted search resumes where it stopped. With ``--export`` the winner is
+stored in ``models/{name}_params.json`` and trained by ``src.export_models``.
+
+    python -m src.hyperparam_search rf --candidates 12 --workers 4 --export
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.exceptions import ConvergenceWarning
+
+from src import export_models
+from src.feature_spec import spec_fingerprint
+from src.feature_store import frame_fingerprint, load_features
+from src.features import (
+    DEFAULT_DATA_PATH,
+    REPO_ROOT,
+    build_features_nn,
+    build_features_rf,
+    load_processed_data,
+    split_train_val_test,
+)
+
+
+DEFAULT_CACHE_DIR = REPO_ROOT / "data" / "cache" / "hpsearch"
+
+SEARCH_SPACES = {
+    "rf": {
+        "n_estimators": [100, 200, 400],
+        "max_depth": [None, 12, 20],
+        "min_samples_split": [2, 5, 10],
+        "min_samples_leaf": [1, 2, 4],
+        "max_features": [1.0, 0.5, "sqrt"],
+    },
+    "nn": {
+        "hidden_layer_sizes": [(64, 32, 16), (128, 64), (64, 32), (32, 16)],
+        "alpha": [1e-4, 1e-3, 1e-2],
+        "learning_rate_init": [1e-3, 3e-3],
+        "max_iter": [200],
+    },
+}
+
+BUILDERS = {"rf": build_features_rf, "nn": build_features_nn}
+
+# Bumped when a grower's training procedure changes, invalidating cached trials.
+TRIAL_VERSION = 2
+
+# Warm models kept per worker between rungs; older entries are simply retrained.
+_MAX_WARM_MODELS = 16
+_WARM = OrderedDict()
+_FOLDS = {}
+
+
+def time_folds(X, y, n_folds: int = 3):
+    """Expanding (train, val) index ranges; the last one is ``split_train_val_test``'s."""
+    X_train, X_val, _, _, _, _ = split_train_val_test(X, y)
+    n_val = len(X_val)
+    end = len(X_train) + n_val
+    folds = []
+    for k in range(n_folds, 0, -1):
+        val_end = end - (k - 1) * n_val
+        val_start = val_end - n_val
+        if val_start <= 0:
+            raise ValueError("Not enough history for the requested number of folds")
+        folds.append((val_start, val_end))
+    return folds
+
+
+def sample_candidates(name: str, n: int, seed: int = 0) -> list[dict]:
+    space = SEARCH_SPACES[name]
+    grid = [dict(zip(space, values)) for values in itertools.product(*space.values())]
+    rng = np.random.default_rng(seed)
+    picks = rng.permutation(len(grid))[: min(n, len(grid))]
+    base = export_models.MODEL_PARAMS[name]
+    # The current defaults always compete.
+    candidates = [dict(base)]
+    for i in picks:
+        params = {**base, **grid[i]}
+        if export_models._json_params(params) != export_models._json_params(base):
+            candidates.append(params)
+    return candidates[: max(n, 1)]
+
+
+def _params_key(params: dict) -> str:
+    return json.dumps(export_models._json_params(params), sort_keys=True)
+
+
+def _trial_key(name: str, params: dict, fold: int, budget: float, data_fp: str) -> str:
+    payload = "|".join(
+        [
+            name,
+            _params_key(params),
+            str(fold),
+            f"{budget:.6f}",
+            data_fp,
+            spec_fingerprint([name]),
+            str(TRIAL_VERSION),
+        ]
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+class TrialCache:
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self.trials = {}
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # a torn last line from an interrupted run
+                    self.trials[record["key"]] = record
+
+    def get(self, key: str):
+        return self.trials.get(key)
+
+    def add(self, record: dict) -> None:
+        self.trials[record["key"]] = record
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(record) + "\n")
+
+
+def _init_worker(name: str, data_path: str, fingerprint: str, n_folds: int) -> None:
+    df = load_processed_data(data_path)
+    _, X, y, _ = BUILDERS[name](df, load_features(df, fingerprint))
+    X, y = X.to_numpy(dtype=np.float64), y.to_numpy(dtype=np.float64)
+    _FOLDS.clear()
+    _WARM.clear()
+    for i, (val_start, val_end) in enumerate(time_folds(X, y, n_folds)):
+        _FOLDS[i] = (X[:val_start], y[:val_start], X[val_start:val_end], y[val_start:val_end])
+
+
+# Growers return (warm state, model, scaler) after training up to ``budget``.
+def _grow_rf(model, params: dict, budget: float, X, y):
+    trees = max(1, int(round(params["n_estimators"] * budget)))
+    if model is None:
+        model = RandomForestRegressor(**{**params, "n_estimators": trees}, warm_start=True, n_jobs=1)
+    else:
+        model.set_params(n_estimators=trees)
+    model.fit(X, y)
+    return model, model, None
+
+
+def _grow_nn(state, params: dict, budget: float, X, y):
+    # Early stopping makes a resumed fit differ from a fresh one, so each rung
+    # retrains with the exporter's procedure and a smaller ``max_iter``.
+    epochs = max(1, int(round(params["max_iter"] * budget)))
+    model, scaler = export_models.fit_nn(X, y, {**params, "max_iter": epochs})
+    return None, model, scaler
+
+
+GROWERS = {"rf": _grow_rf, "nn": _grow_nn}
+
+
+def _run_trial(name: str, params: dict, fold: int, budget: float) -> float:
+    X_train, y_train, X_val, y_val = _FOLDS[fold]
+    warm_key = (_params_key(params), fold)
+    state = _WARM.pop(warm_key, None)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", ConvergenceWarning)
+        state, model, scaler = GROWERS[name](state, params, budget, X_train, y_train)
+    if state is not None:
+        _WARM[warm_key] = state
+    while len(_WARM) > _MAX_WARM_MODELS:
+        _WARM.popitem(last=False)
+    pred = export_models.predict_fitted(model, scaler, X_val)
+    return float(np.sqrt(np.mean((pred - y_val) ** 2)))
+
+
+def successive_halving(
+    name: str,
+    candidates: list[dict],
+    data_path: str = str(DEFAULT_DATA_PATH),
+    n_folds: int = 3,
+    eta: int = 3,
+    min_budget: float = 1 / 9,
+    workers: int | None = None,
+    cache: TrialCache | None = None,
+) -> list[dict]:
+    """Return the leaderboard (best first) of the final rung plus pruned candidates."""
+    if name not in SEARCH_SPACES:
+        raise ValueError(f"No search space for model: {name}")
+    df = load_processed_data(data_path)
+    fingerprint = frame_fingerprint(df)
+    # Build the shared feature store entry once before the workers map it.
+    load_features(df, fingerprint)
+    cache = cache or TrialCache(DEFAULT_CACHE_DIR / f"{name}.jsonl")
+
+    budgets = []
+    budget = min_budget
+    while budget * eta <= 1.0 + 1e-9:
+        budgets.append(budget)
+        budget *= eta
+    budgets.append(1.0)
+
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, len(candidates) * n_folds))
+    alive = list(range(len(candidates)))
+    board = {}
+    pool = None
+    try:
+        for rung, budget in enumerate(budgets):
+            pending = []
+            scores = {i: [None] * n_folds for i in alive}
+            for i in alive:
+                for fold in range(n_folds):
+                    key = _trial_key(name, candidates[i], fold, budget, fingerprint)
+                    hit = cache.get(key)
+                    if hit is not None:
+                        scores[i][fold] = hit["rmse"]
+                    else:
+                        pending.append((i, fold, key))
+
+            if pending:
+                if workers == 1:
+                    if not _FOLDS:
+                        _init_worker(name, data_path, fingerprint, n_folds)
+                    results = [_run_trial(name, candidates[i], fold, budget) for i, fold, _ in pending]
+                else:
+                    if pool is None:
+                        pool = ProcessPoolExecutor(
+                            max_workers=workers,
+                            initializer=_init_worker,
+                            initargs=(name, data_path, fingerprint, n_folds),
+                        )
+                    futures = [
+                        pool.submit(_run_trial, name, candidates[i], fold, budget)
+                        for i, fold, _ in pending
+                    ]
+                    results = [f.result() for f in futures]
+                for (i, fold, key), rmse in zip(pending, results):
+                    scores[i][fold] = rmse
+                    cache.add(
+                        {
+                            "key": key,
+                            "model": name,
+                            "params": export_models._json_params(candidates[i]),
+                            "fold": fold,
+                            "budget": budget,
+                            "rmse": rmse,
+                        }
+                    )
+
+            for i in alive:
+                board[i] = {
+                    "params": candidates[i],
+                    "budget": budget,
+                    "rung": rung,
+                    "rmse": float(np.mean(scores[i])),
+                }
+            print(
+                f"rung {rung}: budget {budget:.3f}, {len(alive)} candidates, "
+                f"{len(pending)} trials run, {len(alive) * n_folds - len(pending)} cached"
+            )
+            if rung < len(budgets) - 1:
+                alive.sort(key=lambda i: board[i]["rmse"])
+                alive = alive[: max(1, len(alive) // eta)]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        _FOLDS.clear()
+        _WARM.clear()
+
+    return sorted(board.values(), key=lambda r: (-r["rung"], r["rmse"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune the RF or MLP hyperparameters.")
+    parser.add_argument("model", choices=list(SEARCH_SPACES))
+    parser.add_argument("--candidates", type=int, default=9)
+    parser.add_argument("--folds", type=int, default=3)
+    parser.add_argument("--eta", type=int, default=3, help="keep 1/eta of candidates per rung")
+    parser.add_argument("--min-budget", type=float, default=1 / 9, help="first rung budget fraction")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data", default=str(DEFAULT_DATA_PATH))
+    parser.add_argument("--export", action="store_true", help="train and export the winner")
+    args = parser.parse_args(argv)
+
+    candidates = sample_candidates(args.model, args.candidates, args.seed)
+    board = successive_halving(
+        args.model,
+        candidates,
+        data_path=args.data,
+        n_folds=args.folds,
+        eta=args.eta,
+        min_budget=args.min_budget,
+        workers=args.workers,
+    )
+    for row in board:
+        print(f"rung {row['rung']}  rmse {row['rmse']:.4f}  {export_models._json_params(row['params'])}")
+
+    best = board[0]["params"]
+    print("Best:", export_models._json_params(best))
+    if args.export:
+        path = export_models.save_tuned_params(args.model, best)
+        print("Tuned parameters written to:", path)
+        export_models.main(["--models", args.model, "--data", args.data])
+
+
+if __name__ == "__main__":
+    main()
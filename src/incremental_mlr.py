@@ -0,0 +1,228 @@
+"""Incremental refits of the MLR (JustBrent) model from sufficient statistics.
+
+``IncrementalLinear`` keeps the (optionally exponentially weighted) count, the
+column sums and the cross products ``XᵀX`` / ``Xᵀy`` of the training window.
+``absorb`` and ``drop`` update them in O(p²) per row and ``solve`` recovers the
+standardised OLS coefficients in O(p³), so a daily refit no longer rescans the
+whole history. Sums are taken relative to the first absorbed row to keep the
+cancellation in ``XᵀX - n·μμᵀ`` small for price-level features.
+
+``to_sklearn`` returns a fitted ``StandardScaler`` / ``LinearRegression`` pair
+equivalent to ``export_models.fit_mlr_justbrent`` on the same window, and
+``save`` publishes it as a model registry entry (artifacts plus
+``<name>_meta.json``) and makes that entry current, so the app, the server and
+the ensemble pick it up like an ordinary export. The meta's metrics are those
+of this fit on the held-out rows passed to ``save``; without them it stores
+none, and the ensemble falls back to equal weights.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+
+from src import export_models
+from src.features import MLR_JUSTBRENT_FEATURE_COLS
+from src.fused_inference import FusedLinear, save_fused
+from src.metrics import regression_metrics
+from src.model_registry import ModelRegistry, config_key
+
+
+class IncrementalLinear:
+    def __init__(self, n_features: int | None = None, forgetting: float = 1.0, feature_names=None):
+        if not 0.0 < forgetting <= 1.0:
+            raise ValueError("forgetting must be in (0, 1]")
+        if feature_names is not None:
+            feature_names = [str(c) for c in feature_names]
+            n_features = len(feature_names) if n_features is None else n_features
+        if n_features is None:
+            raise ValueError("n_features or feature_names is required")
+        self.n_features = int(n_features)
+        self.forgetting = float(forgetting)
+        self.feature_names = feature_names
+        self.reset()
+
+    def reset(self) -> None:
+        p = self.n_features
+        self.n = 0.0
+        self.n_rows = 0
+        self.shift = None
+        self.y_shift = 0.0
+        self.sx = np.zeros(p)
+        self.sy = 0.0
+        self.sxx = np.zeros((p, p))
+        self.sxy = np.zeros(p)
+
+    def _arrays(self, X, y):
+        if hasattr(X, "columns") and self.feature_names is not None:
+            X = X[self.feature_names]
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        y = np.atleast_1d(np.asarray(y, dtype=np.float64))
+        if X.shape[1] != self.n_features or len(X) != len(y):
+            raise ValueError(f"Expected X (n, {self.n_features}) and y (n,), got {X.shape}, {y.shape}")
+        return X, y
+
+    def absorb(self, X, y) -> "IncrementalLinear":
+        X, y = self._arrays(X, y)
+        if not len(X):
+            return self
+        if self.shift is None:
+            self.shift = X[0].copy()
+            self.y_shift = float(y[0])
+        Xs = X - self.shift
+        ys = y - self.y_shift
+
+        if self.forgetting < 1.0:
+            # Row i of k new rows ends up k-1-i steps old.
+            k = len(X)
+            decay = self.forgetting ** k
+            w = self.forgetting ** np.arange(k - 1, -1, -1, dtype=np.float64)
+            self.n = self.n * decay + w.sum()
+            self.sx = self.sx * decay + w @ Xs
+            self.sy = self.sy * decay + float(w @ ys)
+            self.sxx = self.sxx * decay + (Xs * w[:, None]).T @ Xs
+            self.sxy = self.sxy * decay + (Xs * w[:, None]).T @ ys
+        else:
+            self.n += len(X)
+            self.sx += Xs.sum(axis=0)
+            self.sy += float(ys.sum())
+            self.sxx += Xs.T @ Xs
+            self.sxy += Xs.T @ ys
+        self.n_rows += len(X)
+        return self
+
+    def drop(self, X, y) -> "IncrementalLinear":
+        """Remove rows absorbed earlier (sliding windows; requires ``forgetting == 1``)."""
+        if self.forgetting < 1.0:
+            raise ValueError("drop is only defined without exponential forgetting")
+        X, y = self._arrays(X, y)
+        if not len(X):
+            return self
+        if self.shift is None or len(X) > self.n_rows:
+            raise ValueError("Cannot drop more rows than were absorbed")
+        Xs = X - self.shift
+        ys = y - self.y_shift
+        self.n -= len(X)
+        self.sx -= Xs.sum(axis=0)
+        self.sy -= float(ys.sum())
+        self.sxx -= Xs.T @ Xs
+        self.sxy -= Xs.T @ ys
+        self.n_rows -= len(X)
+        return self
+
+    def _moments(self):
+        if self.n_rows < 2:
+            raise ValueError("At least two rows are needed to fit")
+        mx = self.sx / self.n
+        my = self.sy / self.n
+        cxx = self.sxx - self.n * np.outer(mx, mx)
+        cxy = self.sxy - self.n * mx * my
+        var = np.maximum(np.diag(cxx) / self.n, 0.0)
+        return mx + self.shift, my + self.y_shift, var, cxx, cxy
+
+    def solve(self):
+        """Return ``(mean, var, scale, coef_scaled, intercept)`` of the current window."""
+        mean, y_mean, var, cxx, cxy = self._moments()
+        scale = np.sqrt(var)
+        # Same convention as StandardScaler for constant columns.
+        scale[scale < 10 * np.finfo(np.float64).eps * np.maximum(np.abs(mean), 1.0)] = 1.0
+        corr = cxx / np.outer(scale, scale)
+        rhs = cxy / scale
+        coef_scaled = np.linalg.lstsq(corr, rhs, rcond=None)[0]
+        return mean, var, scale, coef_scaled, y_mean
+
+    def predict(self, X) -> np.ndarray:
+        X, _ = self._arrays(X, np.zeros(len(X) if np.ndim(X) > 1 else 1))
+        mean, _, scale, coef_scaled, intercept = self.solve()
+        coef = coef_scaled / scale
+        return X @ coef + (intercept - mean @ coef)
+
+    def to_sklearn(self):
+        mean, var, scale, coef_scaled, intercept = self.solve()
+
+        scaler = StandardScaler()
+        scaler.mean_ = mean
+        scaler.var_ = var
+        scaler.scale_ = scale
+        scaler.n_samples_seen_ = self.n_rows
+        scaler.n_features_in_ = self.n_features
+        if self.feature_names is not None:
+            scaler.feature_names_in_ = np.array(self.feature_names, dtype=object)
+
+        model = LinearRegression(fit_intercept=True)
+        model.coef_ = coef_scaled
+        model.intercept_ = float(intercept)
+        model.n_features_in_ = self.n_features
+        # Singular values of the standardised training matrix, as sklearn reports.
+        gram = self._moments()[3] / np.outer(scale, scale)
+        eig = np.clip(np.linalg.eigvalsh(gram)[::-1], 0.0, None)
+        model.singular_ = np.sqrt(eig)
+        model.rank_ = int(np.linalg.matrix_rank(gram, hermitian=True))
+        return model, scaler
+
+    def state_digest(self) -> str:
+        """Hash of the sufficient statistics; equal windows give equal digests."""
+        h = hashlib.sha256()
+        h.update(json.dumps([self.n, self.n_rows, self.forgetting, self.y_shift, self.sy]).encode("utf-8"))
+        for array in (self.shift, self.sx, self.sxx, self.sxy):
+            h.update(np.ascontiguousarray(array if array is not None else [], dtype=np.float64).tobytes())
+        return h.hexdigest()[:16]
+
+    def save(
+        self,
+        models_dir: Path | str = export_models.MODELS_DIR,
+        name: str = "mlr_justbrent",
+        *,
+        fingerprint: str,
+        holdout=None,
+    ) -> Path:
+        """Publish the current fit to the model registry and make it current.
+
+        ``fingerprint`` identifies the data the window was drawn from and is
+        part of the registry key. ``holdout`` is an ``(X, y)`` pair of rows
+        outside the window; this fit's metrics on it are stored as ``"val"``
+        and feed the ensemble weights. Returns the entry directory.
+        """
+        if not fingerprint:
+            raise ValueError("fingerprint is required")
+        registry = ModelRegistry.for_models_dir(models_dir)
+        split_sizes = {"train": self.n_rows}
+        metrics = {}
+        if holdout is not None:
+            X_val, y_val = self._arrays(*holdout)
+            metrics["val"] = regression_metrics(y_val, self.predict(X_val))
+            split_sizes["val"] = len(y_val)
+
+        model, scaler = self.to_sklearn()
+        incremental = {"n_rows": self.n_rows, "forgetting": self.forgetting, "state": self.state_digest()}
+        config = {**export_models.registry_config(name, fingerprint), "incremental": incremental}
+        key = config_key(config)
+        if registry.lookup(name, key) is None:
+            with registry.stage(name, key, config) as out_dir:
+                joblib.dump(model, out_dir / f"{name}_model.pkl")
+                joblib.dump(scaler, out_dir / f"{name}_scaler.pkl")
+                save_fused(FusedLinear.from_sklearn(model, scaler), out_dir / f"{name}_fused.npz")
+                export_models._save_meta(
+                    name,
+                    self.feature_names or [],
+                    split_sizes,
+                    metrics,
+                    fingerprint,
+                    out_dir,
+                    registry_key=key,
+                    extra={"incremental": incremental},
+                )
+        registry.set_current(name, key)
+        return registry.entry_dir(name, key)
+
+
+def for_mlr_justbrent(forgetting: float = 1.0) -> IncrementalLinear:
+    return IncrementalLinear(forgetting=forgetting, feature_names=MLR_JUSTBRENT_FEATURE_COLS)
@@ -0,0 +1,280 @@
+"""Stream intraday ticks or minute bars into daily OHLCV bars.
+
+The raw file is read in chunks; each chunk is reduced to per-day partial bars
+with NumPy (``reduceat`` over the time-sorted chunk) and folded into a table of
+*open* days. A day is closed and written out once a later day has been seen
+(``lateness_days`` more, if the feed can deliver ticks late), so memory grows
+with the number of open days, not with the number of ticks. Ticks that arrive
+for a day that has already been written are counted and dropped.
+
+Each row may be a tick (``price`` plus optional ``volume``) or a bar (``open``,
+``high``, ``low``, ``close``, optional ``volume`` / ``average``). The daily
+``average`` is the volume-weighted price, or the mean price on days without
+volume. Output columns are ``date, open, high, low, close, volume, average``,
+the raw-file schema that ``data_preprocessing`` suffixes to ``_x`` / ``_y``;
+``--suffix`` writes the suffixed names directly. Timestamps are parsed with one
+explicit ``--time-format`` (ISO 8601 by default) for every chunk, never inferred.
+
+    python -m src.intraday data/raw/brent_ticks.csv --output data/raw/brent_prices.csv
+    python -m src.intraday wti_minutes.csv --time-col datetime --tz America/New_York \\
+        --output data/raw/wti_prices.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src import tracing
+
+
+DAILY_COLUMNS = ["date", "open", "high", "low", "close", "volume", "average"]
+DEFAULT_CHUNK_ROWS = 500_000
+DEFAULT_TIME_FORMAT = "ISO8601"
+
+# Per-day partial state, one row of this layout per open day. The first and
+# last tick times are kept apart as int64 nanoseconds: float64 would round them
+# (to ~256 ns today) and break the open/close tie-breaks in ``_fold``.
+_FIRST_TS, _LAST_TS = range(2)
+_OPEN, _CLOSE, _HIGH, _LOW, _VOLUME, _PV, _PSUM, _COUNT = range(8)
+_STATE_WIDTH = 8
+
+
+@dataclass
+class AggregateStats:
+    rows: int = 0
+    days: int = 0
+    late_rows: int = 0
+    max_open_days: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float("nan")
+
+    def report(self) -> str:
+        return (
+            f"{self.rows:,} rows -> {self.days:,} days in {self.seconds:.2f}s "
+            f"({self.rows_per_sec:,.0f} rows/s, at most {self.max_open_days} open days, "
+            f"{self.late_rows:,} late rows dropped)"
+        )
+
+
+def _chunk_fields(
+    chunk: pd.DataFrame,
+    time_col: str,
+    price_col: str,
+    volume_col: str,
+    tz: str | None,
+    time_format: str = DEFAULT_TIME_FORMAT,
+):
+    """``(timestamps, open, high, low, close, volume, avg_price)`` arrays for one chunk."""
+    if time_col not in chunk.columns:
+        raise ValueError(f"Missing time column: {time_col}")
+    if tz is None:
+        ts = pd.to_datetime(chunk[time_col], format=time_format)
+    else:
+        # Calendar days are taken in the exchange's local time.
+        ts = pd.to_datetime(chunk[time_col], format=time_format, utc=True)
+        ts = ts.dt.tz_convert(tz).dt.tz_localize(None)
+    ts = ts.to_numpy(dtype="datetime64[ns]")
+
+    if {"open", "high", "low", "close"}.issubset(chunk.columns):
+        o, h, l, c = (chunk[col].to_numpy(dtype=np.float64) for col in ("open", "high", "low", "close"))
+        avg = chunk["average"].to_numpy(dtype=np.float64) if "average" in chunk.columns else c
+    elif price_col in chunk.columns:
+        o = h = l = c = avg = chunk[price_col].to_numpy(dtype=np.float64)
+    else:
+        raise ValueError(f"Expected a '{price_col}' column or open/high/low/close columns")
+    if volume_col in chunk.columns:
+        v = chunk[volume_col].to_numpy(dtype=np.float64)
+    else:
+        v = np.zeros(len(chunk))
+    return ts, o, h, l, c, v, avg
+
+
+def _partial_bars(ts, o, h, l, c, v, avg):
+    """Per-day partial bars for one chunk: ``(days, times, state)`` with days ascending."""
+    order = np.argsort(ts, kind="stable")
+    ts, o, h, l, c, v, avg = (a[order] for a in (ts, o, h, l, c, v, avg))
+    days = ts.astype("datetime64[D]")
+    starts = np.flatnonzero(np.concatenate([[True], days[1:] != days[:-1]]))
+    ends = np.append(starts[1:], len(ts)) - 1
+
+    times = np.empty((len(starts), 2), dtype=np.int64)
+    times[:, _FIRST_TS] = ts[starts].astype(np.int64)
+    times[:, _LAST_TS] = ts[ends].astype(np.int64)
+    state = np.empty((len(starts), _STATE_WIDTH))
+    state[:, _OPEN] = o[starts]
+    state[:, _CLOSE] = c[ends]
+    state[:, _HIGH] = np.maximum.reduceat(h, starts)
+    state[:, _LOW] = np.minimum.reduceat(l, starts)
+    state[:, _VOLUME] = np.add.reduceat(v, starts)
+    state[:, _PV] = np.add.reduceat(avg * v, starts)
+    state[:, _PSUM] = np.add.reduceat(avg, starts)
+    state[:, _COUNT] = np.diff(np.append(starts, len(ts)))
+    return days[starts], times, state
+
+
+def _fold(old, new):
+    """Combine two ``(times, state)`` partial bars of the same day."""
+    old_times, old_state = old
+    new_times, new_state = new
+    times, out = old_times.copy(), old_state.copy()
+    if new_times[_FIRST_TS] < old_times[_FIRST_TS]:
+        times[_FIRST_TS], out[_OPEN] = new_times[_FIRST_TS], new_state[_OPEN]
+    if new_times[_LAST_TS] >= old_times[_LAST_TS]:
+        times[_LAST_TS], out[_CLOSE] = new_times[_LAST_TS], new_state[_CLOSE]
+    out[_HIGH] = max(old_state[_HIGH], new_state[_HIGH])
+    out[_LOW] = min(old_state[_LOW], new_state[_LOW])
+    out[_VOLUME:] = old_state[_VOLUME:] + new_state[_VOLUME:]
+    return times, out
+
+
+def _finish(days, states, suffix: str) -> pd.DataFrame:
+    states = np.asarray(states).reshape(-1, _STATE_WIDTH)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        average = np.where(
+            states[:, _VOLUME] > 0,
+            states[:, _PV] / states[:, _VOLUME],
+            states[:, _PSUM] / states[:, _COUNT],
+        )
+    frame = pd.DataFrame(
+        {
+            "date": np.asarray(days, dtype="datetime64[ns]"),
+            "open": states[:, _OPEN],
+            "high": states[:, _HIGH],
+            "low": states[:, _LOW],
+            "close": states[:, _CLOSE],
+            "volume": np.rint(states[:, _VOLUME]).astype(np.int64),
+            "average": average,
+        }
+    )
+    if suffix:
+        frame.columns = ["date"] + [f"{col}{suffix}" for col in DAILY_COLUMNS[1:]]
+    return frame
+
+
+@tracing.traced()
+def iter_daily_bars(
+    path: Path | str,
+    time_col: str = "timestamp",
+    price_col: str = "price",
+    volume_col: str = "volume",
+    tz: str | None = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    lateness_days: int = 0,
+    suffix: str = "",
+    stats: AggregateStats | None = None,
+    time_format: str = DEFAULT_TIME_FORMAT,
+):
+    """Yield DataFrames of finished daily bars in date order.
+
+    ``stats`` (if given) is updated as the stream is consumed.
+    """
+    if chunk_rows < 1:
+        raise ValueError("chunk_rows must be at least 1")
+    if lateness_days < 0:
+        raise ValueError("lateness_days must not be negative")
+    stats = stats if stats is not None else AggregateStats()
+    started = time.perf_counter()
+    lateness = np.timedelta64(lateness_days, "D")
+    open_days: dict[np.datetime64, tuple[np.ndarray, np.ndarray]] = {}
+    closed_before = None  # every day before this one has been written
+
+    def close_days(until):
+        ready = sorted(day for day in open_days if until is None or day < until)
+        if not ready:
+            return None
+        stats.days += len(ready)
+        return _finish(ready, [open_days.pop(day)[1] for day in ready], suffix)
+
+    for chunk in pd.read_csv(path, chunksize=chunk_rows):
+        fields = _chunk_fields(chunk, time_col, price_col, volume_col, tz, time_format)
+        stats.rows += len(chunk)
+        if closed_before is not None:
+            fresh = fields[0].astype("datetime64[D]") >= closed_before
+            stats.late_rows += int(len(fresh) - fresh.sum())
+            fields = tuple(a[fresh] for a in fields)
+        if len(fields[0]):
+            days, times, state = _partial_bars(*fields)
+            for day, bar in zip(days, zip(times, state)):
+                open_days[day] = _fold(open_days[day], bar) if day in open_days else bar
+            stats.max_open_days = max(stats.max_open_days, len(open_days))
+            # Days more than `lateness_days` before the newest day are complete.
+            watermark = max(open_days) - lateness
+            if closed_before is None or watermark > closed_before:
+                closed_before = watermark
+            finished = close_days(closed_before)
+            if finished is not None:
+                stats.seconds = time.perf_counter() - started
+                yield finished
+
+    finished = close_days(None)
+    stats.seconds = time.perf_counter() - started
+    if finished is not None:
+        yield finished
+
+
+def aggregate_file(path: Path | str, output: Path | str, **kwargs) -> AggregateStats:
+    """Write the daily bars of ``path`` to the CSV ``output`` (atomically)."""
+    stats = AggregateStats()
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_suffix(output.suffix + ".tmp")
+    try:
+        with open(tmp, "w", newline="") as out:
+            first = True
+            for bars in iter_daily_bars(path, stats=stats, **kwargs):
+                bars.to_csv(out, index=False, header=first, date_format="%Y-%m-%d")
+                first = False
+        if first:
+            raise ValueError(f"No rows found in {path}")
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    tmp.replace(output)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate intraday ticks or bars into daily OHLCV.")
+    parser.add_argument("input", help="tick or minute-bar CSV")
+    parser.add_argument("--output", required=True, help="daily CSV to write")
+    parser.add_argument("--time-col", default="timestamp")
+    parser.add_argument("--price-col", default="price", help="tick price column")
+    parser.add_argument("--volume-col", default="volume")
+    parser.add_argument(
+        "--time-format",
+        default=DEFAULT_TIME_FORMAT,
+        help="strftime format of the time column, e.g. '%%m/%%d/%%Y %%H:%%M' (default: ISO 8601)",
+    )
+    parser.add_argument("--tz", default=None, help="exchange time zone for calendar days (input read as UTC)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--lateness-days", type=int, default=0, help="days to keep open for late ticks")
+    parser.add_argument("--suffix", default="", help="column suffix such as _x or _y")
+    args = parser.parse_args(argv)
+
+    stats = aggregate_file(
+        args.input,
+        args.output,
+        time_col=args.time_col,
+        price_col=args.price_col,
+        volume_col=args.volume_col,
+        tz=args.tz,
+        time_format=args.time_format,
+        chunk_rows=args.chunk_rows,
+        lateness_days=args.lateness_days,
+        suffix=args.suffix,
+    )
+    print(stats.report())
+    print("Daily bars written to:", args.output)
+
+
+if __name__ == "__main__":
+    main()
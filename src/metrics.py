@@ -1,10 +1,164 @@
+"""Regression metrics in fused NumPy passes, plus rolling accuracy monitoring.
+
+``regression_metrics`` matches sklearn's ``mean_squared_error``,
+``mean_absolute_error`` and ``r2_score`` (including R² = 1 / 0 for a constant
+target) from one pass over the residuals. ``split_metrics`` scores many
+consecutive splits with a single ``np.add.reduceat`` per statistic.
+``RollingMetrics`` keeps windowed sums so a new (actual, prediction) pair
+updates the 20/60/250-day figures in O(1); ``rolling_metrics`` computes the
+same series for a whole history from cumulative sums.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+
 import numpy as np
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+import pandas as pd
+
+
+ROLLING_WINDOWS = (20, 60, 250)
+
+
+def _arrays(y_true, y_pred):
+    y_true = np.asarray(y_true, dtype=np.float64).ravel()
+    y_pred = np.asarray(y_pred, dtype=np.float64).ravel()
+    if y_true.shape != y_pred.shape:
+        raise ValueError(f"y_true and y_pred have different lengths: {len(y_true)} != {len(y_pred)}")
+    if not (np.isfinite(y_true).all() and np.isfinite(y_pred).all()):
+        raise ValueError("Input contains NaN or infinity")
+    return y_true, y_pred
+
+
+def _finish(n, sse, sae, ss_tot):
+    """Metrics from per-split sums (arrays of equal length)."""
+    n = np.asarray(n, dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mse = sse / n
+        mae = sae / n
+        r2 = np.where(ss_tot > 0, 1.0 - sse / np.where(ss_tot > 0, ss_tot, 1.0), np.where(sse == 0, 1.0, 0.0))
+    r2 = np.where(n < 2, np.nan, r2)
+    return mse, np.sqrt(mse), mae, r2
 
 
 def regression_metrics(y_true, y_pred):
-    mse = mean_squared_error(y_true, y_pred)
-    rmse = np.sqrt(mse)
-    mae = mean_absolute_error(y_true, y_pred)
-    r2 = r2_score(y_true, y_pred)
-    return {"MSE": mse, "RMSE": rmse, "MAE": mae, "R2": r2}
+    y_true, y_pred = _arrays(y_true, y_pred)
+    if not len(y_true):
+        raise ValueError("Found empty input")
+    err = y_pred - y_true
+    centred = y_true - y_true.mean()
+    mse, rmse, mae, r2 = _finish(
+        np.array([len(err)]),
+        np.array([err @ err]),
+        np.array([np.abs(err).sum()]),
+        np.array([centred @ centred]),
+    )
+    return {"MSE": float(mse[0]), "RMSE": float(rmse[0]), "MAE": float(mae[0]), "R2": float(r2[0])}
+
+
+def split_metrics(y_true, y_pred, sizes) -> list[dict]:
+    """Metrics for consecutive splits of the given sizes, in one pass per statistic."""
+    y_true, y_pred = _arrays(y_true, y_pred)
+    sizes = np.asarray(list(sizes), dtype=np.int64)
+    if sizes.sum() != len(y_true) or (sizes <= 0).any():
+        raise ValueError("Split sizes must be positive and add up to the number of rows")
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    err = y_pred - y_true
+    # Shift by the overall mean first so Σy² - (Σy)²/n does not cancel badly.
+    shifted = y_true - y_true.mean()
+    sse = np.add.reduceat(err * err, starts)
+    sae = np.add.reduceat(np.abs(err), starts)
+    sy = np.add.reduceat(shifted, starts)
+    syy = np.add.reduceat(shifted * shifted, starts)
+    ss_tot = np.maximum(syy - sy * sy / sizes, 0.0)
+    mse, rmse, mae, r2 = _finish(sizes, sse, sae, ss_tot)
+    return [
+        {"MSE": float(a), "RMSE": float(b), "MAE": float(c), "R2": float(d)}
+        for a, b, c, d in zip(mse, rmse, mae, r2)
+    ]
+
+
+def rolling_metrics(y_true, y_pred, window: int, index=None) -> pd.DataFrame:
+    """Trailing-window MSE/RMSE/MAE/R² for every row (NaN until the window is full)."""
+    y_true, y_pred = _arrays(y_true, y_pred)
+    n = len(y_true)
+    err = y_pred - y_true
+    shifted = y_true - (y_true.mean() if n else 0.0)
+
+    def trailing(values):
+        c = np.concatenate([[0.0], np.cumsum(values)])
+        out = np.full(n, np.nan)
+        if n >= window:
+            out[window - 1 :] = c[window:] - c[: n - window + 1]
+        return out
+
+    sse = trailing(err * err)
+    sae = trailing(np.abs(err))
+    sy = trailing(shifted)
+    syy = trailing(shifted * shifted)
+    ss_tot = np.maximum(syy - sy * sy / window, 0.0)
+    # Cumulative sums lose a few ulps; clamp tiny negative residual sums.
+    mse, rmse, mae, r2 = _finish(np.full(n, window), np.maximum(sse, 0.0), np.maximum(sae, 0.0), ss_tot)
+    r2 = np.where(np.isnan(sse), np.nan, r2)
+    return pd.DataFrame({"MSE": mse, "RMSE": rmse, "MAE": mae, "R2": r2}, index=index)
+
+
+class RollingMetrics:
+    """Windowed metrics updated in O(1) as each new actual arrives."""
+
+    # Re-sum the window every this many updates to cancel floating-point drift.
+    RESYNC_EVERY = 1024
+
+    def __init__(self, window: int):
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.window = window
+        self._buf = deque()
+        self._ref = None
+        self._sse = self._sae = self._sy = self._syy = 0.0
+        self._updates = 0
+
+    def __len__(self) -> int:
+        return len(self._buf)
+
+    def _add(self, sign: float, item) -> None:
+        se, ae, yc = item
+        self._sse += sign * se
+        self._sae += sign * ae
+        self._sy += sign * yc
+        self._syy += sign * yc * yc
+
+    def update(self, actual: float, pred: float) -> dict | None:
+        actual, pred = float(actual), float(pred)
+        if self._ref is None:
+            self._ref = actual
+        err = pred - actual
+        item = (err * err, abs(err), actual - self._ref)
+        self._buf.append(item)
+        self._add(1.0, item)
+        if len(self._buf) > self.window:
+            self._add(-1.0, self._buf.popleft())
+        self._updates += 1
+        if self._updates % self.RESYNC_EVERY == 0:
+            self._resync()
+        return self.value()
+
+    def extend(self, actuals, preds) -> dict | None:
+        for a, p in zip(actuals, preds):
+            self.update(a, p)
+        return self.value()
+
+    def _resync(self) -> None:
+        items = np.array(self._buf)
+        self._sse, self._sae, self._sy = (float(v) for v in items.sum(axis=0))
+        self._syy = float(items[:, 2] @ items[:, 2])
+
+    def value(self) -> dict | None:
+        n = len(self._buf)
+        if n < self.window:
+            return None
+        ss_tot = max(self._syy - self._sy * self._sy / n, 0.0)
+        mse, rmse, mae, r2 = _finish(
+            np.array([n]), np.array([max(self._sse, 0.0)]), np.array([max(self._sae, 0.0)]), np.array([ss_tot])
+        )
+        return {"MSE": float(mse[0]), "RMSE": float(rmse[0]), "MAE": float(mae[0]), "R2": float(r2[0])}
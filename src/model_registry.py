@@ -0,0 +1,237 @@
+"""Content-addressed registry of exported model artifacts.
+
+Each export lands in ``models/registry/<model>/<key>/`` where ``key`` hashes
+everything that determines the artifact: data fingerprint, feature spec
+fingerprint, hyperparameters and library versions (see
+``export_models.registry_config``). Entries are immutable: they are written
+to a staging directory and renamed into place once complete, so a reader
+never sees a half-written entry. ``models/registry/<model>/current`` names
+the entry in use and is replaced atomically with ``os.replace``.
+
+An unchanged configuration resolves to an existing key, so re-exporting just
+moves the pointer instead of retraining. ``resolve_dir`` is how readers find
+a model's files; it falls back to the flat ``models/`` layout when nothing
+has been published to the registry yet. Old entries are removed with
+``gc``::
+
+    python -m src.model_registry list
+    python -m src.model_registry gc --keep 3 --max-age-days 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import platform
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from src.features import REPO_ROOT
+
+
+MODELS_DIR = REPO_ROOT / "models"
+REGISTRY_DIRNAME = "registry"
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "current"
+STAGING_PREFIX = ".staging-"
+# Staging directories older than this are leftovers from crashed exports.
+STALE_STAGING_SECONDS = 24 * 3600
+
+
+def library_versions() -> dict[str, str]:
+    import joblib
+    import numpy
+    import sklearn
+
+    return {
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "scikit-learn": sklearn.__version__,
+        "joblib": joblib.__version__,
+    }
+
+
+def config_key(config: dict) -> str:
+    payload = json.dumps(config, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+class ModelRegistry:
+    def __init__(self, root: Path | str):
+        self.root = Path(root)
+
+    @classmethod
+    def for_models_dir(cls, models_dir: Path | str = MODELS_DIR) -> "ModelRegistry":
+        return cls(Path(models_dir) / REGISTRY_DIRNAME)
+
+    def entry_dir(self, name: str, key: str) -> Path:
+        return self.root / name / key
+
+    def lookup(self, name: str, key: str) -> Path | None:
+        """The entry directory for ``key`` if it was fully written, else ``None``."""
+        path = self.entry_dir(name, key)
+        return path if (path / MANIFEST_FILE).exists() else None
+
+    def manifest(self, name: str, key: str) -> dict:
+        return json.loads((self.entry_dir(name, key) / MANIFEST_FILE).read_text(encoding="utf-8"))
+
+    @contextlib.contextmanager
+    def stage(self, name: str, key: str, config: dict, replace: bool = False):
+        """Yield a scratch directory; on success it becomes entry ``key``.
+
+        An existing entry with the same key is kept unless ``replace`` is set.
+        """
+        model_root = self.root / name
+        model_root.mkdir(parents=True, exist_ok=True)
+        staging = model_root / f"{STAGING_PREFIX}{key}-{os.getpid()}"
+        if staging.exists():
+            shutil.rmtree(staging)
+        staging.mkdir()
+        try:
+            yield staging
+            manifest = {
+                "model": name,
+                "key": key,
+                "config": config,
+                "files": sorted(p.name for p in staging.iterdir()),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+            }
+            # The manifest is written last: its presence marks a complete entry.
+            (staging / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+            target = self.entry_dir(name, key)
+            if replace and target.exists():
+                retired = model_root / f"{STAGING_PREFIX}old-{key}-{os.getpid()}"
+                os.rename(target, retired)
+                shutil.rmtree(retired)
+            try:
+                os.rename(staging, target)
+            except OSError:
+                # Another export published the same key first; entries with
+                # the same key are interchangeable.
+                if self.lookup(name, key) is None:
+                    raise
+        finally:
+            if staging.exists():
+                shutil.rmtree(staging)
+
+    def current(self, name: str) -> str | None:
+        pointer = self.root / name / CURRENT_FILE
+        try:
+            key = pointer.read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return None
+        return key if self.lookup(name, key) is not None else None
+
+    def current_dir(self, name: str) -> Path | None:
+        key = self.current(name)
+        return None if key is None else self.entry_dir(name, key)
+
+    def set_current(self, name: str, key: str) -> None:
+        if self.lookup(name, key) is None:
+            raise ValueError(f"No complete registry entry {name}/{key}")
+        pointer = self.root / name / CURRENT_FILE
+        tmp = pointer.with_name(f"{CURRENT_FILE}.{os.getpid()}.tmp")
+        tmp.write_text(key + "\n", encoding="utf-8")
+        os.replace(tmp, pointer)
+
+    def names(self) -> list[str]:
+        if not self.root.exists():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir())
+
+    def entries(self, name: str) -> list[dict]:
+        """Complete entries of ``name``, newest first."""
+        model_root = self.root / name
+        if not model_root.exists():
+            return []
+        out = []
+        for path in model_root.iterdir():
+            if path.is_dir() and not path.name.startswith(STAGING_PREFIX) and (path / MANIFEST_FILE).exists():
+                stat = (path / MANIFEST_FILE).stat()
+                out.append(
+                    {
+                        "key": path.name,
+                        "path": path,
+                        "mtime": stat.st_mtime,
+                        "bytes": sum(f.stat().st_size for f in path.iterdir()),
+                    }
+                )
+        return sorted(out, key=lambda e: e["mtime"], reverse=True)
+
+    def gc(self, names=None, keep: int | None = None, max_age_days: float | None = None, dry_run: bool = False):
+        """Remove entries beyond the ``keep`` newest or older than ``max_age_days``.
+
+        The current entry of each model is never removed and counts towards
+        ``keep``. Returns the removed entry directories.
+        """
+        if keep is not None and keep < 1:
+            raise ValueError("keep must be at least 1")
+        now = time.time()
+        removed = []
+        for name in names or self.names():
+            current = self.current(name)
+            kept = 1 if current is not None else 0
+            for entry in self.entries(name):
+                if entry["key"] == current:
+                    continue
+                too_old = max_age_days is not None and now - entry["mtime"] > max_age_days * 86400
+                too_many = keep is not None and kept >= keep
+                if too_old or too_many:
+                    removed.append(entry["path"])
+                    if not dry_run:
+                        shutil.rmtree(entry["path"])
+                else:
+                    kept += 1
+            model_root = self.root / name
+            for staging in model_root.glob(f"{STAGING_PREFIX}*"):
+                if now - staging.stat().st_mtime > STALE_STAGING_SECONDS:
+                    removed.append(staging)
+                    if not dry_run:
+                        shutil.rmtree(staging)
+        return removed
+
+
+def resolve_dir(models_dir: Path | str, name: str) -> Path:
+    """Directory holding ``name``'s artifacts: the current registry entry, else ``models_dir``."""
+    current = ModelRegistry.for_models_dir(models_dir).current_dir(name)
+    return current if current is not None else Path(models_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and clean the model registry.")
+    parser.add_argument("--models-dir", default=str(MODELS_DIR))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="show entries per model")
+    gc_parser = sub.add_parser("gc", help="remove old entries")
+    gc_parser.add_argument("--models", nargs="+", default=None)
+    gc_parser.add_argument("--keep", type=int, default=None, help="entries to keep per model, current included")
+    gc_parser.add_argument("--max-age-days", type=float, default=None)
+    gc_parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry.for_models_dir(args.models_dir)
+    if args.command == "list":
+        for name in registry.names():
+            current = registry.current(name)
+            for entry in registry.entries(name):
+                marker = "*" if entry["key"] == current else " "
+                created = datetime.fromtimestamp(entry["mtime"], timezone.utc).strftime("%Y-%m-%d %H:%M")
+                print(f"{marker} {name:<14} {entry['key']}  {created}  {entry['bytes'] / 1e6:8.2f} MB")
+        return
+
+    if args.keep is None and args.max_age_days is None:
+        parser.error("gc needs --keep and/or --max-age-days")
+    removed = registry.gc(args.models, args.keep, args.max_age_days, args.dry_run)
+    verb = "Would remove" if args.dry_run else "Removed"
+    for path in removed:
+        print(f"{verb}: {path}")
+    print(f"{verb} {len(removed)} entries")
+
+
+if __name__ == "__main__":
+    main()
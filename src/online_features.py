@@ -0,0 +1,271 @@
+"""Online (one bar at a time) version of the feature builders in src.features.
+
+The engine keeps only the last few closes/volumes and the running sums needed
+for the moving averages, so appending a trading day costs the same whatever the
+length of the history. The running means replay the compensated add/remove
+updates used by ``pandas.Series.rolling(...).mean()``, so values are identical
+to the batch builders when the engine is fed the same history.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Mapping
+
+import numpy as np
+import pandas as pd
+
+from src.feature_spec import MODEL_SPECS, Column, Difference, Lag, RollingMean
+
+
+MODEL_FEATURE_COLS = {name: spec.feature_cols for name, spec in MODEL_SPECS.items()}
+
+BAR_COLUMNS = [
+    "open_x",
+    "high_x",
+    "low_x",
+    "close_x",
+    "volume_x",
+    "average_x",
+    "open_y",
+    "high_y",
+    "low_y",
+    "close_y",
+    "volume_y",
+    "average_y",
+]
+
+
+class _RingBuffer:
+    __slots__ = ("size", "values", "pos", "count")
+
+    def __init__(self, size: int):
+        self.size = size
+        self.values = [math.nan] * size
+        self.pos = -1
+        self.count = 0
+
+    def push(self, value: float) -> float:
+        # Returns the value that falls out of the buffer (NaN while filling).
+        self.pos = (self.pos + 1) % self.size
+        dropped = self.values[self.pos] if self.count == self.size else math.nan
+        self.values[self.pos] = value
+        self.count = min(self.count + 1, self.size)
+        return dropped
+
+    def get(self, lag: int) -> float:
+        if lag >= self.count:
+            return math.nan
+        return self.values[(self.pos - lag) % self.size]
+
+    def snapshot(self):
+        return (list(self.values), self.pos, self.count)
+
+    def restore(self, state) -> None:
+        values, self.pos, self.count = state
+        self.values = list(values)
+
+
+class _RunningMean:
+    # Mirrors pandas' fixed-window roll_mean: Kahan-compensated running sum with
+    # separate compensation terms for additions and removals.
+    __slots__ = (
+        "window",
+        "buffer",
+        "sum_x",
+        "comp_add",
+        "comp_remove",
+        "nobs",
+        "neg_ct",
+        "prev_value",
+        "same_ct",
+    )
+
+    def __init__(self, window: int):
+        self.window = window
+        self.buffer = _RingBuffer(window)
+        self.sum_x = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.nobs = 0
+        self.neg_ct = 0
+        self.prev_value = math.nan
+        self.same_ct = 0
+
+    def push(self, value: float) -> None:
+        if self.buffer.count == 0:
+            self.prev_value = value
+        dropped = self.buffer.push(value)
+
+        if dropped == dropped:
+            self.nobs -= 1
+            y = -dropped - self.comp_remove
+            t = self.sum_x + y
+            self.comp_remove = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, dropped) < 0:
+                self.neg_ct -= 1
+
+        if value == value:
+            self.nobs += 1
+            y = value - self.comp_add
+            t = self.sum_x + y
+            self.comp_add = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, value) < 0:
+                self.neg_ct += 1
+            if value == self.prev_value:
+                self.same_ct += 1
+            else:
+                self.same_ct = 1
+            self.prev_value = value
+
+    def mean(self) -> float:
+        if self.nobs < self.window or self.nobs == 0:
+            return math.nan
+        result = self.sum_x / self.nobs
+        if self.same_ct >= self.nobs:
+            return self.prev_value
+        if self.neg_ct == 0 and result < 0:
+            return 0.0
+        if self.neg_ct == self.nobs and result > 0:
+            return 0.0
+        return result
+
+    def snapshot(self):
+        return (
+            self.buffer.snapshot(),
+            self.sum_x,
+            self.comp_add,
+            self.comp_remove,
+            self.nobs,
+            self.neg_ct,
+            self.prev_value,
+            self.same_ct,
+        )
+
+    def restore(self, state) -> None:
+        (
+            buffer_state,
+            self.sum_x,
+            self.comp_add,
+            self.comp_remove,
+            self.nobs,
+            self.neg_ct,
+            self.prev_value,
+            self.same_ct,
+        ) = state
+        self.buffer.restore(buffer_state)
+
+
+class OnlineFeatureEngine:
+    """Stateful feature builder for the MLR (JustBrent), NN and RF models.
+
+    ``push`` appends a new daily bar, ``revise`` replaces the latest bar (for
+    intraday refreshes of the current day) and ``features`` returns the
+    feature vector of the latest bar in the column order of the batch builder.
+    """
+
+    def __init__(self):
+        self._bar = {col: math.nan for col in BAR_COLUMNS}
+        self._date = None
+        self._lags = {}
+        self._means = {}
+        self._previous = None
+        self.n_bars = 0
+        self._getters = {
+            name: [self._getter(node) for _, node in spec.features]
+            for name, spec in MODEL_SPECS.items()
+        }
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "OnlineFeatureEngine":
+        engine = cls()
+        columns = [c for c in BAR_COLUMNS if c in df.columns]
+        values = df[columns].to_numpy(dtype=float)
+        dates = df["date"].tolist() if "date" in df.columns else [None] * len(df)
+        for date, row in zip(dates, values):
+            engine.push(dict(zip(columns, row)), date=date)
+        return engine
+
+    @property
+    def date(self):
+        return self._date
+
+    def push(self, bar: Mapping[str, float], date=None) -> "OnlineFeatureEngine":
+        self._previous = self._snapshot()
+        self._append(bar, date)
+        return self
+
+    def revise(self, bar: Mapping[str, float], date=None) -> "OnlineFeatureEngine":
+        if self._previous is None:
+            raise ValueError("No bar to revise; call push() first.")
+        self._restore(self._previous)
+        self._append(bar, date)
+        return self
+
+    def features(self, model: str) -> np.ndarray:
+        if model not in self._getters:
+            raise ValueError(f"Unknown model: {model}")
+        return np.array([get() for get in self._getters[model]], dtype=float)
+
+    def features_frame(self, model: str) -> pd.DataFrame:
+        return pd.DataFrame(
+            [self.features(model)],
+            columns=MODEL_FEATURE_COLS[model],
+            index=[self.n_bars - 1],
+        )
+
+    def is_ready(self, model: str) -> bool:
+        return not np.isnan(self.features(model)).any()
+
+    def _append(self, bar: Mapping[str, float], date) -> None:
+        for col in BAR_COLUMNS:
+            self._bar[col] = float(bar[col]) if col in bar else math.nan
+        for col, buffer in self._lags.items():
+            buffer.push(self._bar[col])
+        for (col, _), running in self._means.items():
+            running.push(self._bar[col])
+        self._date = date
+        self.n_bars += 1
+
+    def _snapshot(self):
+        return (
+            dict(self._bar),
+            self._date,
+            self.n_bars,
+            {col: buffer.snapshot() for col, buffer in self._lags.items()},
+            {key: running.snapshot() for key, running in self._means.items()},
+        )
+
+    def _restore(self, state) -> None:
+        bar, self._date, self.n_bars, lags, means = state
+        self._bar.update(bar)
+        for col, buffer_state in lags.items():
+            self._lags[col].restore(buffer_state)
+        for key, running_state in means.items():
+            self._means[key].restore(running_state)
+
+    def _getter(self, node):
+        bar = self._bar
+        if isinstance(node, Column):
+            return lambda: bar[node.name]
+
+        if isinstance(node, Lag):
+            if node.periods < 0:
+                raise ValueError(f"Lead features are not available online: {node.key}")
+            col, lag = node.source.name, node.periods
+            if col not in self._lags or self._lags[col].size <= lag:
+                self._lags[col] = _RingBuffer(lag + 1)
+            return lambda: self._lags[col].get(lag)
+
+        if isinstance(node, RollingMean):
+            key = (node.source.name, node.window)
+            running = self._means.setdefault(key, _RunningMean(node.window))
+            return running.mean
+
+        if isinstance(node, Difference):
+            left, right = self._getter(node.left), self._getter(node.right)
+            return lambda: left() - right()
+
+        raise ValueError(f"Unsupported feature node: {node!r}")
@@ -0,0 +1,264 @@
+"""Array-backed Random Forest inference without sklearn tree objects.
+
+``CompactForest.from_sklearn`` flattens every tree of a fitted
+``RandomForestRegressor`` into shared node arrays (int16 feature index,
+float32 threshold, int32 children, float32 leaf value). ``predict`` walks all
+trees level by level for the whole input matrix at once, so the cost is a few
+NumPy gathers per tree depth instead of per-tree Python dispatch. That wins
+for the daily signal and small batches, but from a few hundred rows on the
+gathers lose to sklearn's compiled traversal. When the source estimator is
+known (``from_sklearn``, or ``load(..., estimator_path=...)``, which loads the
+pickle on first use), batches of ``COMPILED_MIN_ROWS`` or more rows go through
+each tree's compiled ``tree_.predict`` instead; those predictions are exactly
+``model.predict``'s.
+
+sklearn compares ``float32(x) <= float64(threshold)``; thresholds are rounded
+*down* to float32 so that the comparison picks the same branch for every
+float32 input. Leaf values in float32 keep predictions within ~1e-5 relative
+of ``model.predict``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import threading
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+
+FORMAT_VERSION = 1
+ROW_CHUNK = 2048
+# From this many rows on, sklearn's compiled trees beat the NumPy walk.
+COMPILED_MIN_ROWS = 256
+
+
+class CompactForest:
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        n_features: int,
+        feature_names=None,
+        estimator_loader=None,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.feature_names = None if feature_names is None else [str(c) for c in feature_names]
+        # Interleaved (left, right) pairs so one gather picks the next node.
+        self._children = np.stack([left, right], axis=1).ravel()
+        self._is_leaf = left == np.arange(len(left), dtype=left.dtype)
+        # Zero-argument callable returning the fitted sklearn forest, if known.
+        self._estimator_loader = estimator_loader
+        self._estimator = None
+        self._estimator_lock = threading.Lock()
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            a.nbytes
+            for a in (self.feature, self.threshold, self.left, self.right, self.value, self.roots)
+        )
+
+    @classmethod
+    def from_sklearn(cls, model, value_dtype=np.float32) -> "CompactForest":
+        trees = [est.tree_ for est in model.estimators_]
+        if any(tree.n_outputs != 1 for tree in trees):
+            raise ValueError("Only single-output regressors are supported")
+
+        sizes = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        n_nodes = int(sizes.sum())
+
+        feature = np.zeros(n_nodes, dtype=np.int16)
+        threshold = np.full(n_nodes, np.inf, dtype=np.float32)
+        left = np.empty(n_nodes, dtype=np.int32)
+        right = np.empty(n_nodes, dtype=np.int32)
+        value = np.empty(n_nodes, dtype=value_dtype)
+
+        if model.n_features_in_ > np.iinfo(np.int16).max:
+            raise ValueError("Too many features for int16 feature indices")
+
+        for tree, offset, size in zip(trees, offsets, sizes):
+            nodes = slice(offset, offset + size)
+            own = np.arange(offset, offset + size, dtype=np.int32)
+            is_leaf = tree.children_left == -1
+
+            # Leaves point at themselves and always take the left branch, so
+            # rows that reach a leaf early stay there while deeper rows move on.
+            left[nodes] = np.where(is_leaf, own, tree.children_left + offset)
+            right[nodes] = np.where(is_leaf, own, tree.children_right + offset)
+            feature[nodes] = np.where(is_leaf, 0, tree.feature)
+            threshold[nodes] = np.where(is_leaf, np.inf, _round_down_float32(tree.threshold))
+            value[nodes] = tree.value[:, 0, 0]
+
+        return cls(
+            feature=feature,
+            threshold=threshold,
+            left=left,
+            right=right,
+            value=value,
+            roots=offsets.astype(np.int32),
+            max_depth=max(tree.max_depth for tree in trees),
+            n_features=model.n_features_in_,
+            feature_names=getattr(model, "feature_names_in_", None),
+            estimator_loader=lambda: model,
+        )
+
+    def save(self, path: Path | str) -> Path:
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as fh:
+            np.savez(
+                fh,
+                version=np.array(FORMAT_VERSION),
+                feature=self.feature,
+                threshold=self.threshold,
+                left=self.left,
+                right=self.right,
+                value=self.value,
+                roots=self.roots,
+                max_depth=np.array(self.max_depth),
+                n_features=np.array(self.n_features),
+                feature_names=np.array(self.feature_names or [], dtype=str),
+            )
+        tmp.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, path: Path | str, estimator_path: Path | str | None = None) -> "CompactForest":
+        """Load a saved forest; ``estimator_path`` names the pickled source model for large batches."""
+        loader = None
+        if estimator_path is not None and Path(estimator_path).exists():
+            loader = partial(_load_estimator, estimator_path)
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"]) != FORMAT_VERSION:
+                raise ValueError(f"Unsupported compact forest version in {path}")
+            names = [str(c) for c in data["feature_names"]]
+            return cls(
+                feature=data["feature"],
+                threshold=data["threshold"],
+                left=data["left"],
+                right=data["right"],
+                value=data["value"],
+                roots=data["roots"],
+                max_depth=int(data["max_depth"]),
+                n_features=int(data["n_features"]),
+                feature_names=names or None,
+                estimator_loader=loader,
+            )
+
+    def _as_matrix(self, X) -> np.ndarray:
+        if hasattr(X, "columns"):
+            if self.feature_names is not None and list(X.columns) != self.feature_names:
+                X = X[self.feature_names]
+            X = X.to_numpy(dtype=np.float32)
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(
+                f"Expected a 2D array with {self.n_features} features, got shape {X.shape}"
+            )
+        return X
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf index reached in every tree, shape (n_trees, n_rows)."""
+        X = self._as_matrix(X)
+        out = np.empty((self.n_trees, len(X)), dtype=np.int32)
+        for start in range(0, len(X), ROW_CHUNK):
+            chunk = X[start : start + ROW_CHUNK]
+            out[:, start : start + len(chunk)] = self._walk(chunk)
+        return out
+
+    def _walk(self, X: np.ndarray) -> np.ndarray:
+        n_rows = len(X)
+        flat = X.ravel()
+        leaves = np.repeat(self.roots, n_rows)
+        # (tree, row) pairs still descending, their current node and row offset.
+        pending = np.arange(leaves.size, dtype=np.int32)
+        nodes = leaves.copy()
+        row_offset = np.tile(np.arange(n_rows, dtype=np.int32) * self.n_features, self.n_trees)
+        depth = 0
+        while nodes.size:
+            go_right = flat[row_offset + self.feature[nodes]] > self.threshold[nodes]
+            nodes = self._children[2 * nodes + go_right.view(np.int8)]
+            depth += 1
+            # Dropping finished pairs costs a few copies; doing it every few
+            # levels keeps the arrays short without paying that every step.
+            if depth % 4 == 0 or depth >= self.max_depth:
+                done = self._is_leaf[nodes]
+                leaves[pending[done]] = nodes[done]
+                keep = ~done
+                pending, nodes, row_offset = pending[keep], nodes[keep], row_offset[keep]
+        return leaves.reshape(self.n_trees, n_rows)
+
+    def estimator(self):
+        """The source sklearn forest, loaded on first use; ``None`` if unknown."""
+        if self._estimator is None and self._estimator_loader is not None:
+            with self._estimator_lock:
+                if self._estimator is None:
+                    self._estimator = self._estimator_loader()
+        return self._estimator
+
+    def predict_trees(self, X) -> np.ndarray:
+        """Every tree's prediction, shape (n_trees, n_rows)."""
+        X = self._as_matrix(X)
+        if len(X) >= COMPILED_MIN_ROWS:
+            model = self.estimator()
+            if model is not None:
+                return np.stack([est.tree_.predict(X)[:, 0] for est in model.estimators_])
+        return self.value[self.apply(X)]
+
+    def predict(self, X) -> np.ndarray:
+        return self.predict_trees(X).mean(axis=0, dtype=np.float64)
+
+
+def _round_down_float32(values: np.ndarray) -> np.ndarray:
+    out = values.astype(np.float32)
+    above = out.astype(np.float64) > values
+    out[above] = np.nextafter(out[above], np.float32(-np.inf))
+    return out
+
+
+def _load_estimator(path):
+    import joblib
+
+    return joblib.load(path, mmap_mode="r")
+
+
+def main():
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Convert a pickled RandomForestRegressor.")
+    parser.add_argument("model", help="path to rf_model.pkl")
+    parser.add_argument("output", nargs="?", help="defaults to rf_compact.npz next to the model")
+    args = parser.parse_args()
+
+    model_path = Path(args.model)
+    output = Path(args.output) if args.output else model_path.with_name("rf_compact.npz")
+    forest = CompactForest.from_sklearn(joblib.load(model_path))
+    forest.save(output)
+    print(f"Compact forest written to: {output} ({output.stat().st_size / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
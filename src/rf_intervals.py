@@ -0,0 +1,43 @@
+"""Prediction intervals for the Random Forest from its per-tree outputs.
+
+``tree_matrix`` gathers every tree's prediction for every row in one pass
+through ``CompactForest.predict_trees`` (a sklearn forest is flattened first),
+giving an ``(n_trees, n_rows)`` array whose column means are the usual RF
+prediction. Quantiles across the trees give intervals, and the share of trees
+above a price gives a confidence for the BUY/SELL signal. The spread reflects
+how much the bootstrapped trees disagree, not the full forecast error, so the
+bands are narrower than the model's realised RMSE.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+from src.rf_compact import CompactForest
+
+
+DEFAULT_LEVEL = 0.8
+
+
+def tree_matrix(model, X) -> np.ndarray:
+    forest = model if isinstance(model, CompactForest) else CompactForest.from_sklearn(model)
+    return forest.predict_trees(X)
+
+
+def quantiles(per_tree: np.ndarray, qs) -> np.ndarray:
+    """``(len(qs), n_rows)`` quantiles of the tree predictions."""
+    return np.quantile(per_tree, qs, axis=0)
+
+
+def interval(per_tree: np.ndarray, level: float = DEFAULT_LEVEL):
+    """Central ``level`` interval ``(low, high)`` for every row."""
+    if not 0 < level < 1:
+        raise ValueError("level must be between 0 and 1")
+    tail = (1 - level) / 2
+    low, high = quantiles(per_tree, [tail, 1 - tail])
+    return low, high
+
+
+def share_above(per_tree: np.ndarray, threshold) -> np.ndarray:
+    """Fraction of trees predicting above ``threshold`` (scalar or per row)."""
+    return (per_tree > np.asarray(threshold)).mean(axis=0)
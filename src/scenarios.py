@@ -0,0 +1,316 @@
+"""Monte Carlo price scenarios from the recursive forecasts.
+
+Each simulated path starts from the bars up to one date and is rolled forward
+by ``forecast.RecursiveForecaster``. At every step the model's prediction is
+multiplied by ``1 + e``, where ``e`` is drawn (with replacement) from the
+model's relative errors ``y / pred - 1`` on one of its data splits, by default
+the held-out split (validation for MLR/NN, test for RF). All paths of a model
+advance together, so a step is one batched ``predict`` over every path.
+Relative errors keep the noise proportional to the price level.
+
+The paths inherit the recursive forecast's drift, so a fan is only as good
+as the model's multi-step forecasts. ``horizon_skill`` scores those on the
+model's held-out start dates against the no-change baseline; the app shows it
+next to the fan and leaves models with negative skill out of the simulation.
+
+Several models can be mixed: paths are divided between them by weight (the
+ensemble's ``1 / MSE`` weights in the app). Paths are generated in fixed-size
+shards, each with its own child of ``np.random.SeedSequence(seed)``, so a given
+seed gives the same paths whether shards run in-process or in a process pool.
+
+    python -m src.scenarios --model rf --paths 10000 --steps 20 --seed 7
+    python -m src.scenarios --model mlr_justbrent rf nn --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.artifacts import MODELS_DIR, LazyArtifacts
+from src.feature_spec import MODEL_SPECS
+from src.feature_store import load_features
+from src.features import DEFAULT_DATA_PATH, load_processed_data, split_train_test, split_train_val_test
+from src.forecast import (
+    DEFAULT_MAX_STEP_CHANGE,
+    ExogenousPolicy,
+    RecursiveForecaster,
+    forecast_history,
+    initial_windows,
+    lookback,
+    predict_bundle,
+)
+from src.time_index import TimeIndex
+from src.tracing import traced
+
+
+DEFAULT_PATHS = 10_000
+DEFAULT_STEPS = 20
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+SHARD_PATHS = 2_500
+RESIDUAL_SPLITS = ("holdout", "train", "val", "test")
+
+
+def _splits(name: str, X, y) -> dict:
+    # Same chronological splits the exporter trained and scored with.
+    if name == "rf":
+        X_train, X_test, y_train, y_test = split_train_test(X, y)
+        return {"train": (X_train, y_train), "test": (X_test, y_test)}
+    X_train, X_val, X_test, y_train, y_val, y_test = split_train_val_test(X, y)
+    return {"train": (X_train, y_train), "val": (X_val, y_val), "test": (X_test, y_test)}
+
+
+def split_rows(name: str, features, split: str = "holdout") -> np.ndarray:
+    """Frame row numbers of one of ``name``'s training-time splits."""
+    if split not in RESIDUAL_SPLITS:
+        raise ValueError(f"Unknown residual split: {split}")
+    rows = np.flatnonzero(np.asarray(features.clean_mask(name)))
+    splits = _splits(name, rows, rows)
+    if split == "holdout":
+        split = "val" if "val" in splits else "test"
+    if split not in splits:
+        raise ValueError(f"{name} has no {split} split")
+    return splits[split][0]
+
+
+@traced()
+def horizon_skill(
+    df: pd.DataFrame, name: str, bundle: dict, features, horizons=(5, 10, 20), split: str = "holdout"
+) -> pd.DataFrame:
+    """``Forecast.evaluate`` of ``name``'s recursive forecasts started on one split's dates.
+
+    ``skill`` below zero means the model's h-day forecast is worse than
+    predicting no change, and so is the drift its scenarios follow.
+    """
+    rows = split_rows(name, features, split)
+    forecast = forecast_history(df, name, bundle, features, steps=max(horizons), start_rows=rows)
+    return forecast.evaluate(df, horizons)
+
+
+def relative_residuals(name: str, bundle: dict, features, split: str = "holdout") -> np.ndarray:
+    """``y / pred - 1`` of ``name`` on one of its training-time splits."""
+    if split not in RESIDUAL_SPLITS:
+        raise ValueError(f"Unknown residual split: {split}")
+    X_all, y_all = (np.asarray(a) for a in features.view(name))
+    mask = np.asarray(features.clean_mask(name))
+    splits = _splits(name, X_all[mask], y_all[mask])
+    if split == "holdout":
+        split = "val" if "val" in splits else "test"
+    if split not in splits:
+        raise ValueError(f"{name} has no {split} split")
+    X, y = splits[split]
+    pred = predict_bundle(bundle, X, MODEL_SPECS[name].feature_cols)
+    return y / pred - 1.0
+
+
+def _allocate(n_paths: int, weights: dict[str, float]) -> dict[str, int]:
+    # Largest-remainder rounding so the counts add up to n_paths exactly.
+    names = list(weights)
+    w = np.array([weights[n] for n in names], dtype=np.float64)
+    if (w < 0).any() or w.sum() <= 0:
+        raise ValueError("Model weights must be non-negative and not all zero")
+    raw = n_paths * w / w.sum()
+    counts = np.floor(raw).astype(int)
+    for i in np.argsort(raw - counts)[::-1][: n_paths - counts.sum()]:
+        counts[i] += 1
+    return {name: int(c) for name, c in zip(names, counts) if c > 0}
+
+
+_WORKER_ARTIFACTS = {}
+
+
+def _shard_bundle(models_dir: str, name: str) -> dict:
+    artifacts = _WORKER_ARTIFACTS.get(models_dir)
+    if artifacts is None:
+        artifacts = _WORKER_ARTIFACTS[models_dir] = LazyArtifacts(models_dir)
+    return artifacts.get(name)
+
+
+def _run_shard(task) -> np.ndarray:
+    name, bundle, models_dir, window, x0, residuals, n, seed_seq, steps, policy, max_step_change = task
+    if bundle is None:
+        bundle = _shard_bundle(models_dir, name)
+    rng = np.random.default_rng(seed_seq)
+    shocks = residuals[rng.integers(0, len(residuals), size=(n, steps))]
+    forecaster = RecursiveForecaster(name, bundle, policy, max_step_change)
+    return forecaster.run(
+        np.broadcast_to(window, (n,) + window.shape),
+        steps,
+        first_features=np.broadcast_to(x0, (n, len(x0))),
+        residuals=shocks,
+        relative=True,
+    )
+
+
+@dataclass
+class ScenarioResult:
+    date: pd.Timestamp
+    start_close: float
+    paths: np.ndarray  # (n_paths, steps) simulated closes
+    counts: dict[str, int]
+    seconds: float
+
+    @property
+    def steps(self) -> int:
+        return self.paths.shape[1]
+
+    def fan(self, percentiles=DEFAULT_PERCENTILES) -> pd.DataFrame:
+        """Percentile bands per step, index 1..steps."""
+        bands = np.percentile(self.paths, percentiles, axis=0)
+        return pd.DataFrame(
+            bands.T, index=pd.RangeIndex(1, self.steps + 1, name="step"), columns=[f"p{p}" for p in percentiles]
+        )
+
+    def prob_up(self) -> np.ndarray:
+        """Share of paths above the starting close at each step."""
+        return (self.paths > self.start_close).mean(axis=0)
+
+    def summary(self, horizons=(5, 10, 20)) -> pd.DataFrame:
+        fan = self.fan()
+        up = self.prob_up()
+        rows = []
+        for h in horizons:
+            if h > self.steps:
+                continue
+            rows.append(
+                {
+                    "horizon": h,
+                    "mean": float(self.paths[:, h - 1].mean()),
+                    **{col: float(fan.at[h, col]) for col in fan.columns},
+                    "prob_up": float(up[h - 1]),
+                }
+            )
+        return pd.DataFrame(rows)
+
+
+@traced()
+def simulate(
+    df: pd.DataFrame,
+    models,
+    features=None,
+    artifacts: LazyArtifacts | None = None,
+    as_of=None,
+    n_paths: int = DEFAULT_PATHS,
+    steps: int = DEFAULT_STEPS,
+    seed: int = 0,
+    split: str = "holdout",
+    policy: ExogenousPolicy | None = None,
+    workers: int = 1,
+    max_step_change: float | None = DEFAULT_MAX_STEP_CHANGE,
+) -> ScenarioResult:
+    """Simulate ``n_paths`` closes ``steps`` days ahead of the last usable row on/before ``as_of``.
+
+    ``models`` is a model name, a list of names (equal weights) or a
+    ``{name: weight}`` mapping.
+    """
+    if n_paths < 1 or steps < 1:
+        raise ValueError("n_paths and steps must be at least 1")
+    if isinstance(models, str):
+        models = {models: 1.0}
+    elif not isinstance(models, dict):
+        models = {name: 1.0 for name in models}
+    unknown = [m for m in models if m not in MODEL_SPECS]
+    if unknown:
+        raise ValueError(f"Unknown models: {unknown}")
+    artifacts = artifacts or LazyArtifacts()
+    features = load_features(df) if features is None else features
+    started = time.perf_counter()
+
+    # Start from the last row where every model has a complete feature vector.
+    X_by_model = {name: np.asarray(features.view(name)[0]) for name in models}
+    usable = np.ones(len(df), dtype=bool)
+    for X in X_by_model.values():
+        usable &= ~np.isnan(X).any(axis=1)
+    usable_rows = np.flatnonzero(usable)
+    index = TimeIndex(df["date"].to_numpy()[usable_rows])
+    pos = len(index) - 1 if as_of is None else index.asof(as_of)
+    if pos is None or not len(usable_rows):
+        raise ValueError(f"No complete feature row on or before {as_of}")
+    row = int(usable_rows[pos])
+
+    counts = _allocate(n_paths, models)
+    tasks = []
+    n_shards = sum(-(-count // SHARD_PATHS) for count in counts.values())
+    seeds = iter(np.random.SeedSequence(seed).spawn(n_shards))
+    models_dir = str(artifacts.models_dir)
+    for name, count in counts.items():
+        bundle = artifacts.get(name) if workers == 1 else None
+        residuals = relative_residuals(name, artifacts.get(name), features, split)
+        window = initial_windows(df, [row], lookback(name))[0]
+        x0 = X_by_model[name][row]
+        for start in range(0, count, SHARD_PATHS):
+            n = min(SHARD_PATHS, count - start)
+            tasks.append(
+                (name, bundle, models_dir, window, x0, residuals, n, next(seeds), steps, policy, max_step_change)
+            )
+
+    if workers == 1:
+        shards = [_run_shard(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shards = list(pool.map(_run_shard, tasks))
+
+    return ScenarioResult(
+        date=pd.Timestamp(df["date"].iat[row]),
+        start_close=float(df["close_x"].iat[row]),
+        paths=np.vstack(shards),
+        counts=counts,
+        seconds=time.perf_counter() - started,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo Brent price scenarios.")
+    parser.add_argument("--model", nargs="+", choices=list(MODEL_SPECS), default=["rf"])
+    parser.add_argument("--paths", type=int, default=DEFAULT_PATHS)
+    parser.add_argument("--steps", type=int, default=DEFAULT_STEPS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--date", default=None, help="start from the last row on or before this date")
+    parser.add_argument("--split", choices=RESIDUAL_SPLITS, default="holdout", help="residuals to bootstrap")
+    parser.add_argument("--wti", choices=["persist", "spread"], default="persist")
+    parser.add_argument("--volume", choices=["persist", "mean"], default="persist")
+    parser.add_argument(
+        "--max-step-change",
+        type=float,
+        default=DEFAULT_MAX_STEP_CHANGE,
+        help="opt-in cap on each step's relative move; 0 disables it",
+    )
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--models-dir", default=str(MODELS_DIR))
+    parser.add_argument("--data", default=str(DEFAULT_DATA_PATH))
+    parser.add_argument("--output", default=None, help="CSV path for the percentile fan")
+    args = parser.parse_args(argv)
+
+    df = load_processed_data(args.data)
+    result = simulate(
+        df,
+        args.model,
+        load_features(df),
+        LazyArtifacts(Path(args.models_dir)),
+        as_of=args.date,
+        n_paths=args.paths,
+        steps=args.steps,
+        seed=args.seed,
+        split=args.split,
+        policy=ExogenousPolicy(args.wti, args.volume),
+        workers=args.workers,
+        max_step_change=args.max_step_change or None,
+    )
+    print(
+        f"{len(result.paths):,} paths x {result.steps} days from {result.date.date()} "
+        f"(close {result.start_close:,.2f}) in {result.seconds:.2f}s"
+    )
+    print(result.summary().to_string(index=False, float_format=lambda v: f"{v:,.3f}"))
+    if args.output:
+        result.fan().assign(prob_up=result.prob_up()).to_csv(args.output)
+        print("Fan written to:", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+"""Local HTTP prediction service with per-model micro-batching.
+
+Models are loaded once through ``LazyArtifacts`` and features for the stored
+history come from one ``build_features_*_full`` pass. Each model has a
+``MicroBatcher`` thread: concurrent requests are queued, and up to
+``max_batch`` rows that arrive within ``max_wait_ms`` of the first are
+stacked into one ``predict`` call, so throughput scales with load while the
+added latency stays bounded by the wait budget.
+
+Endpoints (JSON unless noted)::
+
+    POST /predict/<model>   {"rows": [{feature: value, ...}, ...]} or {"features": {...}}
+    GET  /signal/<model>    ?date=YYYY-MM-DD (latest by default): prediction vs close
+    GET  /metrics           throughput, batch sizes, p50/p95/p99 latency
+    GET  /metrics?format=prometheus   the same as Prometheus text
+    GET  /health
+
+``<model>`` is ``mlr_justbrent``, ``rf`` or ``nn``. Run with::
+
+    python -m src.serve --port 8000 --max-batch 256 --max-wait-ms 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from src.artifacts import ARTIFACT_FILES, LazyArtifacts
+from src.export_models import predict_fitted
+from src.feature_store import load_features
+from src.time_index import TimeIndex
+from src.features import (
+    DEFAULT_DATA_PATH,
+    build_features_mlr_justbrent_full,
+    build_features_nn_full,
+    build_features_rf_full,
+    load_processed_data,
+)
+
+
+FULL_BUILDERS = {
+    "mlr_justbrent": build_features_mlr_justbrent_full,
+    "rf": build_features_rf_full,
+    "nn": build_features_nn_full,
+}
+
+DEFAULT_MAX_BATCH = 256
+DEFAULT_MAX_WAIT_MS = 5.0
+# Pending connections the listening socket holds; the socketserver default of
+# 5 resets clients under the concurrent load the batcher is meant to absorb.
+DEFAULT_BACKLOG = 256
+LATENCY_WINDOW = 10_000
+THROUGHPUT_WINDOW_S = 60.0
+
+
+class UnknownModelError(KeyError):
+    """Raised for model names the service does not serve (HTTP 404)."""
+
+
+class ModelStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.batch_sizes = deque(maxlen=LATENCY_WINDOW)
+        self.done_at = deque()
+
+    def record_batch(self, n_rows: int) -> None:
+        with self._lock:
+            self.batches += 1
+            self.batch_sizes.append(n_rows)
+
+    def record_request(self, n_rows: int, seconds: float, ok: bool = True) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            self.rows += n_rows
+            self.errors += 0 if ok else 1
+            self.latencies.append(seconds)
+            self.done_at.append(now)
+            while self.done_at and now - self.done_at[0] > THROUGHPUT_WINDOW_S:
+                self.done_at.popleft()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lat = np.array(self.latencies) * 1e3
+            sizes = np.array(self.batch_sizes)
+            now = time.monotonic()
+            recent = [t for t in self.done_at if now - t <= THROUGHPUT_WINDOW_S]
+            span = (now - recent[0]) if len(recent) > 1 else 0.0
+            p50, p95, p99 = np.percentile(lat, [50, 95, 99]) if lat.size else (0.0, 0.0, 0.0)
+            return {
+                "requests": self.requests,
+                "rows": self.rows,
+                "batches": self.batches,
+                "errors": self.errors,
+                "mean_batch_rows": float(sizes.mean()) if sizes.size else 0.0,
+                "throughput_rps": len(recent) / span if span > 0 else 0.0,
+                "latency_ms": {"p50": float(p50), "p95": float(p95), "p99": float(p99)},
+            }
+
+
+class MicroBatcher:
+    """Coalesces queued requests for one model into vectorised predict calls."""
+
+    def __init__(self, name: str, bundle: dict, feature_cols, max_batch: int, max_wait_ms: float):
+        self.name = name
+        self.bundle = bundle
+        self.feature_cols = list(feature_cols)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1e3
+        self.stats = ModelStats()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name=f"batcher-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, X: np.ndarray) -> Future:
+        future = Future()
+        self._queue.put((X, future))
+        return future
+
+    def predict(self, X: np.ndarray, timeout: float | None = 30.0) -> np.ndarray:
+        start = time.perf_counter()
+        try:
+            preds = self.submit(X).result(timeout)
+        except Exception:
+            self.stats.record_request(len(X), time.perf_counter() - start, ok=False)
+            raise
+        self.stats.record_request(len(X), time.perf_counter() - start)
+        return preds
+
+    def _collect(self):
+        items = [self._queue.get()]
+        rows = len(items[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            items.append(item)
+            rows += len(item[0])
+        return items
+
+    def _loop(self):
+        while True:
+            items = self._collect()
+            try:
+                X = items[0][0] if len(items) == 1 else np.concatenate([x for x, _ in items])
+                frame = pd.DataFrame(X, columns=self.feature_cols, copy=False)
+                preds = np.asarray(
+                    predict_fitted(self.bundle["model"], self.bundle["scaler"], frame),
+                    dtype=np.float64,
+                )
+                self.stats.record_batch(len(X))
+            except Exception as exc:  # hand the error to every waiting request
+                for _, future in items:
+                    future.set_exception(exc)
+                continue
+            offset = 0
+            for x, future in items:
+                future.set_result(preds[offset : offset + len(x)])
+                offset += len(x)
+
+
+class PredictionService:
+    def __init__(
+        self,
+        models=None,
+        data_path=DEFAULT_DATA_PATH,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        artifacts: LazyArtifacts | None = None,
+    ):
+        artifacts = artifacts or LazyArtifacts()
+        models = [m for m in (models or ARTIFACT_FILES) if artifacts.exists(m)]
+        if not models:
+            raise ValueError("No exported models found; run `python -m src.export_models` first")
+
+        df = load_processed_data(data_path)
+        features = load_features(df)
+        self.started = time.time()
+        self.batchers = {}
+        self.history = {}
+        for name in models:
+            data_full, X_full, feature_cols = FULL_BUILDERS[name](df, features)
+            valid = ~X_full.isna().any(axis=1).to_numpy()
+            self.history[name] = (
+                TimeIndex(data_full["date"].to_numpy()[valid]),
+                data_full["close_x"].to_numpy()[valid],
+                X_full.to_numpy(dtype=np.float64)[valid],
+            )
+            self.batchers[name] = MicroBatcher(
+                name, artifacts.get(name), feature_cols, max_batch, max_wait_ms
+            )
+
+    def _batcher(self, name: str) -> MicroBatcher:
+        if name not in self.batchers:
+            raise UnknownModelError(f"Unknown or unavailable model: {name}")
+        return self.batchers[name]
+
+    def predict_rows(self, name: str, payload: dict) -> dict:
+        batcher = self._batcher(name)
+        if "rows" in payload:
+            rows = payload["rows"]
+        elif "features" in payload:
+            rows = [payload["features"]]
+        else:
+            raise ValueError('Expected "rows" or "features" in the request body')
+        if not rows:
+            return {"model": name, "predictions": []}
+        cols = batcher.feature_cols
+        if isinstance(rows[0], dict):
+            for i, row in enumerate(rows):
+                if not isinstance(row, dict):
+                    raise ValueError(f"Row {i}: expected an object of features")
+                missing = [c for c in cols if c not in row]
+                if missing:
+                    raise ValueError(f"Row {i} is missing features: {missing}")
+            X = np.array([[row[c] for c in cols] for row in rows], dtype=np.float64)
+        else:
+            X = np.asarray(rows, dtype=np.float64)
+            if X.ndim != 2 or X.shape[1] != len(cols):
+                raise ValueError(f"Expected rows of {len(cols)} values in order {cols}")
+        return {"model": name, "predictions": batcher.predict(X).tolist()}
+
+    def signal(self, name: str, as_of: str | None = None) -> dict:
+        batcher = self._batcher(name)
+        dates, closes, X = self.history[name]
+        i = len(dates) - 1
+        if as_of is not None:
+            i = dates.asof(as_of)
+            if i is None:
+                raise ValueError(f"No feature row on or before {as_of}")
+        pred = float(batcher.predict(X[i : i + 1])[0])
+        close = float(closes[i])
+        return {
+            "model": name,
+            "date": str(dates[i].date()),
+            "close": close,
+            "prediction": pred,
+            "delta": pred - close,
+            "signal": "BUY" if pred > close else "SELL",
+        }
+
+    def metrics(self) -> dict:
+        return {
+            "uptime_s": time.time() - self.started,
+            "models": {name: b.stats.snapshot() for name, b in self.batchers.items()},
+        }
+
+    def prometheus_text(self) -> str:
+        lines = []
+        snapshot = self.metrics()["models"]
+        gauges = (
+            ("brent_serve_requests_total", lambda s: s["requests"]),
+            ("brent_serve_rows_total", lambda s: s["rows"]),
+            ("brent_serve_batches_total", lambda s: s["batches"]),
+            ("brent_serve_errors_total", lambda s: s["errors"]),
+            ("brent_serve_throughput_rps", lambda s: s["throughput_rps"]),
+            ("brent_serve_mean_batch_rows", lambda s: s["mean_batch_rows"]),
+        )
+        for metric, get in gauges:
+            for name, stats in snapshot.items():
+                lines.append(f'{metric}{{model="{name}"}} {get(stats)}')
+        for name, stats in snapshot.items():
+            for q, value in stats["latency_ms"].items():
+                quantile = {"p50": "0.5", "p95": "0.95", "p99": "0.99"}[q]
+                lines.append(
+                    f'brent_serve_latency_seconds{{model="{name}",quantile="{quantile}"}} {value / 1e3}'
+                )
+        return "\n".join(lines) + "\n"
+
+
+class PredictionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, handler, backlog: int = DEFAULT_BACKLOG):
+        if backlog < 1:
+            raise ValueError("backlog must be at least 1")
+        self.request_queue_size = backlog
+        super().__init__(address, handler)
+
+
+def make_handler(service: PredictionService):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):  # keep the console quiet under load
+            pass
+
+        def _send(self, status: int, body, content_type: str = "application/json"):
+            data = body.encode("utf-8") if isinstance(body, str) else json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _route(self, fn):
+            try:
+                self._send(200, fn())
+            except UnknownModelError as exc:
+                self._send(404, {"error": str(exc.args[0])})
+            except (KeyError, ValueError, TypeError) as exc:
+                self._send(400, {"error": str(exc)})
+            except Exception as exc:
+                self._send(500, {"error": f"{type(exc).__name__}: {exc}"})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            parts = [p for p in url.path.split("/") if p]
+            if parts == ["health"]:
+                self._send(200, {"status": "ok", "models": list(service.batchers)})
+            elif parts == ["metrics"]:
+                if query.get("format") == ["prometheus"]:
+                    self._send(200, service.prometheus_text(), "text/plain; version=0.0.4")
+                else:
+                    self._send(200, service.metrics())
+            elif len(parts) == 2 and parts[0] == "signal":
+                as_of = query.get("date", [None])[0]
+                self._route(lambda: service.signal(parts[1], as_of))
+            else:
+                self._send(404, {"error": f"Unknown path: {url.path}"})
+
+        def do_POST(self):
+            parts = [p for p in urlparse(self.path).path.split("/") if p]
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b"{}"
+            if len(parts) != 2 or parts[0] != "predict":
+                self._send(404, {"error": f"Unknown path: {self.path}"})
+                return
+            try:
+                payload = json.loads(raw)
+            except json.JSONDecodeError as exc:
+                self._send(400, {"error": f"Invalid JSON: {exc}"})
+                return
+            self._route(lambda: service.predict_rows(parts[1], payload))
+
+    return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Brent model predictions over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--models", nargs="+", choices=list(ARTIFACT_FILES), default=None)
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="rows per predict call")
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS, help="batching latency budget")
+    parser.add_argument("--backlog", type=int, default=DEFAULT_BACKLOG, help="pending connection queue size")
+    parser.add_argument("--data", default=str(DEFAULT_DATA_PATH))
+    args = parser.parse_args(argv)
+
+    service = PredictionService(args.models, args.data, args.max_batch, args.max_wait_ms)
+    server = PredictionServer((args.host, args.port), make_handler(service), args.backlog)
+    print(f"Serving {', '.join(service.batchers)} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
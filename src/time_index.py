@@ -0,0 +1,83 @@
+"""Sorted date index with binary-search range and as-of lookups.
+
+``TimeIndex`` wraps the (monotonic) ``date`` column as ``datetime64[ns]`` and
+answers range and as-of queries with ``np.searchsorted`` in O(log n), instead
+of converting every timestamp to a Python ``date`` and scanning the column.
+
+A ``datetime.date`` bound covers the whole calendar day, matching the app's
+former ``.dt.date <= end_date`` filters; timestamps and strings with a time
+are compared exactly.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+
+_ONE_DAY = np.timedelta64(1, "D")
+
+
+def _is_whole_day(value) -> bool:
+    if isinstance(value, datetime):  # datetime and pd.Timestamp subclass date
+        return False
+    if isinstance(value, date):
+        return True
+    if isinstance(value, str):
+        return len(value.strip()) <= 10
+    return False
+
+
+def _to_datetime64(value) -> np.datetime64:
+    return np.datetime64(pd.Timestamp(value).as_unit("ns").to_datetime64(), "ns")
+
+
+class TimeIndex:
+    def __init__(self, dates, assume_sorted: bool = False):
+        values = np.asarray(dates, dtype="datetime64[ns]")
+        if values.ndim != 1:
+            raise ValueError("TimeIndex needs a 1-D array of dates")
+        if not assume_sorted and len(values) > 1 and (values[1:] < values[:-1]).any():
+            raise ValueError("Dates must be sorted in ascending order")
+        self.values = values
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, column: str = "date") -> "TimeIndex":
+        return cls(df[column].to_numpy(dtype="datetime64[ns]"))
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def _upper(self, end) -> int:
+        # Position just past the last row on or before ``end``.
+        if _is_whole_day(end):
+            return int(np.searchsorted(self.values, _to_datetime64(end) + _ONE_DAY, side="left"))
+        return int(np.searchsorted(self.values, _to_datetime64(end), side="right"))
+
+    def _lower(self, start) -> int:
+        return int(np.searchsorted(self.values, _to_datetime64(start), side="left"))
+
+    def slice(self, start=None, end=None) -> slice:
+        """Positions with ``start <= date <= end`` (either bound optional)."""
+        lo = 0 if start is None else self._lower(start)
+        hi = len(self.values) if end is None else self._upper(end)
+        return slice(lo, max(lo, hi))
+
+    def asof(self, when) -> int | None:
+        """Position of the last row on or before ``when``, or ``None``."""
+        pos = self._upper(when) - 1
+        return pos if pos >= 0 else None
+
+    def asof_many(self, whens) -> np.ndarray:
+        """Vectorised ``asof`` for exact timestamps; -1 where nothing precedes."""
+        targets = np.asarray(whens, dtype="datetime64[ns]")
+        return np.searchsorted(self.values, targets, side="right") - 1
+
+    def first_on_or_after(self, when) -> int | None:
+        pos = self._lower(when)
+        return pos if pos < len(self.values) else None
+
+    def __getitem__(self, pos) -> pd.Timestamp:
+        return pd.Timestamp(self.values[pos])
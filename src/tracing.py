@@ -0,0 +1,266 @@
+"""Lightweight stage tracing for the app, feature and export pipelines.
+
+Tracing is off unless ``BRENT_TRACE=1`` is set (or ``enable()`` is called).
+While off, ``span()`` returns a shared no-op context manager and ``traced``
+functions call straight through, so instrumented code pays one flag check.
+
+While on, every span records wall time, resident-memory growth (Linux) and
+its parent span. ``export_json`` writes the spans as a Chrome trace
+(``chrome://tracing`` / Perfetto) and ``prometheus_text`` renders cumulative
+per-stage counters in the Prometheus text format. CLIs call
+``export_from_env()`` on exit, which writes ``$BRENT_TRACE_OUT.json`` and
+``.prom`` when that variable is set. Spans recorded in worker processes are
+not collected.
+
+The enabled flag, spans and counters live in a ``Collector``. CLIs use the
+process-wide default one; the app activates one collector per Streamlit
+session with ``activate`` (a ``ContextVar``), so sessions sharing the process
+neither clear nor switch on each other's tracing.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+_ENV_ENABLED = os.environ.get("BRENT_TRACE", "").lower() in ("1", "true", "yes", "on")
+_id_lock = threading.Lock()
+_local = threading.local()
+_next_id = 0
+_origin = time.perf_counter()
+
+MAX_SPANS = 10_000
+
+
+def rss_bytes() -> int | None:
+    try:
+        with open("/proc/self/statm", encoding="ascii") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+@dataclass
+class Span:
+    id: int
+    name: str
+    parent: int | None
+    thread: int
+    start: float
+    seconds: float = 0.0
+    rss_delta_bytes: int | None = None
+    attrs: dict = field(default_factory=dict)
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Collector:
+    """Enabled flag, recorded spans and per-stage counters of one tracing scope."""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = bool(enabled)
+        self.lock = threading.Lock()
+        self.spans = []
+        self.totals = {}
+
+    def record(self, span: Span) -> None:
+        with self.lock:
+            if len(self.spans) < MAX_SPANS:
+                self.spans.append(span)
+            total = self.totals.setdefault(span.name, [0, 0.0, 0.0, 0])
+            total[0] += 1
+            total[1] += span.seconds
+            total[2] = max(total[2], span.seconds)
+            total[3] += span.rss_delta_bytes or 0
+
+    def reset(self, totals: bool = False) -> None:
+        with self.lock:
+            self.spans.clear()
+            if totals:
+                self.totals.clear()
+
+
+_DEFAULT = Collector(_ENV_ENABLED)
+_current: ContextVar[Collector] = ContextVar("brent_trace_collector", default=_DEFAULT)
+
+
+def collector() -> Collector:
+    return _current.get()
+
+
+def activate(target: Collector) -> None:
+    """Route tracing in the current context (thread / task) to ``target``."""
+    _current.set(target)
+
+
+class _ActiveSpan:
+    def __init__(self, target: Collector, name: str, attrs: dict):
+        self.collector = target
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        global _next_id
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        with _id_lock:
+            _next_id += 1
+            span_id = _next_id
+        self.span = Span(
+            id=span_id,
+            name=self.name,
+            parent=stack[-1] if stack else None,
+            thread=threading.get_ident(),
+            start=time.perf_counter() - _origin,
+            attrs=self.attrs,
+        )
+        stack.append(span_id)
+        self._rss = rss_bytes()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        span = self.span
+        span.seconds = time.perf_counter() - self._t0
+        rss = rss_bytes()
+        if rss is not None and self._rss is not None:
+            span.rss_delta_bytes = rss - self._rss
+        if exc[0] is not None:
+            span.attrs["error"] = exc[0].__name__
+        _local.stack.pop()
+        self.collector.record(span)
+        return False
+
+
+def enabled() -> bool:
+    return _current.get().enabled
+
+
+def enable(on: bool = True) -> None:
+    """Switch tracing on or off for the active collector only."""
+    _current.get().enabled = bool(on)
+
+
+def span(name: str, **attrs):
+    target = _current.get()
+    if not target.enabled:
+        return _NULL_SPAN
+    return _ActiveSpan(target, name, attrs)
+
+
+def traced(name: str | None = None):
+    def decorate(fn):
+        # File stem rather than __module__, so `python -m` entry points are not "__main__".
+        label = name or f"{Path(fn.__code__.co_filename).stem}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            target = _current.get()
+            if not target.enabled:
+                return fn(*args, **kwargs)
+            with _ActiveSpan(target, label, {}):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def spans() -> list[Span]:
+    target = _current.get()
+    with target.lock:
+        return list(target.spans)
+
+
+def reset(totals: bool = False) -> None:
+    """Drop the active collector's spans (e.g. per app rerun); ``totals`` also clears its counters."""
+    _current.get().reset(totals)
+
+
+def summary() -> list[dict]:
+    """Per-stage rows for the spans recorded since the last ``reset``."""
+    rows = {}
+    for s in spans():
+        row = rows.setdefault(s.name, {"stage": s.name, "calls": 0, "seconds": 0.0, "rss_delta_mb": 0.0})
+        row["calls"] += 1
+        row["seconds"] += s.seconds
+        row["rss_delta_mb"] += (s.rss_delta_bytes or 0) / 1e6
+    return sorted(rows.values(), key=lambda r: -r["seconds"])
+
+
+def chrome_trace() -> dict:
+    events = []
+    for s in spans():
+        events.append(
+            {
+                "name": s.name,
+                "ph": "X",
+                "ts": s.start * 1e6,
+                "dur": s.seconds * 1e6,
+                "pid": os.getpid(),
+                "tid": s.thread,
+                "args": {**s.attrs, "id": s.id, "parent": s.parent, "rss_delta_bytes": s.rss_delta_bytes},
+            }
+        )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def export_json(path: Path | str) -> Path:
+    path = Path(path)
+    path.write_text(json.dumps(chrome_trace()), encoding="utf-8")
+    return path
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text() -> str:
+    target = _current.get()
+    with target.lock:
+        totals = {k: list(v) for k, v in target.totals.items()}
+    lines = []
+    metrics = (
+        ("brent_stage_calls_total", "counter", "Completed spans per stage.", 0),
+        ("brent_stage_seconds_total", "counter", "Wall time spent per stage.", 1),
+        ("brent_stage_seconds_max", "gauge", "Slowest single span per stage.", 2),
+        ("brent_stage_rss_delta_bytes_total", "counter", "Resident memory growth per stage.", 3),
+    )
+    for metric, kind, help_text, idx in metrics:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for stage, values in sorted(totals.items()):
+            lines.append(f'{metric}{{stage="{_label(stage)}"}} {values[idx]}')
+    return "\n".join(lines) + "\n"
+
+
+def export_from_env() -> None:
+    out = os.environ.get("BRENT_TRACE_OUT")
+    if not enabled() or not out:
+        return
+    export_json(f"{out}.json")
+    Path(f"{out}.prom").write_text(prometheus_text(), encoding="utf-8")
+    print(f"Trace written to: {out}.json, {out}.prom")
@@ -0,0 +1,52 @@
+import pandas as pd
+
+from src import data_preprocessing
+
+
+def _write(path, dates, **columns):
+    pd.DataFrame({'date': dates, **columns}).to_csv(path, index=False)
+
+
+def _instruments():
+    return [
+        {'name': 'brent', 'file': 'brent.csv', 'suffix': '_x'},
+        {'name': 'wti', 'file': 'wti.csv', 'suffix': '_y'},
+    ]
+
+
+def test_unsorted_raw_file_with_explicit_date_format(tmp_path, monkeypatch):
+    # ไฟล์เรียงใหม่ -> เก่า ต้องผ่าน external sort (run files เป็น ISO)
+    _write(tmp_path / 'brent.csv', ['11/17/2010', '11/16/2010', '11/15/2010'], close=[3.0, 2.0, 1.0])
+    _write(tmp_path / 'wti.csv', ['11/15/2010', '11/16/2010', '11/17/2010'], close=[10.0, 20.0, 30.0])
+    monkeypatch.setattr(data_preprocessing, 'RAW_PATH', str(tmp_path))
+    monkeypatch.setattr(data_preprocessing, 'DATE_FORMAT', '%m/%d/%Y')
+
+    batches = list(data_preprocessing.merge_instruments(_instruments(), 'inner', chunksize=2))
+    df = pd.concat(batches, ignore_index=True)
+
+    assert list(df.columns) == ['date', 'close_x', 'close_y']
+    assert df['date'].tolist() == list(pd.to_datetime(['2010-11-15', '2010-11-16', '2010-11-17']))
+    assert df['close_x'].tolist() == [1.0, 2.0, 3.0]
+    assert df['close_y'].tolist() == [10.0, 20.0, 30.0]
+
+
+def test_date_column_in_any_position(tmp_path, monkeypatch):
+    pd.DataFrame({
+        'close': [2.0, 1.0], 'date': ['2020-01-03', '2020-01-02'], 'volume': [20, 10],
+    }).to_csv(tmp_path / 'brent.csv', index=False)
+    pd.DataFrame({
+        'close': [5.0, 6.0], 'date': ['2020-01-02', '2020-01-03'],
+    }).to_csv(tmp_path / 'wti.csv', index=False)
+    monkeypatch.setattr(data_preprocessing, 'RAW_PATH', str(tmp_path))
+
+    df = pd.concat(data_preprocessing.merge_instruments(_instruments(), 'inner'), ignore_index=True)
+    expected = pd.merge(
+        pd.read_csv(tmp_path / 'brent.csv', parse_dates=['date']),
+        pd.read_csv(tmp_path / 'wti.csv', parse_dates=['date']),
+        on='date',
+    ).sort_values('date', ignore_index=True)
+
+    assert list(df.columns) == ['date', 'close_x', 'volume_x', 'close_y']
+    assert df['close_x'].tolist() == expected['close_x'].tolist()
+    assert df['volume_x'].tolist() == expected['volume'].tolist()
+    assert df['close_y'].tolist() == expected['close_y'].tolist()